@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""Compares the throughput of shutil.move with that of syrup.verified_copy
+when moving files between two directories. Give directories on different
+filesystems to measure cross-filesystem moves.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+from syrup.verified_copy import move_file
+
+
+def methods():
+    """A list of (name, function(src, destination))
+    """
+    return [
+        ('shutil.move', lambda src, dst: shutil.move(str(src), str(dst))),
+        ('verified', lambda src, dst: move_file(src, dst, verify=True)),
+        ('unverified', lambda src, dst: move_file(src, dst, verify=False)),
+    ]
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('source', help='Directory in which to create files')
+    parser.add_argument('destination', help='Directory to move files to')
+    parser.add_argument('--size', type=int, default=200,
+                        help='Size of each file in MB')
+    parser.add_argument('--repeat', type=int, default=3)
+    parsed = parser.parse_args(args[1:])
+
+    size = parsed.size * 1024 * 1024
+    source = Path(tempfile.mkdtemp(dir=parsed.source))
+    destination = Path(tempfile.mkdtemp(dir=parsed.destination))
+    try:
+        print('{0:<12} {1:>10}'.format('method', 'MB/s'))
+        for name, move in methods():
+            best = None
+            for i in range(parsed.repeat):
+                src, dst = source / 'src', destination / 'dst'
+                with src.open('wb') as f:
+                    f.write(os.urandom(size))
+                if dst.exists():
+                    dst.unlink()
+                start = time.time()
+                move(src, dst)
+                elapsed = time.time() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print('{0:<12} {1:>10.1f}'.format(name, size / 1e6 / best))
+    finally:
+        shutil.rmtree(str(source))
+        shutil.rmtree(str(destination))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""Micro-benchmarks of syrup.imaging.qimage_of_bgr against the conversion that
+it replaced, reporting time and peak memory per megapixel.
+
+Peak memory is measured with tracemalloc so it covers allocations made by
+numpy but not those made inside Qt or OpenCV.
+"""
+import argparse
+import sys
+import timeit
+import tracemalloc
+
+import cv2
+
+import numpy as np
+
+from PySide.QtGui import QImage
+
+from syrup.imaging import qimage_of_bgr
+
+
+def legacy_qimage_of_bgr(bgr):
+    """The implementation of qimage_of_bgr in syrup 0.1.4
+    """
+    bgr = cv2.cvtColor(bgr.astype('uint8'), cv2.COLOR_BGR2RGB)
+    bgr = np.ascontiguousarray(bgr)
+    qt_image = QImage(bgr.data,
+                      bgr.shape[1], bgr.shape[0],
+                      bgr.strides[0], QImage.Format_RGB888)
+    qt_image.bgr_array = bgr
+    return qt_image
+
+
+def inputs(width, height):
+    """A list of (name, array) to convert
+    """
+    bgr = np.random.randint(0, 256, (height, width, 3)).astype(np.uint8)
+    return [
+        ('bgr uint8', bgr),
+        ('bgra uint8', cv2.cvtColor(bgr, cv2.COLOR_BGR2BGRA)),
+        ('grey uint8', cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)),
+        ('bgr uint16', bgr.astype(np.uint16) * 257),
+        ('bgr uint8 cropped', bgr[:, width // 4:]),
+    ]
+
+
+def peak_bytes(f, array):
+    tracemalloc.start()
+    try:
+        image = f(array)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--width', type=int, default=6000)
+    parser.add_argument('--height', type=int, default=4000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parsed = parser.parse_args(args[1:])
+
+    megapixels = parsed.width * parsed.height / 1e6
+    print('{0}x{1} ({2:.1f} MP)'.format(parsed.width, parsed.height, megapixels))
+    print('{0:<20} {1:<8} {2:>10} {3:>10}'.format('input', 'function',
+                                                   'ms/MP', 'MB/MP'))
+    for name, array in inputs(parsed.width, parsed.height):
+        for label, f in (('legacy', legacy_qimage_of_bgr),
+                         ('current', qimage_of_bgr)):
+            if 'legacy' == label and (3 != array.ndim or 3 != array.shape[2]):
+                # The legacy implementation only handled BGR
+                continue
+            seconds = min(timeit.repeat(lambda: f(array), number=1,
+                                        repeat=parsed.repeat))
+            peak = peak_bytes(f, array)
+            print('{0:<20} {1:<8} {2:>10.2f} {3:>10.2f}'.format(
+                name, label, 1e3 * seconds / megapixels,
+                peak / 1e6 / megapixels))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
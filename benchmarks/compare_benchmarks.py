@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""Compares two results files written by run_benchmarks.py, giving the time per
+item of each benchmark in each and the ratio of the second to the first.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    """Results keyed by (benchmark, format, depth) and the environment
+    """
+    with open(path) as f:
+        run = json.load(f)
+    results = dict(((r['benchmark'], r['format'], r['depth']), r)
+                   for r in run['results'])
+    return results, run['environment']
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('baseline', help='Results to compare against')
+    parser.add_argument('candidate', help='Results to compare')
+    parsed = parser.parse_args(args[1:])
+
+    baseline, baseline_env = load(parsed.baseline)
+    candidate, candidate_env = load(parsed.candidate)
+    for name, env in (('baseline', baseline_env), ('candidate', candidate_env)):
+        print('{0:<10} syrup {1}, Python {2}, OpenCV {3}, Qt {4}, {5}'.format(
+            name, env['syrup'], env['python'], env['opencv'], env['qt'],
+            env['time']))
+
+    print('{0:<24} {1:>12} {2:>12} {3:>8}'.format('benchmark', 'baseline ms',
+                                                  'candidate ms', 'ratio'))
+    for key in sorted(set(baseline).intersection(candidate)):
+        before = baseline[key]['ms_per_item']
+        after = candidate[key]['ms_per_item']
+        print('{0:<24} {1:>12.2f} {2:>12.2f} {3:>8.2f}'.format(
+            '{0} {1}-{2}'.format(*key), before, after,
+            after / before if before else float('nan')))
+    for key in sorted(set(baseline).symmetric_difference(candidate)):
+        print('{0} {1}-{2} is only in one run'.format(*key))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
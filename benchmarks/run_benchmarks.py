@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+"""Runs syrup's benchmarks against synthetic inboxes and writes the results as
+JSON, so that runs on different machines or of different versions can be
+compared with compare_benchmarks.py.
+
+For each format and bit depth an inbox is generated and the following are
+measured:
+    scan        reading the inbox as NewFileWatcher does - the initial
+                DirectoryIndex, a rescan with no changes and the backlog
+    decode      cv2.imread at full size and imaging.read_bgr at a reduced
+                scale for the display size
+    convert     imaging.qimage_of_bgr of each decoded array
+    rescale     ImageLabel.set_image, which smoothly scales the image to the
+                widget
+    move        move_and_rename into a DestinationIndex, within a filesystem
+
+Qt is run on its offscreen platform so that no display is needed. That
+platform is provided by Qt 5 and later; with Qt 4 run the benchmarks under a
+virtual display such as xvfb-run. Benchmarks that need Qt are skipped if
+PySide cannot be imported.
+"""
+import os
+
+# Must be set before Qt is imported
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import argparse
+import json
+import platform
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import cv2
+
+import numpy as np
+
+from pathlib import Path
+
+import syrup
+
+from syrup.directory_index import DirectoryIndex, backlog
+from syrup.move_and_rename import move_and_rename, DestinationIndex
+
+from synthetic_inbox import generate
+
+try:
+    from PySide import QtCore
+    from PySide.QtGui import QApplication
+    from syrup import imaging
+    from syrup.image_label import ImageLabel
+except ImportError as e:
+    QApplication = None
+    QT_ERROR = str(e)
+
+
+# (format, depth) of the inboxes that are benchmarked
+CASES = [('jpeg', 8), ('png', 8), ('png', 16), ('tiff', 8), ('tiff', 16)]
+
+# The files in generated inboxes
+INBOX_RE = re.compile(r'^.*\.(jpg|png|tif)$', re.IGNORECASE)
+
+
+def best_time(f, repeat):
+    """The shortest of repeat timings of f() and the last value it returned
+    """
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        value = f()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+
+def result(benchmark, seconds, items, size=None):
+    """A dict describing a benchmark's outcome. size is the total bytes
+    processed, if relevant.
+    """
+    res = {
+        'benchmark': benchmark,
+        'seconds': seconds,
+        'items': items,
+        'ms_per_item': 1e3 * seconds / items if items else None,
+    }
+    if size is not None:
+        res['bytes'] = size
+        res['mb_per_second'] = size / 1e6 / seconds if seconds else None
+    return res
+
+
+def bench_scan(inbox, repeat):
+    seconds, index = best_time(lambda: DirectoryIndex(inbox, INBOX_RE), repeat)
+    n = len(index.files)
+    results = [result('scan.index', seconds, n)]
+    seconds, changes = best_time(index.rescan, repeat)
+    results.append(result('scan.rescan', seconds, n))
+    seconds, files = best_time(lambda: backlog(inbox, INBOX_RE), repeat)
+    results.append(result('scan.backlog', seconds, n))
+    return results
+
+
+def bench_decode(paths, display_size, repeat):
+    size = sum(p.stat().st_size for p in paths)
+    read = lambda: [cv2.imread(str(p), cv2.IMREAD_UNCHANGED) for p in paths]
+    seconds, arrays = best_time(read, repeat)
+    results = [result('decode.full', seconds, len(paths), size)]
+    if QApplication:
+        read = lambda: [imaging.read_bgr(p, display_size) for p in paths]
+        seconds, reduced = best_time(read, repeat)
+        results.append(result('decode.reduced', seconds, len(paths), size))
+
+        convert = lambda: [imaging.qimage_of_bgr(a) for a in arrays]
+        seconds, images = best_time(convert, repeat)
+        results.append(result('convert.full', seconds, len(arrays),
+                              sum(a.nbytes for a in arrays)))
+    return results
+
+
+def bench_rescale(paths, display_size, repeat):
+    label = ImageLabel()
+    label.resize(*display_size)
+    images = [imaging.read_image(p, display_size) for p in paths]
+    rescale = lambda: [label.set_image(image) for image in images]
+    seconds, ignored = best_time(rescale, repeat)
+    return [result('rescale', seconds, len(images))]
+
+
+def bench_move(paths, workdir, repeat):
+    """Copies paths to a source directory, which is not timed, and moves them
+    to a destination directory, repeat times
+    """
+    size = sum(p.stat().st_size for p in paths)
+    best = None
+    for i in range(repeat):
+        source, destination = workdir / 'move-source', workdir / 'move-destination'
+        for directory in (source, destination):
+            if directory.is_dir():
+                shutil.rmtree(str(directory))
+            directory.mkdir()
+        sources = []
+        for path in paths:
+            shutil.copy(str(path), str(source / path.name))
+            sources.append(source / path.name)
+
+        start = time.time()
+        index = DestinationIndex(destination)
+        for src in sources:
+            move_and_rename(src, destination / src.name, index)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return [result('move', best, len(paths), size)]
+
+
+def environment():
+    env = {
+        'syrup': syrup.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    if QApplication:
+        env['qt'] = QtCore.qVersion()
+    else:
+        env['qt'] = None
+        env['qt_unavailable'] = QT_ERROR
+    return env
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=20,
+                        help='Number of images in each inbox')
+    parser.add_argument('--width', type=int, default=6000)
+    parser.add_argument('--height', type=int, default=4000)
+    parser.add_argument('--display', default='1600x1200',
+                        help='Size of the area in which images are shown')
+    parser.add_argument('--case', action='append',
+                        help='format-depth to benchmark, e.g. jpeg-8. May be '
+                             'given more than once. Default: all')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workdir',
+                        help='Directory in which to create inboxes. Default: '
+                             'a temporary directory')
+    parser.add_argument('-o', '--output', default='benchmarks.json',
+                        help='JSON file to which to write results')
+    parsed = parser.parse_args(args[1:])
+
+    display_size = tuple(int(v) for v in parsed.display.split('x'))
+    cases = CASES
+    if parsed.case:
+        cases = [(c.split('-')[0], int(c.split('-')[1])) for c in parsed.case]
+
+    if QApplication:
+        app = QApplication.instance() or QApplication(args[:1])
+
+    workdir = Path(tempfile.mkdtemp(dir=parsed.workdir))
+    results = []
+    try:
+        for format, depth in cases:
+            inbox = workdir / '{0}-{1}'.format(format, depth)
+            paths = generate(inbox, parsed.count, parsed.width, parsed.height,
+                             format, depth)
+            case = bench_scan(inbox, parsed.repeat)
+            case += bench_decode(paths, display_size, parsed.repeat)
+            if QApplication:
+                case += bench_rescale(paths, display_size, parsed.repeat)
+            case += bench_move(paths, workdir, parsed.repeat)
+            for res in case:
+                res.update({'format': format, 'depth': depth,
+                            'width': parsed.width, 'height': parsed.height})
+                print('{0:<6} {1:>2}-bit {2:<16} {3:>10.2f} ms/item'.format(
+                    format, depth, res['benchmark'], res['ms_per_item']))
+            results.extend(case)
+    finally:
+        shutil.rmtree(str(workdir))
+
+    with open(parsed.output, 'w') as f:
+        json.dump({'environment': environment(),
+                   'arguments': vars(parsed),
+                   'results': results}, f, indent=2, sort_keys=True)
+    print('Wrote [{0}]'.format(parsed.output))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""Creates an inbox of synthetic images with which to benchmark syrup.
+
+Images are smooth gradients with seeded noise, so that they compress like
+photographs rather than like flat colour, and the same arguments always give
+the same files.
+"""
+import argparse
+import sys
+
+import cv2
+
+import numpy as np
+
+from pathlib import Path
+
+
+# File suffixes and the bit depths that each format can hold
+FORMATS = {
+    'jpeg': ('.jpg', (8,)),
+    'png': ('.png', (8, 16)),
+    'tiff': ('.tif', (8, 16)),
+}
+
+
+def synthetic_image(width, height, depth=8, seed=0):
+    """A BGR numpy array of uint8 or, if depth is 16, uint16
+    """
+    random = np.random.RandomState(seed)
+    x = np.linspace(0, 1, width, dtype=np.float32)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, np.newaxis]
+    phase = random.uniform(0, 2 * np.pi, 3)
+    channels = [0.5 + 0.4 * np.sin(2 * np.pi * (x + y) + p) for p in phase]
+    image = np.dstack(channels)
+    image += random.normal(0, 0.02, image.shape).astype(np.float32)
+    image = np.clip(image, 0, 1)
+    if 16 == depth:
+        return (image * 65535 + 0.5).astype(np.uint16)
+    else:
+        return (image * 255 + 0.5).astype(np.uint8)
+
+
+def generate(directory, count, width, height, format='jpeg', depth=8,
+             distinct=4, seed=0):
+    """Writes count images to directory and returns a list of their Paths.
+    distinct images are encoded and the remainder are copies of them, which
+    keeps generation of large inboxes quick.
+    """
+    suffix, depths = FORMATS[format]
+    if depth not in depths:
+        raise ValueError('{0} cannot hold {1}-bit images'.format(format, depth))
+
+    directory = Path(directory)
+    if not directory.is_dir():
+        directory.mkdir(parents=True)
+
+    encoded = []
+    for i in range(min(count, distinct)):
+        image = synthetic_image(width, height, depth, seed + i)
+        ok, data = cv2.imencode(suffix, image)
+        if not ok:
+            raise ValueError('Unable to encode {0}'.format(format))
+        encoded.append(data.tobytes())
+
+    paths = []
+    for i in range(count):
+        path = directory / 'IMG_{0:06d}{1}'.format(i, suffix)
+        with path.open('wb') as f:
+            f.write(encoded[i % len(encoded)])
+        paths.append(path)
+    return paths
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('directory', help='Directory in which to create images')
+    parser.add_argument('--count', type=int, default=100)
+    parser.add_argument('--width', type=int, default=6000)
+    parser.add_argument('--height', type=int, default=4000)
+    parser.add_argument('--format', choices=sorted(FORMATS), default='jpeg')
+    parser.add_argument('--depth', type=int, choices=(8, 16), default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    parsed = parser.parse_args(args[1:])
+
+    paths = generate(parsed.directory, parsed.count, parsed.width,
+                     parsed.height, parsed.format, parsed.depth,
+                     seed=parsed.seed)
+    print('Wrote {0} images to [{1}]'.format(len(paths), parsed.directory))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,145 @@
+import logging
+import threading
+
+from pathlib import Path
+
+from PySide import QtCore
+
+from .latency import recorder
+from .lru_cache import LRUCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class _AnalysisSignals(QtCore.QObject):
+    """Signals emitted by _AnalysisTask
+    """
+    analysed = QtCore.Signal(object, object)
+    failed = QtCore.Signal(object, str)
+
+
+class _AnalysisTask(QtCore.QRunnable):
+    """Decodes an image file at a reduced scale and runs analysers on it, on a
+    thread pool thread. The result of an analyser that raises an exception is
+    None. Nothing is done if cancelled, a threading.Event, is set before the
+    task starts.
+    """
+    def __init__(self, path, size, analysers, cancelled, signals):
+        super(_AnalysisTask, self).__init__()
+        self._path = path
+        self._size = size
+        self._analysers = analysers
+        self._cancelled = cancelled
+        self._signals = signals
+
+    def run(self):
+        if self._cancelled.is_set():
+            logger.debug(u'Cancelled analysis of [%s]', self._path)
+            return
+        try:
+            with recorder.timed('analysis', self._path):
+                # Imported here so that OpenCV is not imported at startup
+                from .imaging import read_bgr
+                bgr = read_bgr(self._path, (self._size, self._size))
+                if bgr is None:
+                    raise ValueError('Unable to read [{0}]'.format(self._path))
+                results = {}
+                for analyser in self._analysers:
+                    try:
+                        results[analyser.name] = analyser(bgr)
+                    except Exception as e:
+                        logger.warning(u'Analyser [%s] failed on [%s]: %s',
+                                       analyser.name, self._path, e)
+                        results[analyser.name] = None
+        except Exception as e:
+            self._signals.failed.emit(self._path, str(e))
+        else:
+            self._signals.analysed.emit(self._path, results)
+
+
+class AnalyseAhead(QtCore.QObject):
+    """Analyses images in the background while they wait to be reviewed.
+
+    Each analyser is a callable with a name attribute that takes a BGR numpy
+    array, decoded at a scale large enough to fill SIZE, and returns a result.
+    Analysers are called on thread pool threads. The results for a path are a
+    dict of results keyed by analyser name, in which the result of an
+    analyser that failed is None.
+    """
+
+    # Emitted when the results for a path are ready
+    analysed = QtCore.Signal(Path)
+
+    # Number of upcoming images to analyse
+    DEPTH = 10
+
+    # Width and height that images are decoded to fill for analysis
+    SIZE = 2048
+
+    # Number of images analysed concurrently
+    THREADS = 2
+
+    # Maximum number of results held
+    MAX_RESULTS = 500
+
+    def __init__(self, analysers, depth=DEPTH, parent=None):
+        super(AnalyseAhead, self).__init__(parent)
+        self._analysers = list(analysers)
+        self._depth = depth
+        self._results = LRUCache(self.MAX_RESULTS)
+
+        # Tuples (priority, cancellation event) of paths being analysed
+        self._in_flight = {}
+
+        self._pool = QtCore.QThreadPool(self)
+        self._pool.setMaxThreadCount(self.THREADS)
+        self._signals = _AnalysisSignals(self)
+        self._signals.analysed.connect(self._analysed,
+                                       QtCore.Qt.QueuedConnection)
+        self._signals.failed.connect(self._failed, QtCore.Qt.QueuedConnection)
+
+    def analyse(self, paths, priority=0):
+        """Starts analysing the first self._depth of paths, in order, that
+        have neither been analysed nor are being analysed. Tasks with a higher
+        priority are started first. Analyses requested earlier with the same
+        priority of paths that are not among them are cancelled if they have
+        not yet started.
+        """
+        if self._analysers:
+            paths = paths[:self._depth]
+            for path, (p, cancelled) in list(self._in_flight.items()):
+                if p == priority and path not in paths:
+                    cancelled.set()
+                    del self._in_flight[path]
+            for path in paths:
+                if path not in self._results and path not in self._in_flight:
+                    cancelled = threading.Event()
+                    self._in_flight[path] = (priority, cancelled)
+                    task = _AnalysisTask(path, self.SIZE, self._analysers,
+                                         cancelled, self._signals)
+                    self._pool.start(task, priority)
+
+    def results(self, path):
+        """The dict of results for path or None if path has not been analysed
+        """
+        return self._results.get(path)
+
+    def evict(self, path):
+        """Discards path's results, and those of any analysis in progress. Call
+        when path has been moved or ignored.
+        """
+        if path in self._in_flight:
+            self._in_flight.pop(path)[1].set()
+        self._results.pop(path)
+
+    def _analysed(self, path, results):
+        if path in self._in_flight:
+            del self._in_flight[path]
+            self._results.put(path, results)
+            self.analysed.emit(path)
+
+    def _failed(self, path, message):
+        logger.warning(u'AnalyseAhead failed to analyse [%s]: %s', path,
+                       message)
+        self._in_flight.pop(path, None)
@@ -1,30 +1,121 @@
 import argparse
+import logging
 import sys
+import threading
 
-from PySide.QtGui import QApplication
-from PySide.QtCore import QCoreApplication
+from functools import partial
 
 import syrup
-from syrup.main_window import MainWindow
 
+from syrup.startup_profile import StartupProfile
 
-# The QSettings default constructor uses the application's organizationName
-# and applicationName properties.
-QCoreApplication.setOrganizationName('NHM')
-QCoreApplication.setApplicationName('syrup')
 
-# No obvious benefit to also setting these but neither is there any obvious harm
-QCoreApplication.setApplicationVersion(syrup.__version__)
-QCoreApplication.setOrganizationDomain('nhm.ac.uk')
+# Seconds within which the main window should be shown and the event loop
+# running. OpenCV and numpy are imported after this point.
+STARTUP_BUDGET = 2.0
+
+# Format of log messages
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+
+logger = logging.getLogger(__name__)
+
+
+def _set_application_names():
+    from PySide.QtCore import QCoreApplication
+
+    # The QSettings default constructor uses the application's organizationName
+    # and applicationName properties.
+    QCoreApplication.setOrganizationName('NHM')
+    QCoreApplication.setApplicationName('syrup')
+
+    # No obvious benefit to also setting these but neither is there any obvious
+    # harm
+    QCoreApplication.setApplicationVersion(syrup.__version__)
+    QCoreApplication.setOrganizationDomain('nhm.ac.uk')
+
+
+def _load_imaging(profile):
+    """Imports the imaging modules, and so OpenCV and numpy, so that review of
+    the first image is not delayed by their import. Runs on a background
+    thread.
+    """
+    try:
+        with profile.phase('import imaging (background)'):
+            import syrup.barcode_detection
+            import syrup.capture_quality
+            import syrup.imaging
+            import syrup.perceptual_hash
+            import syrup.tile_pyramid
+    except Exception as e:
+        # Will be reported to the user when the first image is reviewed
+        logger.error(u'Unable to import imaging modules: %s', e)
+    finally:
+        profile.remove_import_hook()
+        profile.report_imports()
+
+
+def _started(profile):
+    """Called when the event loop first runs
+    """
+    profile.mark('event loop running')
+    if profile.elapsed() > STARTUP_BUDGET:
+        logger.warning('Startup took %.1fs, more than the budget of %.1fs',
+                       profile.elapsed(), STARTUP_BUDGET)
+    thread = threading.Thread(target=_load_imaging, args=(profile,))
+    thread.daemon = True
+    thread.start()
 
 
 def main(args):
-    parser = argparse.ArgumentParser(description=syrup.__doc__)
+    if len(args) > 1 and 'batch' == args[1]:
+        # Headless - Qt is not imported
+        logging.basicConfig(level=logging.WARNING, format=LOG_FORMAT)
+        from syrup import batch
+        sys.exit(batch.main(args[1:]))
+
+    parser = argparse.ArgumentParser(description=syrup.__doc__,
+        epilog="Run '%(prog)s batch --help' to move images listed in a "
+               "manifest without showing the GUI")
     parser.add_argument('-v', '--version', action='version',
                         version='%(prog)s ' + syrup.__version__)
+    parser.add_argument('--log-level', default='info',
+                        choices=['debug', 'info', 'warning', 'error'],
+                        help='Least severe messages to log')
+    parser.add_argument('--startup-profile', action='store_true',
+                        help='Write the time taken by each phase of startup '
+                             'and by each import to stderr')
     parsed = parser.parse_args(args[1:])
+    logging.basicConfig(level=getattr(logging, parsed.log_level.upper()),
+                        format=LOG_FORMAT)
+
+    # The main window is shown before the imaging modules are imported
+    profile = StartupProfile(sys.stderr if parsed.startup_profile else None)
+    if parsed.startup_profile:
+        profile.install_import_hook()
+
+    with profile.phase('import Qt'):
+        from PySide.QtCore import QTimer
+        from PySide.QtGui import QApplication
+
+    with profile.phase('create application'):
+        _set_application_names()
+        app = QApplication(args)
 
-    app = QApplication(args)
-    window = MainWindow(app)
-    window.show_from_geometry_settings()
+    with profile.phase('import main window'):
+        from syrup.main_window import MainWindow
+
+    with profile.phase('create main window'):
+        window = MainWindow(app)
+
+    with profile.phase('show main window'):
+        window.show_from_geometry_settings()
+
+    QTimer.singleShot(0, partial(_started, profile))
     sys.exit(app.exec_())
+
+
+def launch():
+    """Entry point for the syrup console script
+    """
+    main(sys.argv)
@@ -0,0 +1,106 @@
+"""Detection of the specimen and location barcodes that are visible in images.
+
+Barcodes and QR codes are detected with OpenCV's detectors, where the
+installed version provides them, in a reduced copy of the image and again at
+each of SCALES. A value read at every scale, with no conflicting value, is
+given a confidence of 1.
+"""
+from collections import namedtuple
+
+import cv2
+
+from .barcodes import SPECIMEN_RE, LOCATION_RE
+
+
+# Scales, relative to the image given to detect(), at which codes are read
+SCALES = (1.0, 0.5)
+
+# A value read from codes in an image and a confidence from 0 to 1
+Reading = namedtuple('Reading', ['value', 'confidence'])
+
+
+def _detectors():
+    """A list of functions that each return a list of the values of the codes
+    in a greyscale image
+    """
+    detectors = []
+    if hasattr(cv2, 'barcode'):
+        barcode = cv2.barcode.BarcodeDetector()
+        if hasattr(barcode, 'detectAndDecodeWithType'):
+            # OpenCV 4.8 and later
+            decode = barcode.detectAndDecodeWithType
+        else:
+            decode = barcode.detectAndDecode
+        detectors.append(lambda grey: list(decode(grey)[1] or []))
+    if hasattr(cv2, 'QRCodeDetector'):
+        qr = cv2.QRCodeDetector()
+        if hasattr(qr, 'detectAndDecodeMulti'):
+            detectors.append(lambda grey: list(qr.detectAndDecodeMulti(grey)[1] or []))
+        else:
+            detectors.append(lambda grey: [qr.detectAndDecode(grey)[0]])
+    return detectors
+
+
+def available():
+    """True if the installed OpenCV can detect barcodes or QR codes
+    """
+    return hasattr(cv2, 'barcode') or hasattr(cv2, 'QRCodeDetector')
+
+
+def decode(bgr, scales=SCALES):
+    """A list, with an item for each of scales, of sets of the values of the
+    codes found in the BGR or greyscale numpy array bgr
+    """
+    grey = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY) if 3 == bgr.ndim else bgr
+    detectors = _detectors()
+    found = []
+    for scale in scales:
+        scaled = grey
+        if 1.0 != scale:
+            scaled = cv2.resize(grey, None, fx=scale, fy=scale,
+                                interpolation=cv2.INTER_AREA)
+        values = set()
+        for detector in detectors:
+            try:
+                values.update(v.strip() for v in detector(scaled) if v)
+            except cv2.error:
+                # Detectors can fail on images that they do not understand
+                pass
+        found.append(values)
+    return found
+
+
+def choose(found, regex):
+    """The Reading of the value that matches regex and that was read at the
+    most scales in found, a list of sets of values as returned by decode().
+    Returns None if no value matches. Confidence is the proportion of scales
+    at which the value was read, halved if a different matching value was also
+    read.
+    """
+    counts = {}
+    for values in found:
+        for value in values:
+            if regex.match(value):
+                counts[value] = counts.get(value, 0) + 1
+    if not counts:
+        return None
+    else:
+        value = max(sorted(counts), key=lambda v: counts[v])
+        confidence = float(counts[value]) / len(found)
+        if len(counts) > 1:
+            confidence /= 2
+        return Reading(value, confidence)
+
+
+class BarcodeAnalyser(object):
+    """Reads specimen and location barcodes. An analyser for AnalyseAhead.
+    """
+    name = 'barcodes'
+
+    def __call__(self, bgr):
+        """A dict {'specimen': Reading, 'location': Reading} of the barcodes
+        in bgr. Values are None if no matching barcode was found.
+        """
+        found = decode(bgr)
+        return {'specimen': choose(found, SPECIMEN_RE),
+                'location': choose(found, LOCATION_RE)}
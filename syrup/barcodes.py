@@ -0,0 +1,14 @@
+import re
+
+
+# Regular expression for specimen and location numbers
+SPECIMEN_RE = re.compile('^[0-9]{9}$')
+LOCATION_RE = re.compile('^L[0-9]{9}$')
+
+
+def destination_path(processed, specimen, location, suffix):
+    """The Path within the directory processed to which an image of specimen
+    at location, with the file suffix suffix, is moved
+    """
+    destination = processed / '{0}_{1}'.format(specimen, location)
+    return destination.with_suffix(suffix)
@@ -0,0 +1,279 @@
+"""Moves and renames images listed in a manifest, without showing the GUI.
+
+The manifest is a CSV or tab-separated file with a header row that contains
+the columns file, specimen and location. Relative file paths are relative to
+the directory that contains the manifest. Each row is checked before any files
+are moved. Moves are recorded in the processed directory's ProcessedManifest,
+as are those made in the GUI.
+"""
+import argparse
+import codecs
+import csv
+import getpass
+import sqlite3
+import sys
+import time
+
+from collections import namedtuple, OrderedDict
+from functools import partial
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+
+from .barcodes import SPECIMEN_RE, LOCATION_RE, destination_path
+from .manifest import ProcessedManifest
+from .move_and_rename import move_to_free_name, DestinationIndex
+from .verified_copy import hash_file
+
+
+# Columns that the manifest must contain
+COLUMNS = ('file', 'specimen', 'location')
+
+# A row of the manifest. line is the line number within the manifest.
+Row = namedtuple('Row', ['line', 'source', 'specimen', 'location'])
+
+# The outcome for a row. status is one of 'moved', 'would move', 'invalid' or
+# 'failed'.
+Result = namedtuple('Result', ['line', 'source', 'destination', 'status',
+                               'message'])
+
+
+def _open_csv(path, mode, encoding=None):
+    """A file object for the csv module. Python 2 reads and writes bytes, and
+    skips a UTF-8 byte order mark if encoding is 'utf-8-sig'.
+    """
+    if sys.version_info[0] < 3:
+        f = open(str(path), mode + 'b')
+        if ('utf-8-sig' == encoding and 'r' == mode and
+                f.read(len(codecs.BOM_UTF8)) != codecs.BOM_UTF8):
+            f.seek(0)
+        return f
+    else:
+        return open(str(path), mode, newline='', encoding=encoding)
+
+
+def read_manifest(path):
+    """Returns a list of Rows read from the manifest at path, which is UTF-8
+    with or without a byte order mark, as written by Excel. Raises ValueError
+    if the manifest is empty or lacks any of COLUMNS.
+    """
+    path = Path(path)
+    with _open_csv(path, 'r', 'utf-8-sig') as f:
+        start = f.tell()
+        sample = f.read(64 * 1024)
+        f.seek(start)
+        lines = sample.splitlines()
+        if not lines:
+            raise ValueError('Manifest [{0}] is empty'.format(path))
+        delimiter = '\t' if '\t' in lines[0] else ','
+        reader = csv.reader(f, delimiter=delimiter)
+        header = [c.strip().lower() for c in next(reader, [])]
+        missing = [c for c in COLUMNS if c not in header]
+        if missing:
+            raise ValueError('Manifest [{0}] does not have the column(s) '
+                             '{1}'.format(path, ', '.join(missing)))
+        columns = [header.index(c) for c in COLUMNS]
+        rows = []
+        for values in reader:
+            if any(v.strip() for v in values):
+                values = [values[i].strip() if i < len(values) else ''
+                          for i in columns]
+                rows.append(Row(reader.line_num, path.parent / values[0],
+                                values[1], values[2]))
+        return rows
+
+
+def validate(rows, processed):
+    """Returns a tuple (tasks, invalid). tasks is a list of tuples (Row,
+    destination) for valid rows. invalid is a list of Results for rows that are
+    not valid.
+    """
+    tasks, invalid, seen = [], [], set()
+    for row in rows:
+        if not SPECIMEN_RE.match(row.specimen):
+            message = 'Specimen barcode [{0}] is not nine digits'.format(
+                row.specimen)
+        elif not LOCATION_RE.match(row.location):
+            message = ('Location barcode [{0}] is not a letter "L" and nine '
+                       'digits'.format(row.location))
+        elif row.source in seen:
+            message = 'File is listed more than once'
+        elif not row.source.is_file():
+            message = 'File does not exist'
+        else:
+            message = None
+
+        if message:
+            invalid.append(Result(row.line, row.source, None, 'invalid',
+                                  message))
+        else:
+            seen.add(row.source)
+            tasks.append((row, destination_path(processed, row.specimen,
+                                                 row.location,
+                                                 row.source.suffix)))
+    return tasks, invalid
+
+
+def _move_group(group, indexes, embed=False, digest=False):
+    """Moves a list of (Row, destination) that share a destination, one at a
+    time so that their numerical suffixes do not collide. indexes is a dict of
+    DestinationIndex keyed by directory. Barcodes are written into the files'
+    metadata if embed is True. Returns a list of tuples (Result, Row, Moved),
+    in which Moved is None for files that were not moved and, if digest is
+    True, has the digest of files that were renamed rather than copied.
+    """
+    results = []
+    for row, destination in group:
+        try:
+            moved = move_to_free_name(row.source, destination,
+                                      indexes[destination.parent],
+                                      embed=((row.specimen, row.location)
+                                             if embed else None))
+            if digest and moved.digest is None:
+                # Renamed - the file's pages are likely to be cached
+                moved = moved._replace(digest=hash_file(moved.path,
+                                                        cached=True))
+        except Exception as e:
+            results.append((Result(row.line, row.source, destination,
+                                   'failed', str(e)), row, None))
+        else:
+            results.append((Result(row.line, row.source, moved.path, 'moved',
+                                   ''), row, moved))
+    return results
+
+
+def _record(manifest, row, moved, operator):
+    """Records the move of row's file, given by moved, in manifest. Returns
+    an error message or None.
+    """
+    try:
+        manifest.record(row.source, moved.path, row.specimen, row.location,
+                        moved.size, moved.digest, operator)
+    except sqlite3.Error as e:
+        return 'Line {0}: unable to record move in manifest: {1}'.format(
+            row.line, e)
+    else:
+        return None
+
+
+def run(tasks, workers, dry_run=False, progress=None, embed=False,
+        manifest=None):
+    """Moves the files given by tasks, a list of (Row, destination), using
+    workers threads. Calls progress(done, total), if given, as files are
+    moved. Barcodes are written into the metadata of JPEG and TIFF files if
+    embed is True. Moves are recorded in manifest, a ProcessedManifest, if
+    given, on the calling thread. Returns a list of Results.
+    """
+    if dry_run:
+        return [Result(row.line, row.source, destination, 'would move', '')
+                for row, destination in tasks]
+
+    # Moves to the same destination are made by the same worker
+    groups = OrderedDict()
+    for row, destination in tasks:
+        groups.setdefault(destination, []).append((row, destination))
+
+    indexes = dict((d, DestinationIndex(d))
+                   for d in set(destination.parent for destination in groups))
+
+    operator = getpass.getuser()
+    results = []
+    pool = ThreadPool(workers)
+    try:
+        move_group = partial(_move_group, indexes=indexes, embed=embed,
+                             digest=manifest is not None)
+        for group_results in pool.imap_unordered(move_group, groups.values()):
+            for result, row, moved in group_results:
+                results.append(result)
+                if manifest and moved:
+                    error = _record(manifest, row, moved, operator)
+                    if error:
+                        print(error)
+            if progress:
+                progress(len(results), len(tasks))
+    finally:
+        pool.close()
+        pool.join()
+    return results
+
+
+def write_report(results, path):
+    """Writes results to the CSV file at path
+    """
+    with _open_csv(path, 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(Result._fields)
+        for result in sorted(results):
+            writer.writerow(['' if v is None else str(v) for v in result])
+
+
+def _print_progress(done, total):
+    sys.stderr.write('\r{0}/{1}'.format(done, total))
+    if done == total:
+        sys.stderr.write('\n')
+    sys.stderr.flush()
+
+
+def main(args):
+    """Entry point for 'syrup batch'. args[0] is the name of the command.
+    Returns the exit status.
+    """
+    parser = argparse.ArgumentParser(prog='syrup batch', description=__doc__)
+    parser.add_argument('manifest', help='CSV or tab-separated manifest')
+    parser.add_argument('processed', help='Directory to move images to')
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='Check the manifest without moving any files')
+    parser.add_argument('-w', '--workers', type=int, default=4,
+                        help='Number of files moved concurrently')
+    parser.add_argument('-r', '--report',
+                        help='Write the outcome of each row to this CSV file')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='Do not report progress')
+    parser.add_argument('-e', '--embed-metadata', action='store_true',
+                        help='Write barcodes into the XMP metadata of JPEG '
+                             'and TIFF files')
+    parsed = parser.parse_args(args[1:])
+
+    processed = Path(parsed.processed)
+    try:
+        rows = read_manifest(parsed.manifest)
+    except (ValueError, IOError, OSError) as e:
+        print(e)
+        return 1
+    tasks, invalid = validate(rows, processed)
+    for result in invalid:
+        print('Line {0}: [{1}] {2}'.format(result.line, result.source,
+                                           result.message))
+
+    manifest = None
+    if tasks and not parsed.dry_run:
+        if not processed.is_dir():
+            processed.mkdir(parents=True)
+        try:
+            manifest = ProcessedManifest.for_directory(processed)
+        except sqlite3.Error as e:
+            print('Moves will not be recorded - unable to open the manifest '
+                  'in [{0}]: {1}'.format(processed, e))
+
+    start = time.time()
+    try:
+        results = run(tasks, parsed.workers, parsed.dry_run,
+                      None if parsed.quiet else _print_progress,
+                      parsed.embed_metadata, manifest)
+    finally:
+        if manifest:
+            manifest.close()
+    elapsed = time.time() - start
+
+    results.extend(invalid)
+    failed = [r for r in results if 'failed' == r.status]
+    for result in failed:
+        print('Line {0}: [{1}] {2}'.format(result.line, result.source,
+                                           result.message))
+    if parsed.report:
+        write_report(results, parsed.report)
+
+    print('{0} rows: {1} {2}, {3} invalid, {4} failed in {5:.1f}s'.format(
+        len(rows), len(results) - len(invalid) - len(failed),
+        'checked' if parsed.dry_run else 'moved', len(invalid), len(failed),
+        elapsed))
+    return 1 if invalid or failed else 0
@@ -0,0 +1,28 @@
+"""Conversion of images of other depths to 8 bits per channel, for display.
+Does not depend on Qt so that it can be used, and tested, without it.
+"""
+import sys
+
+import numpy as np
+
+
+def as_uint8(image):
+    """image as an array of uint8. 16-bit images are scaled to 8 bits by taking
+    the high byte of each value and floating point images are taken to be in
+    the range [0, 1]. Arrays of uint8 are returned as they are.
+    """
+    if np.uint8 == image.dtype:
+        return image
+    elif np.uint16 == image.dtype.type:
+        # A view of the bytes of each value - the high byte is the second of
+        # each pair for little-endian values
+        if not image.flags.c_contiguous:
+            image = np.ascontiguousarray(image)
+        little = image.dtype.byteorder == '<' or (
+            image.dtype.byteorder in '=|' and 'little' == sys.byteorder)
+        high = image.view(np.uint8)[..., 1::2] if little else image.view(np.uint8)[..., 0::2]
+        return np.ascontiguousarray(high)
+    elif np.issubdtype(image.dtype, np.floating):
+        return (np.clip(image, 0, 1) * 255 + 0.5).astype(np.uint8)
+    else:
+        return np.clip(image, 0, 255).astype(np.uint8)
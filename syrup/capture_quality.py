@@ -0,0 +1,109 @@
+"""Checks of the focus and exposure of captures, so that poor captures can be
+reshot while the specimen is still on the copy stand.
+
+Images are first reduced so that their longer side is at most SIZE pixels,
+so that measurements do not depend on the size of the capture and take a
+bounded time - a few tens of milliseconds. Sharpness is the variance of the
+Laplacian within square tiles: specimens often fill a small part of the frame
+against a plain background, so the sharpness of an image is that of its
+sharper tiles, at the SHARPNESS_PERCENTILE. Exposure is given by the
+proportions of pixels whose brightest channel is at or above HIGHLIGHT_LEVEL,
+which are clipped, or at or below SHADOW_LEVEL, which are black.
+"""
+from collections import namedtuple
+
+import cv2
+
+import numpy as np
+
+
+# Longest side, in pixels, of the image that is measured
+SIZE = 1024
+
+# Width and height of the tiles within which sharpness is measured
+TILE_SIZE = 64
+
+# Percentile of tile sharpness that is the image's sharpness
+SHARPNESS_PERCENTILE = 95
+
+# Levels at and beyond which 8-bit values are clipped
+HIGHLIGHT_LEVEL = 250
+SHADOW_LEVEL = 5
+
+# Outcome of the checks
+Quality = namedtuple('Quality', ['sharpness', 'highlights', 'shadows'])
+
+
+def _reduced(bgr, size):
+    height, width = bgr.shape[:2]
+    scale = float(size) / max(width, height)
+    if scale < 1:
+        bgr = cv2.resize(bgr, (max(1, int(width * scale)),
+                               max(1, int(height * scale))),
+                         interpolation=cv2.INTER_AREA)
+    return bgr
+
+
+def exposure(bgr):
+    """A tuple (highlights, shadows) of the proportions of pixels in the 8-bit
+    BGR or greyscale array bgr that are clipped to white and to black
+    """
+    peak = bgr.max(axis=2) if 3 == bgr.ndim else bgr
+    histogram = np.bincount(peak.ravel(), minlength=256)
+    total = float(peak.size)
+    return (float(histogram[HIGHLIGHT_LEVEL:].sum()) / total,
+            float(histogram[:SHADOW_LEVEL + 1].sum()) / total)
+
+
+def sharpness(grey, tile_size=TILE_SIZE, percentile=SHARPNESS_PERCENTILE):
+    """The percentile of the variance of the Laplacian of the 8-bit greyscale
+    array grey, within tiles of tile_size
+    """
+    laplacian = cv2.Laplacian(grey, cv2.CV_32F)
+    height, width = laplacian.shape
+    rows, columns = height // tile_size, width // tile_size
+    if not rows or not columns:
+        return float(laplacian.var())
+    else:
+        tiles = laplacian[:rows * tile_size, :columns * tile_size].reshape(
+            rows, tile_size, columns, tile_size)
+        return float(np.percentile(tiles.var(axis=(1, 3)), percentile))
+
+
+def assess(bgr, size=SIZE):
+    """The Quality of the 8-bit BGR or greyscale array bgr, reduced to size
+    """
+    reduced = _reduced(bgr, size)
+    highlights, shadows = exposure(reduced)
+    grey = (cv2.cvtColor(reduced, cv2.COLOR_BGR2GRAY)
+            if 3 == reduced.ndim else reduced)
+    return Quality(sharpness(grey), highlights, shadows)
+
+
+class QualityAnalyser(object):
+    """Measures the Quality of images. An analyser for AnalyseAhead.
+    """
+    name = 'quality'
+
+    # Thresholds of poor captures
+    MIN_SHARPNESS = 20.0
+    MAX_HIGHLIGHTS = 0.05
+    MAX_SHADOWS = 0.05
+
+    def __call__(self, bgr):
+        return assess(bgr)
+
+    def problems(self, quality):
+        """A list of descriptions of the problems with the capture of quality
+        """
+        problems = []
+        if quality.sharpness < self.MIN_SHARPNESS:
+            problems.append(u'Might be out of focus (sharpness {0:.0f})'.format(
+                quality.sharpness))
+        if quality.highlights > self.MAX_HIGHLIGHTS:
+            problems.append(u'Overexposed - {0:.0%} of pixels are '
+                            u'white'.format(quality.highlights))
+        if quality.shadows > self.MAX_SHADOWS:
+            problems.append(u'Underexposed - {0:.0%} of pixels are '
+                            u'black'.format(quality.shadows))
+        return problems
@@ -0,0 +1,196 @@
+"""Claims on the images in an inbox that is shared by several instances of
+syrup, so that each image is reviewed by only one of them.
+
+A claim is a file, within the inbox's CLAIMS_DIRECTORY, that is created
+exclusively with O_EXCL and that holds the identity of its owner. Its
+modification time is the start of the lease: owners renew their claims
+periodically and a claim that has not been renewed for LEASE seconds, for
+example because its owner crashed, can be taken by another instance. Stale
+claims are broken by renaming them, which only one instance can do. The
+renamed claim is checked again, in case it was replaced by a fresh claim
+after it was judged to have expired, and restored if it was.
+
+Expiry compares the modification times of claim files, which on a network
+filesystem are set by the server, with the local clock, so the lease should be
+long compared with any clock skew between workstations.
+"""
+import errno
+import hashlib
+import json
+import os
+import socket
+import time
+import uuid
+
+from pathlib import Path
+
+
+# Name of the directory, within the inbox, that holds claims
+CLAIMS_DIRECTORY = '.syrup-claims'
+
+
+class ClaimRegistry(object):
+    """Claims held by one instance on files in inbox
+    """
+
+    # Seconds for which a claim lasts without being renewed
+    LEASE = 120
+
+    def __init__(self, inbox, owner=None, lease=LEASE):
+        self.inbox = Path(inbox)
+        self.directory = self.inbox / CLAIMS_DIRECTORY
+        self.owner = owner if owner else u'{0}:{1}:{2}'.format(
+            socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+        self.lease = lease
+        if not self.directory.is_dir():
+            try:
+                self.directory.mkdir()
+            except OSError as e:
+                # Created by another instance
+                if errno.EEXIST != e.errno:
+                    raise
+
+        # Paths on which this instance holds claims
+        self.held = set()
+
+    def _claim_file(self, path):
+        relative = os.path.relpath(str(path), str(self.inbox))
+        key = hashlib.sha1(relative.encode('utf8')).hexdigest()
+        return self.directory / (key + '.claim')
+
+    def _owner(self, claim):
+        """The owner of claim, '' if it is being written or None if it does
+        not exist
+        """
+        try:
+            with open(str(claim)) as f:
+                return json.loads(f.read() or '{}').get('owner', '')
+        except (IOError, OSError):
+            return None
+        except ValueError:
+            return ''
+
+    def _expired(self, claim):
+        try:
+            return os.stat(str(claim)).st_mtime + self.lease < time.time()
+        except OSError:
+            return False
+
+    def _create(self, claim, path):
+        """Exclusively creates claim. Returns False if it already exists.
+        """
+        try:
+            fd = os.open(str(claim), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError as e:
+            if errno.EEXIST == e.errno:
+                return False
+            else:
+                raise
+        try:
+            os.write(fd, json.dumps({'owner': self.owner,
+                                     'path': str(path)}).encode('utf8'))
+        finally:
+            os.close(fd)
+        return True
+
+    def _restore(self, stale, claim):
+        """Puts back stale, a claim that was renamed in error, unless claim has
+        since been created again
+        """
+        try:
+            # Fails, rather than replacing, if claim exists
+            os.link(str(stale), str(claim))
+        except (AttributeError, OSError) as e:
+            if isinstance(e, OSError) and errno.EEXIST == e.errno:
+                # Taken by a third instance. The owner of stale will find
+                # that it has lost its claim when it next renews.
+                pass
+            else:
+                # Hard links are not supported
+                if not os.path.exists(str(claim)):
+                    os.rename(str(stale), str(claim))
+                    return
+        os.unlink(str(stale))
+
+    def _break(self, claim, owner):
+        """Removes the claim, which was found to be held by owner and to have
+        expired, unless another instance does so first
+        """
+        stale = claim.with_name('{0}.{1}.stale'.format(claim.name,
+                                                       uuid.uuid4().hex))
+        try:
+            os.rename(str(claim), str(stale))
+        except OSError:
+            # Broken by another instance
+            return
+
+        # Another instance might have broken the expired claim and made a
+        # fresh one between the checks and the rename
+        if self._owner(stale) == owner and self._expired(stale):
+            os.unlink(str(stale))
+        else:
+            self._restore(stale, claim)
+
+    def claim(self, path):
+        """Claims path for this instance. Returns True if the claim is held,
+        False if another instance holds it.
+        """
+        claim = self._claim_file(path)
+        for attempt in range(2):
+            if self._create(claim, path):
+                self.held.add(path)
+                return True
+            owner = self._owner(claim)
+            if owner == self.owner:
+                self.held.add(path)
+                os.utime(str(claim), None)
+                return True
+            elif self._expired(claim):
+                self._break(claim, owner)
+            else:
+                return False
+        return False
+
+    def claimed_elsewhere(self, path):
+        """True if another instance holds an unexpired claim on path
+        """
+        claim = self._claim_file(path)
+        owner = self._owner(claim)
+        return (owner is not None and owner != self.owner and
+                not self._expired(claim))
+
+    def release(self, path):
+        """Gives up this instance's claim on path, if it holds one
+        """
+        self.held.discard(path)
+        claim = self._claim_file(path)
+        if self._owner(claim) == self.owner:
+            try:
+                os.unlink(str(claim))
+            except OSError:
+                # Already broken
+                pass
+
+    def release_all(self):
+        for path in list(self.held):
+            self.release(path)
+
+    def renew(self):
+        """Extends the leases of the claims held by this instance. Returns a
+        list of paths whose claims have been lost to other instances, which
+        are no longer held.
+        """
+        lost = []
+        for path in list(self.held):
+            claim = self._claim_file(path)
+            if self._owner(claim) == self.owner:
+                try:
+                    os.utime(str(claim), None)
+                except OSError:
+                    pass
+                else:
+                    continue
+            if not self.claim(path):
+                self.held.discard(path)
+                lost.append(path)
+        return lost
@@ -1,10 +1,12 @@
 from PySide.QtGui import (QFrame, QWidget, QLineEdit, QFormLayout, QPushButton,
                           QHBoxLayout, QVBoxLayout, QLabel, QIcon, QSizePolicy,
-                          QStyle)
+                          QStyle, QCheckBox, QComboBox)
 from PySide.QtCore import Qt, QSize
 
 import syrup
 
+from .pending_queue import ORDERS
+
 
 class _HorizontalLine(QFrame):
     """A horizontal line
@@ -66,13 +68,21 @@ class Controls(QWidget):
     def __init__(self, parent=None):
         super(Controls, self).__init__(parent)
 
-        # Specimen number and location edit boxes
+        # Specimen number and location edit boxes, each with a label that
+        # shows whether the value was detected in the image
         self.specimen = QLineEdit()
         self.location = QLineEdit()
+        self.specimen_detected = QLabel()
+        self.location_detected = QLabel()
         l = QFormLayout()
         l.setFieldGrowthPolicy(QFormLayout.ExpandingFieldsGrow)
-        l.addRow('Specimen barcode', self.specimen)
-        l.addRow('Location barcode', self.location)
+        for label, edit, detected in (
+                ('Specimen barcode', self.specimen, self.specimen_detected),
+                ('Location barcode', self.location, self.location_detected)):
+            row = QHBoxLayout()
+            row.addWidget(edit)
+            row.addWidget(detected)
+            l.addRow(label, row)
         form = QWidget()
         form.setLayout(l)
 
@@ -85,10 +95,16 @@ class Controls(QWidget):
         buttons = QWidget()
         buttons.setLayout(l)
 
+        # Problems found with the image under review
+        self.warnings = QLabel()
+        self.warnings.setWordWrap(True)
+        self.warnings.setStyleSheet('color: red')
+
         # A container for the image handling controls
         layout = QVBoxLayout()
         layout.setAlignment(Qt.AlignTop)
         layout.addWidget(form)
+        layout.addWidget(self.warnings)
         layout.addWidget(buttons)
         self.image_handling = QWidget()
         self.image_handling.setLayout(layout)
@@ -96,10 +112,27 @@ class Controls(QWidget):
         # Buttons to choose the inbox and processed directories
         self.inbox = SelectedDirectoryWidget(prefix='Watch for new images in ')
         self.processed = SelectedDirectoryWidget(prefix='Move processed images to ')
+        self.ingest_backlog = QCheckBox('Queue images already in the inbox')
+        self.embed_metadata = QCheckBox('Write barcodes into JPEG and TIFF '
+                                        'metadata')
+
+        # The order in which queued images are reviewed. Item data are the
+        # orders defined in pending_queue.
+        self.review_order = QComboBox()
+        for order, description in ORDERS.items():
+            self.review_order.addItem(description, order)
+        order = QWidget()
+        l = QFormLayout()
+        l.addRow('Review', self.review_order)
+        order.setLayout(l)
+
         l = QVBoxLayout()
         l.addWidget(QLabel('Directories'))
         l.addWidget(self.inbox)
+        l.addWidget(self.ingest_backlog)
+        l.addWidget(order)
         l.addWidget(self.processed)
+        l.addWidget(self.embed_metadata)
         directories = QWidget()
         directories.setLayout(l)
 
@@ -116,7 +149,34 @@ class Controls(QWidget):
         layout.addWidget(directories)
         self.setLayout(layout)
 
+    # Confidence at and above which a detected value is shown as certain
+    HIGH_CONFIDENCE = 0.75
+
     def clear(self):
         "Clears the line edit controls"
         for control in (self.specimen, self.location):
             control.setText('')
+        for label in (self.specimen_detected, self.location_detected):
+            self.show_detection(label, None)
+        self.set_warnings([])
+
+    def set_warnings(self, warnings):
+        """Shows the list of strings warnings, hiding the label if there are
+        none
+        """
+        self.warnings.setText(u'\n'.join(warnings))
+        self.warnings.setVisible(bool(warnings))
+
+    def show_detection(self, label, confidence):
+        """Shows in label that a value was detected with confidence, from 0 to
+        1, or clears label if confidence is None
+        """
+        if confidence is None:
+            label.setText('')
+            label.setToolTip('')
+        else:
+            colour = 'green' if confidence >= self.HIGH_CONFIDENCE else 'darkorange'
+            label.setText(u'<font color="{0}">Detected {1:.0%}</font>'.format(
+                colour, confidence))
+            label.setToolTip(u'Read from a barcode in the image with {0:.0%} '
+                             u'confidence - please check'.format(confidence))
@@ -0,0 +1,151 @@
+import logging
+import threading
+
+from pathlib import Path
+
+from PySide import QtCore
+
+from .lru_cache import LRUCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class _DecodeSignals(QtCore.QObject):
+    """Signals emitted by _DecodeTask
+    """
+    decoded = QtCore.Signal(object, object, object)
+    failed = QtCore.Signal(object, str)
+
+
+class _DecodeTask(QtCore.QRunnable):
+    """Decodes an image file on a thread pool thread, unless cancelled, a
+    threading.Event, is set before the task starts
+    """
+    def __init__(self, path, target_size, cancelled, signals):
+        super(_DecodeTask, self).__init__()
+        self._path = path
+        self._target_size = target_size
+        self._cancelled = cancelled
+        self._signals = signals
+
+    def run(self):
+        if self._cancelled.is_set():
+            logger.debug(u'Cancelled decode of [%s]', self._path)
+            return
+        try:
+            # Imported here so that OpenCV is not imported at startup
+            from .imaging import read_image
+            image = read_image(self._path, self._target_size)
+        except Exception as e:
+            self._signals.failed.emit(self._path, str(e))
+        else:
+            self._signals.decoded.emit(self._path, image, self._target_size)
+
+
+def _covers(decoded_for, target_size):
+    """True if an image decoded to fill decoded_for, a (width, height) or None
+    for full size, also fills target_size
+    """
+    if decoded_for is None:
+        return True
+    elif target_size is None:
+        return False
+    else:
+        return (decoded_for[0] >= target_size[0] and
+                decoded_for[1] >= target_size[1])
+
+
+class DecodeAhead(QtCore.QObject):
+    """Decodes images in the background before they are reviewed, holding the
+    results in a least-recently-used cache of QImages. Images are decoded
+    again if they are wanted at a larger size than that for which they were
+    decoded, for example after the window has been enlarged.
+    """
+
+    # Emitted when an image has been decoded and is ready to be taken
+    decoded = QtCore.Signal(Path)
+
+    # Number of upcoming images to decode
+    DEPTH = 3
+
+    # Maximum bytes of decoded images to hold
+    BUDGET = 512 * 1024 * 1024
+
+    # Number of images decoded concurrently
+    THREADS = 2
+
+    def __init__(self, depth=DEPTH, budget=BUDGET, parent=None):
+        super(DecodeAhead, self).__init__(parent)
+        self._depth = depth
+        self._cache = LRUCache(budget, sizeof=lambda image: image.byteCount())
+
+        # The target_size for which each cached image was decoded
+        self._decoded_for = {}
+
+        # Paths that have been requested and not since evicted, and the
+        # cancellation events of paths that are being decoded
+        self._wanted = set()
+        self._in_flight = {}
+
+        self._pool = QtCore.QThreadPool(self)
+        self._pool.setMaxThreadCount(self.THREADS)
+        self._signals = _DecodeSignals(self)
+        self._signals.decoded.connect(self._decoded, QtCore.Qt.QueuedConnection)
+        self._signals.failed.connect(self._failed, QtCore.Qt.QueuedConnection)
+
+    def prefetch(self, paths, target_size=None):
+        """Starts decoding the first self._depth of paths, in order, that are
+        neither cached nor already being decoded. Images are decoded at a
+        scale large enough to fill target_size - see imaging.read_image.
+        Decodes of paths that are no longer among them are cancelled if they
+        have not yet started.
+        """
+        paths = paths[:self._depth]
+        for path in set(self._in_flight).difference(paths):
+            self._in_flight.pop(path).set()
+            self._wanted.discard(path)
+        for path in paths:
+            self._wanted.add(path)
+            if (path not in self._in_flight and
+                    not self._cached(path, target_size)):
+                cancelled = threading.Event()
+                self._in_flight[path] = cancelled
+                self._pool.start(_DecodeTask(path, target_size, cancelled,
+                                             self._signals))
+
+    def take(self, path, target_size=None):
+        """The decoded QImage of path or None if path has not been decoded at
+        a scale that fills target_size
+        """
+        if self._cached(path, target_size):
+            return self._cache.get(path)
+        else:
+            return None
+
+    def evict(self, path):
+        """Discards path's image. Call when path has been moved or ignored.
+        """
+        self._wanted.discard(path)
+        self._decoded_for.pop(path, None)
+        self._cache.pop(path)
+
+    def _cached(self, path, target_size):
+        if path not in self._cache:
+            # Might have been evicted by the cache
+            self._decoded_for.pop(path, None)
+            return False
+        else:
+            return _covers(self._decoded_for.get(path), target_size)
+
+    def _decoded(self, path, image, target_size):
+        self._in_flight.pop(path, None)
+        if path in self._wanted:
+            self._cache.put(path, image)
+            self._decoded_for[path] = target_size
+            self.decoded.emit(path)
+
+    def _failed(self, path, message):
+        # The error will be reported to the user if and when path is reviewed
+        logger.warning(u'DecodeAhead failed to decode [%s]: %s', path, message)
+        self._in_flight.pop(path, None)
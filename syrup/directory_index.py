@@ -0,0 +1,66 @@
+from pathlib import Path
+
+try:
+    from os import scandir
+except ImportError:
+    # Python < 3.5
+    from scandir import scandir
+
+
+class DirectoryIndex(object):
+    """The files in a directory whose paths match a regular expression.
+
+    rescan() reports the files that have been added and removed since the
+    previous scan. Directory entries are read with scandir, which on most
+    platforms gives each entry's type without a separate stat call, and
+    entries that were present in the previous scan are not examined again.
+    """
+    def __init__(self, directory, regex):
+        self.directory = Path(directory)
+        self._regex = regex
+        self._files = {}
+        self.rescan()
+
+    def __contains__(self, path):
+        return Path(path).name in self._files
+
+    def __len__(self):
+        return len(self._files)
+
+    @property
+    def files(self):
+        """A set of Paths
+        """
+        return set(self._files.values())
+
+    def rescan(self):
+        """Updates the index. Returns a tuple of sorted lists of the Paths
+        added and removed since the previous scan.
+        """
+        previous = self._files
+        current = {}
+        for entry in scandir(str(self.directory)):
+            if entry.name in previous:
+                current[entry.name] = previous[entry.name]
+            elif entry.is_file() and self._regex.match(entry.path):
+                current[entry.name] = Path(entry.path)
+
+        added = sorted(p for name, p in current.items() if name not in previous)
+        removed = sorted(p for name, p in previous.items() if name not in current)
+        self._files = current
+        return added, removed
+
+
+def backlog(directory, regex):
+    """A list of tuples (mtime, Path) of the files in directory whose paths
+    match regex, oldest first
+    """
+    files = []
+    for entry in scandir(str(directory)):
+        if entry.is_file() and regex.match(entry.path):
+            try:
+                files.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                # Removed since the directory was read
+                pass
+    return [(mtime, Path(path)) for mtime, path in sorted(files)]
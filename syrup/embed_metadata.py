@@ -0,0 +1,305 @@
+"""Writes specimen and location barcodes into the XMP metadata of JPEG and
+TIFF files without decoding or re-encoding their image data.
+
+The source file is streamed to the destination with the metadata inserted:
+    JPEG    an XMP APP1 segment is written after any JFIF and Exif segments
+    TIFF    the source is copied unaltered and an XMP packet and a copy of the
+            first IFD, with the XMP tag (700), are appended. The header is
+            patched to point at the new IFD. All other offsets in the file
+            remain valid. Classic TIFFs of less than 4 GB only.
+
+An existing XMP packet is kept and a description of the barcodes is added to
+it. As by verified_copy.copy_file, the copy is written to a temporary file
+that is read back and checked before it is renamed to the destination.
+"""
+import hashlib
+import os
+import shutil
+import struct
+import time
+
+from xml.sax.saxutils import escape, quoteattr
+
+from .verified_copy import (BUFFER_SIZE, HASH, CopyResult, hash_file,
+                            partial_path, replace)
+
+
+# Namespace of the properties written by syrup
+NAMESPACE = 'https://github.com/NaturalHistoryMuseum/syrup/ns/1.0/'
+
+# Identifies the APP1 segment that holds a JPEG's XMP packet
+XMP_JPEG_HEADER = b'http://ns.adobe.com/xap/1.0/\x00'
+
+# The TIFF tag that holds an XMP packet
+XMP_TIFF_TAG = 700
+
+# Largest XMP packet that fits in a single JPEG segment
+_MAX_JPEG_XMP = 0xffff - 2 - len(XMP_JPEG_HEADER)
+
+_PACKET = u'''<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?>
+<x:xmpmeta xmlns:x="adobe:ns:meta/">
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+{0}
+</rdf:RDF>
+</x:xmpmeta>
+<?xpacket end="w"?>'''
+
+_DESCRIPTION = u'''<rdf:Description rdf:about=""
+ xmlns:dc="http://purl.org/dc/elements/1.1/"
+ xmlns:syrup={namespace}
+ syrup:specimen={specimen}
+ syrup:location={location}>
+<dc:identifier>{identifier}</dc:identifier>
+</rdf:Description>'''
+
+
+def xmp_description(specimen, location):
+    """Bytes of an rdf:Description of specimen and location. The specimen is
+    also given as the Dublin Core identifier.
+    """
+    return _DESCRIPTION.format(namespace=quoteattr(NAMESPACE),
+                               specimen=quoteattr(specimen),
+                               location=quoteattr(location),
+                               identifier=escape(specimen)).encode('utf8')
+
+
+def merge_xmp(existing, description):
+    """An XMP packet holding the rdf:Description description and, if given,
+    the descriptions in the existing packet
+    """
+    end = existing.rfind(b'</rdf:RDF>') if existing else -1
+    if end < 0:
+        return _PACKET.encode('utf8').replace(b'{0}', description)
+    else:
+        return existing[:end] + description + b'\n' + existing[end:]
+
+
+class _HashingWriter(object):
+    """Writes to a file object, hashing the data written
+    """
+    def __init__(self, f):
+        self.f = f
+        self.hasher = hashlib.new(HASH)
+        self.size = 0
+
+    def write(self, data):
+        self.hasher.update(data)
+        self.f.write(data)
+        self.size += len(data)
+
+
+def _copy(fsrc, writer, buffer_size=BUFFER_SIZE):
+    while True:
+        data = fsrc.read(buffer_size)
+        if not data:
+            break
+        writer.write(data)
+
+
+def _read_exactly(f, n):
+    data = f.read(n)
+    if len(data) < n:
+        raise ValueError('Unexpected end of file')
+    return data
+
+
+def _jpeg_segments(f):
+    """Reads the segments that precede the first marker that is not APPn or
+    COM. Returns a tuple (segments, marker) where segments is a list of the
+    bytes of each segment, including its marker and length, and marker is the
+    two bytes of the marker that ended the list.
+    """
+    if f.read(2) != b'\xff\xd8':
+        raise ValueError('Not a JPEG')
+    segments = []
+    while True:
+        marker = _read_exactly(f, 2)
+        if marker[0:1] != b'\xff':
+            raise ValueError('Corrupt JPEG')
+        code = bytearray(marker)[1]
+        while 0xff == code:
+            # Fill bytes
+            code = bytearray(_read_exactly(f, 1))[0]
+        marker = b'\xff' + bytearray([code])
+        if not (0xe0 <= code <= 0xef or 0xfe == code):
+            return segments, bytes(marker)
+        length = _read_exactly(f, 2)
+        data = _read_exactly(f, struct.unpack('>H', length)[0] - 2)
+        segments.append(bytes(marker) + length + data)
+
+
+def _is_xmp_segment(segment):
+    return (segment[:2] == b'\xff\xe1' and
+            segment[4:4 + len(XMP_JPEG_HEADER)] == XMP_JPEG_HEADER)
+
+
+def _embed_jpeg(fsrc, writer, description):
+    segments, marker = _jpeg_segments(fsrc)
+    existing = [s for s in segments if _is_xmp_segment(s)]
+    packet = merge_xmp(existing[0][4 + len(XMP_JPEG_HEADER):]
+                       if existing else None, description)
+    if len(packet) > _MAX_JPEG_XMP:
+        raise ValueError('XMP packet of {0} bytes is too large for a JPEG '
+                         'segment'.format(len(packet)))
+    segments = [s for s in segments if not _is_xmp_segment(s)]
+
+    # JFIF and Exif segments must come first
+    leading = 0
+    while (leading < len(segments) and
+           (segments[leading][:2] == b'\xff\xe0' or
+            segments[leading][4:10] == b'Exif\x00\x00')):
+        leading += 1
+
+    xmp = (b'\xff\xe1' + struct.pack('>H', 2 + len(XMP_JPEG_HEADER) +
+                                     len(packet)) +
+           XMP_JPEG_HEADER + packet)
+    writer.write(b'\xff\xd8')
+    for segment in segments[:leading] + [xmp] + segments[leading:]:
+        writer.write(segment)
+    writer.write(marker)
+    _copy(fsrc, writer)
+
+
+def _embed_tiff(fsrc, writer, description):
+    header = _read_exactly(fsrc, 8)
+    if header[:4] == b'II*\x00':
+        endian = '<'
+    elif header[:4] == b'MM\x00*':
+        endian = '>'
+    elif header[:4] in (b'II+\x00', b'MM\x00+'):
+        raise ValueError('BigTIFF is not supported')
+    else:
+        raise ValueError('Not a TIFF')
+
+    ifd, = struct.unpack(endian + 'I', header[4:8])
+    fsrc.seek(ifd)
+    count, = struct.unpack(endian + 'H', _read_exactly(fsrc, 2))
+    entries = _read_exactly(fsrc, 12 * count)
+    next_ifd = _read_exactly(fsrc, 4)
+    entries = [entries[12 * i:12 * (i + 1)] for i in range(count)]
+
+    # The existing XMP packet, if any
+    existing = None
+    for entry in entries:
+        tag, type_, n = struct.unpack(endian + 'HHI', entry[:8])
+        if XMP_TIFF_TAG == tag:
+            if n <= 4:
+                existing = entry[8:8 + n]
+            else:
+                fsrc.seek(struct.unpack(endian + 'I', entry[8:12])[0])
+                existing = _read_exactly(fsrc, n)
+    packet = merge_xmp(existing, description)
+
+    # Offsets of the packet and of the new IFD, which start on word
+    # boundaries
+    size = os.fstat(fsrc.fileno()).st_size
+    padding = size % 2
+    packet_offset = size + padding
+    ifd_offset = packet_offset + len(packet) + len(packet) % 2
+    end = ifd_offset + 2 + 12 * (count + 1) + 4
+    if end >= 2 ** 32:
+        raise ValueError('TIFF would exceed 4 GB')
+
+    xmp = struct.pack(endian + 'HHII', XMP_TIFF_TAG, 1, len(packet),
+                      packet_offset)
+    entries = [e for e in entries
+               if struct.unpack(endian + 'H', e[:2])[0] != XMP_TIFF_TAG]
+    entries = sorted(entries + [xmp],
+                     key=lambda e: struct.unpack(endian + 'H', e[:2])[0])
+
+    writer.write(header[:4] + struct.pack(endian + 'I', ifd_offset))
+    fsrc.seek(8)
+    _copy(fsrc, writer)
+    writer.write(b'\x00' * padding + packet + b'\x00' * (len(packet) % 2))
+    writer.write(struct.pack(endian + 'H', len(entries)))
+    for entry in entries:
+        writer.write(entry)
+    writer.write(next_ifd)
+
+
+def can_embed(path):
+    """True if metadata can be embedded in the image file at path
+    """
+    with open(str(path), 'rb') as f:
+        header = f.read(4)
+    return header[:2] == b'\xff\xd8' or header in (b'II*\x00', b'MM\x00*')
+
+
+def copy_with_metadata(src, destination, specimen, location, verify=True):
+    """Copies src to destination, which is created or replaced, with
+    specimen and location in its XMP metadata. Returns a CopyResult. Raises
+    ValueError if src is not a JPEG or TIFF in which metadata can be
+    embedded. If verify is True then the copy is read back and IOError is
+    raised if its contents differ from those written. destination is not
+    altered if an error is raised.
+    """
+    start = time.time()
+    description = xmp_description(specimen, location)
+    partial = partial_path(destination)
+    try:
+        with open(str(src), 'rb') as fsrc:
+            header = fsrc.read(2)
+            fsrc.seek(0)
+            embed = _embed_jpeg if b'\xff\xd8' == header else _embed_tiff
+            with open(str(partial), 'wb') as fdst:
+                writer = _HashingWriter(fdst)
+                embed(fsrc, writer, description)
+                fdst.flush()
+                os.fsync(fdst.fileno())
+
+        digest = writer.hasher.hexdigest()
+        if verify and hash_file(partial) != digest:
+            raise IOError('Copy of [{0}] to [{1}] does not match the data '
+                          'written'.format(src, destination))
+
+        shutil.copystat(str(src), str(partial))
+        replace(partial, destination)
+    except Exception:
+        if partial.exists():
+            partial.unlink()
+        raise
+
+    return CopyResult(writer.size, time.time() - start,
+                      digest if verify else None, 'embedded')
+
+
+def move_with_metadata(src, destination, specimen, location, verify=True):
+    """Copies src to destination with copy_with_metadata and then removes src.
+    Returns the CopyResult.
+    """
+    result = copy_with_metadata(src, destination, specimen, location, verify)
+    os.unlink(str(src))
+    return result
+
+
+def read_xmp(path):
+    """The bytes of the XMP packet of the JPEG or TIFF file at path, or None
+    """
+    with open(str(path), 'rb') as f:
+        if f.read(2) == b'\xff\xd8':
+            f.seek(0)
+            try:
+                segments, marker = _jpeg_segments(f)
+            except ValueError:
+                return None
+            for segment in segments:
+                if _is_xmp_segment(segment):
+                    return segment[4 + len(XMP_JPEG_HEADER):]
+            return None
+        else:
+            f.seek(0)
+            header = f.read(8)
+            if header[:4] not in (b'II*\x00', b'MM\x00*'):
+                return None
+            endian = '<' if header[:2] == b'II' else '>'
+            f.seek(struct.unpack(endian + 'I', header[4:8])[0])
+            count, = struct.unpack(endian + 'H', f.read(2))
+            for i in range(count):
+                entry = f.read(12)
+                tag, type_, n = struct.unpack(endian + 'HHI', entry[:8])
+                if XMP_TIFF_TAG == tag:
+                    if n <= 4:
+                        return entry[8:8 + n]
+                    f.seek(struct.unpack(endian + 'I', entry[8:12])[0])
+                    return f.read(n)
+            return None
@@ -0,0 +1,88 @@
+"""Detection of directories that are on network filesystems, on which change
+notifications from QFileSystemWatcher and inotify are unreliable - changes
+made by other machines, such as the capture workstation, are often not
+reported at all.
+
+On Linux the filesystem type is read from /proc/mounts and on Windows the
+drive type is given by GetDriveType. Elsewhere directories are taken to be
+local.
+"""
+import ctypes
+import os
+import sys
+
+
+# Linux filesystem types that are served over a network
+NETWORK_TYPES = frozenset([
+    '9p', 'afs', 'ceph', 'cifs', 'coda', 'davfs', 'fuse.sshfs', 'glusterfs',
+    'gpfs', 'lustre', 'ncpfs', 'nfs', 'nfs4', 'smb3', 'smbfs',
+])
+
+# GetDriveType's value for network drives
+DRIVE_REMOTE = 4
+
+MOUNTS = '/proc/mounts'
+
+
+def _unescape(field):
+    """field from /proc/mounts with octal escapes, such as '\\040' for a
+    space, replaced
+    """
+    parts = field.split('\\')
+    res = [parts[0]]
+    for part in parts[1:]:
+        if len(part) >= 3 and all(c in '01234567' for c in part[:3]):
+            res.append(chr(int(part[:3], 8)) + part[3:])
+        else:
+            res.append('\\' + part)
+    return ''.join(res)
+
+
+def mount_type(path, mounts):
+    """The type of the filesystem that holds the absolute path path, given
+    mounts, the contents of /proc/mounts. Returns None if no mount point
+    holds path.
+    """
+    best, type = None, None
+    for line in mounts.splitlines():
+        fields = line.split()
+        if len(fields) >= 3:
+            point = _unescape(fields[1])
+            prefix = point.rstrip('/') + '/'
+            if path == point or path.startswith(prefix):
+                # The last of equally long mount points is the one in use
+                if best is None or len(point) >= len(best):
+                    best, type = point, fields[2]
+    return type
+
+
+def _linux_is_network(path):
+    try:
+        with open(MOUNTS) as f:
+            mounts = f.read()
+    except (IOError, OSError):
+        return False
+    return mount_type(os.path.realpath(str(path)), mounts) in NETWORK_TYPES
+
+
+def _windows_is_network(path):
+    path = os.path.abspath(str(path))
+    drive, tail = os.path.splitdrive(path)
+    if drive.startswith('\\\\'):
+        # A UNC path - \\server\share
+        return True
+    elif drive:
+        return DRIVE_REMOTE == ctypes.windll.kernel32.GetDriveTypeW(drive + '\\')
+    else:
+        return False
+
+
+def is_network_filesystem(path):
+    """True if the directory at path is known to be on a network filesystem
+    """
+    if sys.platform.startswith('linux'):
+        return _linux_is_network(path)
+    elif 'win32' == sys.platform:
+        return _windows_is_network(path)
+    else:
+        return False
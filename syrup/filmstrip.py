@@ -0,0 +1,168 @@
+import logging
+import threading
+
+from pathlib import Path
+
+from PySide import QtCore
+from PySide.QtGui import QListWidget, QListWidgetItem, QListView, QPixmap, QIcon
+
+from .lru_cache import LRUCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class _ThumbnailSignals(QtCore.QObject):
+    """Signals emitted by _ThumbnailTask
+    """
+    ready = QtCore.Signal(object, object)
+    failed = QtCore.Signal(object, str)
+
+
+class _ThumbnailTask(QtCore.QRunnable):
+    """Reads a thumbnail from the cache or, if it is not cached, makes and
+    caches it, on a thread pool thread, unless cancelled, a threading.Event, is
+    set before the task starts
+    """
+    def __init__(self, path, size, cache, cancelled, signals):
+        super(_ThumbnailTask, self).__init__()
+        self._path = path
+        self._size = size
+        self._cache = cache
+        self._cancelled = cancelled
+        self._signals = signals
+
+    def run(self):
+        if self._cancelled.is_set():
+            return
+        try:
+            data = self._cache.get(self._path) if self._cache else None
+            if data is None:
+                # Imported here so that OpenCV is not imported at startup
+                from .imaging import thumbnail
+                data = thumbnail(self._path, self._size)
+                if self._cache:
+                    self._cache.put(self._path, data)
+        except Exception as e:
+            self._signals.failed.emit(self._path, str(e))
+        else:
+            self._signals.ready.emit(self._path, data)
+
+
+class _PruneTask(QtCore.QRunnable):
+    """Prunes a ThumbnailCache on a thread pool thread
+    """
+    def __init__(self, cache, max_bytes):
+        super(_PruneTask, self).__init__()
+        self._cache = cache
+        self._max_bytes = max_bytes
+
+    def run(self):
+        try:
+            removed = self._cache.prune(self._max_bytes)
+        except Exception as e:
+            logger.warning(u'Filmstrip unable to prune thumbnails: %s', e)
+        else:
+            logger.debug(u'Filmstrip pruned [%d] thumbnails', removed)
+
+
+class Filmstrip(QListWidget):
+    """A horizontal strip of thumbnails of image files. Thumbnails are made in
+    the background and stored in cache, a ThumbnailCache, if given.
+    """
+
+    # Emitted when the user clicks a thumbnail
+    selected = QtCore.Signal(Path)
+
+    # Width and height of thumbnails
+    THUMBNAIL_SIZE = 96
+
+    # Maximum number of thumbnails shown
+    MAX_ITEMS = 100
+
+    # Number of thumbnails made concurrently
+    THREADS = 2
+
+    # Maximum bytes of thumbnails kept on disk
+    CACHE_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, cache=None, parent=None):
+        super(Filmstrip, self).__init__(parent)
+        self.setViewMode(QListView.IconMode)
+        self.setFlow(QListView.LeftToRight)
+        self.setWrapping(False)
+        self.setMovement(QListView.Static)
+        self.setUniformItemSizes(True)
+        self.setTextElideMode(QtCore.Qt.ElideMiddle)
+        size = self.THUMBNAIL_SIZE
+        self.setIconSize(QtCore.QSize(size, size))
+        self.setGridSize(QtCore.QSize(size + 16, size + 24))
+        self.setFixedHeight(size + 48)
+        self.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        self.itemClicked.connect(self._clicked)
+
+        self._cache = cache
+        self._paths = []
+        self._items = {}
+
+        # Icons of recently shown files, the cancellation events of files for
+        # which thumbnails have been requested and files that could not be read
+        self._icons = LRUCache(2 * self.MAX_ITEMS)
+        self._requested = {}
+        self._unreadable = set()
+
+        self._pool = QtCore.QThreadPool(self)
+        self._pool.setMaxThreadCount(self.THREADS)
+        self._signals = _ThumbnailSignals(self)
+        self._signals.ready.connect(self._ready, QtCore.Qt.QueuedConnection)
+        self._signals.failed.connect(self._failed, QtCore.Qt.QueuedConnection)
+        if cache:
+            self._pool.start(_PruneTask(cache, self.CACHE_BYTES))
+
+    def set_paths(self, paths):
+        """Shows thumbnails of the first MAX_ITEMS of paths. Thumbnails of
+        files that are no longer shown are cancelled if not yet started.
+        """
+        paths = list(paths)[:self.MAX_ITEMS]
+        if paths != self._paths:
+            self._paths = paths
+            self.clear()
+            self._items = {}
+            for path in paths:
+                item = QListWidgetItem(path.name)
+                item.setToolTip(str(path))
+                item.setData(QtCore.Qt.UserRole, str(path))
+                icon = self._icons.get(path)
+                if icon:
+                    item.setIcon(icon)
+                elif (path not in self._requested and
+                      path not in self._unreadable):
+                    cancelled = threading.Event()
+                    self._requested[path] = cancelled
+                    self._pool.start(_ThumbnailTask(path, self.THUMBNAIL_SIZE,
+                                                    self._cache, cancelled,
+                                                    self._signals))
+                self.addItem(item)
+                self._items[path] = item
+            for path in set(self._requested).difference(self._items):
+                self._requested.pop(path).set()
+
+    def _clicked(self, item):
+        self.selected.emit(Path(item.data(QtCore.Qt.UserRole)))
+
+    def _ready(self, path, data):
+        self._requested.pop(path, None)
+        pixmap = QPixmap()
+        if pixmap.loadFromData(data):
+            icon = QIcon(pixmap)
+            self._icons.put(path, icon)
+            if path in self._items:
+                self._items[path].setIcon(icon)
+
+    def _failed(self, path, message):
+        # path is not tried again. The error will be reported to the user if
+        # and when path is reviewed.
+        logger.warning(u'Filmstrip failed to make thumbnail of [%s]: %s', path,
+                       message)
+        self._requested.pop(path, None)
+        self._unreadable.add(path)
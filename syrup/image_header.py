@@ -0,0 +1,242 @@
+"""Reads image dimensions from file headers without decoding pixel data
+"""
+import struct
+
+
+def _jpeg_size(f):
+    if f.read(2) != b'\xff\xd8':
+        return None
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0:1] != b'\xff':
+            return None
+        code = bytearray(marker)[1]
+        while 0xff == code:
+            # Fill bytes
+            code = bytearray(f.read(1) or b'\x00')[0]
+        if 0xd8 <= code <= 0xd9 or 0xd0 <= code <= 0xd7 or 0x01 == code:
+            # Standalone markers have no length
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        length, = struct.unpack('>H', length)
+        if 0xc0 <= code <= 0xcf and code not in (0xc4, 0xc8, 0xcc):
+            # Start of frame: precision, height, width
+            header = f.read(5)
+            if len(header) < 5:
+                return None
+            height, width = struct.unpack('>xHH', header)
+            return (width, height)
+        else:
+            f.seek(length - 2, 1)
+
+
+def _png_size(f):
+    header = f.read(24)
+    if len(header) < 24 or header[:8] != b'\x89PNG\r\n\x1a\n' or header[12:16] != b'IHDR':
+        return None
+    else:
+        return struct.unpack('>II', header[16:24])
+
+
+# Sizes of the TIFF field types BYTE, SHORT and LONG
+_TIFF_TYPES = {1: ('B', 1), 3: ('H', 2), 4: ('I', 4)}
+
+
+def _tiff_fields(f):
+    """A tuple (endian, fields), where fields is a dict of tag to list of
+    values, for the first IFD of the TIFF file f. Returns None if f is not a
+    TIFF. Fields of types other than BYTE, SHORT and LONG are ignored.
+    """
+    header = f.read(8)
+    if header[:4] == b'II*\x00':
+        endian = '<'
+    elif header[:4] == b'MM\x00*':
+        endian = '>'
+    else:
+        return None
+    offset, = struct.unpack(endian + 'I', header[4:8])
+    f.seek(offset)
+    count = f.read(2)
+    if len(count) < 2:
+        return None
+    count, = struct.unpack(endian + 'H', count)
+    entries = f.read(12 * count)
+    if len(entries) < 12 * count:
+        return None
+
+    fields = {}
+    for i in range(count):
+        entry = entries[12 * i:12 * (i + 1)]
+        tag, type_, n = struct.unpack(endian + 'HHI', entry[:8])
+        if type_ in _TIFF_TYPES:
+            code, size = _TIFF_TYPES[type_]
+            if n * size <= 4:
+                data = entry[8:8 + n * size]
+            else:
+                value_offset, = struct.unpack(endian + 'I', entry[8:12])
+                f.seek(value_offset)
+                data = f.read(n * size)
+                if len(data) < n * size:
+                    return None
+            fields[tag] = list(struct.unpack(endian + code * n, data))
+    return endian, fields
+
+
+def _tiff_size(f):
+    res = _tiff_fields(f)
+    if res:
+        endian, fields = res
+        if 256 in fields and 257 in fields:
+            return (fields[256][0], fields[257][0])
+    return None
+
+
+def _bmp_size(f):
+    header = f.read(26)
+    if len(header) < 26 or header[:2] != b'BM':
+        return None
+    else:
+        width, height = struct.unpack('<ii', header[18:26])
+        return (width, abs(height))
+
+
+def image_size(path):
+    """A tuple (width, height) of the image file at path or None if the
+    format is not recognised.
+    """
+    with open(str(path), 'rb') as f:
+        for reader in (_jpeg_size, _png_size, _tiff_size, _bmp_size):
+            f.seek(0)
+            size = reader(f)
+            if size:
+                return size
+    return None
+
+
+def _exif_segment(f):
+    """The data of the Exif APP1 segment of the JPEG file f, from the start of
+    its TIFF header, or None if f is not a JPEG or has no Exif segment
+    """
+    if f.read(2) != b'\xff\xd8':
+        return None
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0:1] != b'\xff':
+            return None
+        code = bytearray(marker)[1]
+        while 0xff == code:
+            # Fill bytes
+            code = bytearray(f.read(1) or b'\x00')[0]
+        if 0xd9 == code or 0xda == code:
+            # End of image or start of scan - metadata precedes image data
+            return None
+        elif 0xd8 == code or 0xd0 <= code <= 0xd7 or 0x01 == code:
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        length, = struct.unpack('>H', length)
+        if 0xe1 == code:
+            data = f.read(length - 2)
+            if data[:6] == b'Exif\x00\x00':
+                return data[6:]
+        else:
+            f.seek(length - 2, 1)
+
+
+def _ifd(data, endian, offset):
+    """A tuple (fields, next), where fields is a dict of tag to first value of
+    SHORT and LONG fields, of the IFD at offset within data. next is the
+    offset of the next IFD or 0.
+    """
+    count, = struct.unpack_from(endian + 'H', data, offset)
+    fields = {}
+    for i in range(count):
+        tag, type_, n = struct.unpack_from(endian + 'HHI', data, offset + 2 + 12 * i)
+        if 3 == type_:
+            fields[tag], = struct.unpack_from(endian + 'H', data, offset + 10 + 12 * i)
+        elif 4 == type_:
+            fields[tag], = struct.unpack_from(endian + 'I', data, offset + 10 + 12 * i)
+    next, = struct.unpack_from(endian + 'I', data, offset + 2 + 12 * count)
+    return fields, next
+
+
+def exif_thumbnail(path):
+    """The bytes of the JPEG thumbnail embedded in the Exif data of the JPEG
+    file at path, or None if there is no thumbnail
+    """
+    with open(str(path), 'rb') as f:
+        data = _exif_segment(f)
+    if not data or data[:2] not in (b'II', b'MM'):
+        return None
+    endian = '<' if data[:2] == b'II' else '>'
+    try:
+        ifd0, = struct.unpack_from(endian + 'I', data, 4)
+        fields, ifd1 = _ifd(data, endian, ifd0)
+        if not ifd1:
+            return None
+        fields, next = _ifd(data, endian, ifd1)
+    except struct.error:
+        # Truncated or corrupt
+        return None
+    # JPEGInterchangeFormat and JPEGInterchangeFormatLength
+    start, length = fields.get(0x201), fields.get(0x202)
+    if start and length and data[start:start + 2] == b'\xff\xd8':
+        return bytes(data[start:start + length])
+    else:
+        return None
+
+
+def reduction_factor(image_size, target_size, factors=(8, 4, 2)):
+    """The largest of factors by which an image of image_size can be reduced
+    while still filling target_size when scaled to fit with aspect ratio
+    maintained. Returns 1 if no reduction is possible.
+    """
+    (width, height), (target_width, target_height) = image_size, target_size
+    if target_width <= 0 or target_height <= 0:
+        return 1
+    else:
+        # The image is shown at a scale of 1 / limit
+        limit = max(float(width) / target_width, float(height) / target_height)
+        return next((f for f in sorted(factors, reverse=True) if f <= limit), 1)
+
+
+def tiff_layout(path):
+    """Returns a tuple (offset, shape, dtype, channels) describing the pixel
+    data of the TIFF at path if it is stored uncompressed and contiguously, and
+    so can be memory mapped. shape is (height, width) or (height, width, 3),
+    dtype is a numpy dtype string and channels is 'grey' or 'rgb'. Returns None
+    otherwise.
+    """
+    with open(str(path), 'rb') as f:
+        res = _tiff_fields(f)
+    if not res:
+        return None
+
+    endian, fields = res
+    get = lambda tag, default=None: fields.get(tag, [default])
+    width, height = get(256)[0], get(257)[0]
+    samples = get(277, 1)[0]
+    bits = set(get(258, 1))
+    offsets, counts = get(273), get(279)
+    if (not width or not height or get(259, 1)[0] != 1 or
+            get(284, 1)[0] != 1 or samples not in (1, 3) or
+            get(262)[0] not in (1, 2) or len(bits) != 1 or
+            bits.pop() not in (8, 16) or None in offsets or None in counts or
+            len(offsets) != len(counts)):
+        return None
+
+    # Strips must follow one another
+    for offset, count, next_offset in zip(offsets, counts, offsets[1:]):
+        if offset + count != next_offset:
+            return None
+
+    dtype = 'u1' if 8 == get(258)[0] else endian + 'u2'
+    shape = (height, width) if 1 == samples else (height, width, samples)
+    itemsize = 1 if 'u1' == dtype else 2
+    if sum(counts) < height * width * samples * itemsize:
+        return None
+    else:
+        return (offsets[0], shape, dtype, 'grey' if 1 == samples else 'rgb')
@@ -1,32 +1,104 @@
 from PySide import QtCore, QtGui
 
+from .lru_cache import LRUCache
+
+
 class ImageLabel(QtGui.QWidget):
-    """Displays a pixmap scaled to fit available within the available space
+    """Displays an image scaled to fit available within the available space
     with aspect ratio maintained.
+
+    The image is held as a QImage and shown as a pixmap that has been smoothly
+    scaled to the size of the widget. Scaled pixmaps are rebuilt once resizing
+    has paused and are cached for recently used sizes so that dragging the
+    splitter back and forth does not rescale the full image.
+
+    Emits zoom_requested(x, y) when the user scrolls the mouse wheel forwards
+    over the image. x and y are the position of the mouse as fractions of the
+    image's width and height.
     """
 
+    # Emitted when the user asks to zoom in
+    zoom_requested = QtCore.Signal(float, float)
+
     # http://stackoverflow.com/a/14107727/1773758
 
+    # Milliseconds after the last resize event before the image is rescaled
+    RESIZE_DELAY = 100
+
+    # Number of scaled pixmaps held
+    CACHED_SIZES = 4
+
     def __init__(self, parent=None):
         super(ImageLabel, self).__init__(parent)
+        self._image = None
+        self._scaled = LRUCache(self.CACHED_SIZES)
+
         self._label = QtGui.QLabel(self)
         self._label.setScaledContents(True)
         self._label.setFixedSize(0,0)
         self._label.setStyleSheet('QLabel { background-color: darkgrey;}')
+        self.setStyleSheet('background-color: darkgrey;')
+
+        # While resizing, the current pixmap is stretched by the label until
+        # the timer fires
+        self._resize_timer = QtCore.QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(self.RESIZE_DELAY)
+        self._resize_timer.timeout.connect(self.rescale)
+
+    def set_image(self, image):
+        """Shows the QImage image, or nothing if image is None
+        """
+        self._image = image
+        self._scaled.clear()
+        if image is None:
+            self._label.clear()
+        self.rescale()
+
+    def image(self):
+        """The QImage that is shown, or None
+        """
+        return self._image
 
     def set_pixmap(self, pixmap):
-        self._label.setPixmap(pixmap)
-        self.resize_image();
+        self.set_image(pixmap.toImage() if pixmap else None)
 
     def resizeEvent(self, event):
         super(ImageLabel, self).resizeEvent(event)
         self.resize_image()
-        self.setStyleSheet('background-color: darkgrey;')
+        self._resize_timer.start()
+
+    def wheelEvent(self, event):
+        geometry = self._label.geometry()
+        if (self._image is not None and event.delta() > 0 and
+                geometry.contains(event.pos())):
+            position = event.pos() - geometry.topLeft()
+            self.zoom_requested.emit(float(position.x()) / geometry.width(),
+                                     float(position.y()) / geometry.height())
+        else:
+            super(ImageLabel, self).wheelEvent(event)
+
+    def rescale(self):
+        """Shows the image scaled to the current size, using the cache if
+        possible
+        """
+        self._resize_timer.stop()
+        if self._image is not None:
+            size = self._image.size()
+            size.scale(self.size(), QtCore.Qt.KeepAspectRatio)
+            key = (size.width(), size.height())
+            pixmap = self._scaled.get(key)
+            if pixmap is None:
+                pixmap = QtGui.QPixmap.fromImage(self._image.scaled(
+                    size, QtCore.Qt.KeepAspectRatio,
+                    QtCore.Qt.SmoothTransformation))
+                self._scaled.put(key, pixmap)
+            self._label.setPixmap(pixmap)
+        self.resize_image()
 
     def resize_image(self):
-        pixmap = self._label.pixmap()
-        if pixmap:
-            pixSize = self._label.pixmap().size()
+        if self._image is not None:
+            pixSize = self._image.size()
             pixSize.scale(self.size(), QtCore.Qt.KeepAspectRatio)
             self._label.setFixedSize(pixSize)
         else:
@@ -0,0 +1,130 @@
+"""Reading image files into QImages. Functions in this module are safe to
+call from threads other than the GUI thread.
+"""
+import sys
+
+import cv2
+
+import numpy as np
+
+from PySide.QtGui import QImage
+
+from .bit_depth import as_uint8
+from .image_header import image_size, reduction_factor, exif_thumbnail
+from .latency import recorder
+
+
+# cv2.imread flags that decode at a reduced scale, keyed by reduction factor.
+# JPEGs are reduced during decoding using libjpeg's DCT scaling. Other formats
+# are decoded and then reduced. Not available in OpenCV 2.
+REDUCED_FLAGS = {
+    2: getattr(cv2, 'IMREAD_REDUCED_COLOR_2', None),
+    4: getattr(cv2, 'IMREAD_REDUCED_COLOR_4', None),
+    8: getattr(cv2, 'IMREAD_REDUCED_COLOR_8', None),
+}
+REDUCED_FLAGS = dict((k, v) for k, v in REDUCED_FLAGS.items() if v is not None)
+
+
+# Colour table for showing single-channel images as Format_Indexed8
+_GREY_TABLE = [0xff000000 | (v << 16) | (v << 8) | v for v in range(256)]
+
+
+def qimage_of_bgr(bgr):
+    """ A QImage representation of a BGR, BGRA or greyscale numpy array.
+
+    The QImage shares the memory of C-contiguous arrays where the QImage
+    format allows, which is the case for 8-bit greyscale and BGRA arrays and,
+    with Qt 5.14 and later, BGR arrays. Other arrays are copied. BGR arrays
+    are converted to RGB by a single copy with earlier versions of Qt.
+    """
+    bgr = as_uint8(bgr)
+    if 3 == bgr.ndim and 1 == bgr.shape[2]:
+        bgr = bgr[:, :, 0]
+    if not bgr.flags.c_contiguous:
+        bgr = np.ascontiguousarray(bgr)
+
+    channels = 1 if 2 == bgr.ndim else bgr.shape[2]
+    if 1 == channels:
+        format = QImage.Format_Indexed8
+    elif 3 == channels and hasattr(QImage, 'Format_BGR888'):
+        format = QImage.Format_BGR888
+    elif 3 == channels:
+        bgr = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+        format = QImage.Format_RGB888
+    elif 4 == channels:
+        # Format_ARGB32 is stored as BGRA on little-endian machines
+        if 'little' != sys.byteorder:
+            bgr = np.ascontiguousarray(bgr[:, :, ::-1])
+        format = QImage.Format_ARGB32
+    else:
+        raise ValueError('Unsupported number of channels [{0}]'.format(channels))
+
+    qt_image = QImage(bgr.data,
+                      bgr.shape[1], bgr.shape[0],
+                      bgr.strides[0], format)
+    if 1 == channels:
+        qt_image.setColorTable(_GREY_TABLE)
+
+    # QImage does not take a deep copy of np_arr.data so hold a reference
+    # to it
+    assert(not hasattr(qt_image, 'bgr_array'))
+    qt_image.bgr_array = bgr
+    return qt_image
+
+
+def read_bgr(path, target_size=None):
+    """Returns a BGR numpy array of the image file at path. If target_size is
+    given then the image might be decoded at a reduced scale that is large
+    enough to fill a (width, height) of target_size.
+    """
+    flags = cv2.IMREAD_COLOR
+    if target_size and REDUCED_FLAGS:
+        try:
+            size = image_size(path)
+        except (IOError, OSError):
+            size = None
+        if size:
+            factor = reduction_factor(size, target_size, REDUCED_FLAGS.keys())
+            flags = REDUCED_FLAGS.get(factor, flags)
+    return cv2.imread(str(path), flags)
+
+
+def read_image(path, target_size=None):
+    """Returns a QImage of the image file at path. If target_size is given
+    then the image might be decoded at a reduced scale - see read_bgr.
+    """
+    with recorder.timed('decode', path):
+        image = read_bgr(path, target_size)
+    if image is None:
+        raise ValueError('Unable to read [{0}]'.format(path))
+    else:
+        with recorder.timed('conversion', path):
+            return qimage_of_bgr(image)
+
+
+def thumbnail(path, size):
+    """JPEG-encoded bytes of a thumbnail, no larger than size in width and
+    height, of the image file at path. The thumbnail embedded in the file's
+    Exif data is used if it is at least size in width or height. Otherwise the
+    image is decoded at a reduced scale.
+    """
+    bgr, data = None, exif_thumbnail(path)
+    if data:
+        bgr = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if bgr is not None and max(bgr.shape[:2]) < size:
+            bgr = None
+    if bgr is None:
+        bgr = read_bgr(path, (size, size))
+        if bgr is None:
+            raise ValueError('Unable to read [{0}]'.format(path))
+
+    height, width = bgr.shape[:2]
+    scale = float(size) / max(width, height)
+    if scale < 1:
+        bgr = cv2.resize(bgr, (max(1, int(round(width * scale))),
+                               max(1, int(round(height * scale)))),
+                         interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode('.jpg', bgr)
+    if not ok:
+        raise ValueError('Unable to encode thumbnail of [{0}]'.format(path))
+    return encoded.tobytes()
@@ -0,0 +1,137 @@
+"""A minimal ctypes binding to the Linux inotify API.
+
+available() is False on platforms without inotify, in which case Inotify
+cannot be constructed.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+
+
+# Event masks, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# Flags for inotify_init1
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# struct inotify_event {int wd; uint32_t mask; uint32_t cookie; uint32_t len;}
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                           ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+_libc = _load_libc()
+
+
+def available():
+    """True if inotify can be used on this platform
+    """
+    return _libc is not None
+
+
+def _encode(path):
+    path = str(path)
+    if not isinstance(path, bytes):
+        path = path.encode(sys.getfilesystemencoding())
+    return path
+
+
+def _decode(name):
+    name = name.rstrip(b'\0')
+    if str is bytes:
+        return name
+    else:
+        return os.fsdecode(name)
+
+
+class Inotify(object):
+    """An inotify instance. Events are read with read_events().
+    """
+
+    def __init__(self):
+        if not available():
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self._fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def fileno(self):
+        return self._fd
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def add_watch(self, path, mask):
+        """Watches path for the events in mask. Returns the watch descriptor.
+        """
+        wd = _libc.inotify_add_watch(self._fd, _encode(path), mask)
+        if wd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e), str(path))
+        return wd
+
+    def rm_watch(self, wd):
+        _libc.inotify_rm_watch(self._fd, wd)
+
+    def read_events(self, timeout=None):
+        """Returns a list of (wd, mask, cookie, name) tuples, waiting up to
+        timeout seconds for at least one event. name is '' for events on the
+        watched path itself.
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EINTR):
+                return []
+            else:
+                raise
+
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buffer):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = _decode(buffer[offset:offset + length])
+            offset += length
+            events.append((wd, mask, cookie, name))
+        return events
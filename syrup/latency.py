@@ -0,0 +1,165 @@
+"""Time taken by each stage of the handling of an image, from its detection in
+the inbox to its move to the processed directory, held in memory as
+histograms.
+"""
+import csv
+import json
+import logging
+import sys
+import threading
+import time
+
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+
+# Stages, in the order in which an image passes through them:
+#   detection       from the file's modification time to its detection
+#   write-settle    waiting for the file to be completely written
+#   analysis        decoding a reduced copy and analysing it in the background
+#   decode          reading the image file
+#   conversion      converting the decoded array to a QImage
+#   display         scaling and showing the image
+#   dwell           from display until the user moves or ignores the image
+#   move            moving the file to the processed directory
+STAGES = ('detection', 'write-settle', 'analysis', 'decode', 'conversion',
+          'display', 'dwell', 'move')
+
+# Percentiles given by Histogram.summary()
+PERCENTILES = (50, 90, 99)
+
+
+class Histogram(object):
+    """Counts of durations in buckets whose upper bounds double from one
+    millisecond, together with the count, total, minimum and maximum. Not
+    thread safe.
+    """
+
+    # Upper bounds of buckets in seconds, from 1ms to about 4.7 hours. Longer
+    # durations are counted in a final, unbounded bucket.
+    BOUNDS = tuple(0.001 * 2 ** i for i in range(25))
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, seconds):
+        self.counts[bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.minimum = seconds if self.minimum is None else min(self.minimum, seconds)
+        self.maximum = seconds if self.maximum is None else max(self.maximum, seconds)
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, p):
+        """An upper bound on the pth percentile - the upper bound of the bucket
+        that contains it, or the maximum if that is lower. None if empty.
+        """
+        if not self.count:
+            return None
+        rank, cumulative = p / 100.0 * self.count, 0
+        for bound, n in zip(self.BOUNDS, self.counts):
+            cumulative += n
+            if cumulative >= rank:
+                return min(bound, self.maximum)
+        return self.maximum
+
+    def summary(self):
+        """A dict of statistics and of the counts in non-empty buckets
+        """
+        summary = OrderedDict([
+            ('count', self.count),
+            ('total', self.total),
+            ('mean', self.mean()),
+            ('min', self.minimum),
+            ('max', self.maximum),
+        ])
+        for p in PERCENTILES:
+            summary['p{0}'.format(p)] = self.percentile(p)
+        bounds = self.BOUNDS + (None,)
+        summary['buckets'] = [[bound, n] for bound, n in zip(bounds, self.counts)
+                              if n]
+        return summary
+
+
+class LatencyRecorder(object):
+    """A Histogram for each stage. Thread safe.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = OrderedDict((stage, Histogram()) for stage in STAGES)
+
+    def record(self, stage, seconds, path=None):
+        """Records that stage took seconds, for the image file path if given
+        """
+        seconds = max(0, seconds)
+        logger.debug('%s took %.3fs [%s]', stage, seconds, path)
+        with self._lock:
+            if stage not in self._histograms:
+                self._histograms[stage] = Histogram()
+            self._histograms[stage].add(seconds)
+
+    @contextmanager
+    def timed(self, stage, path=None):
+        """A context manager that records the time taken by its body, if it
+        does not raise
+        """
+        start = time.time()
+        yield
+        self.record(stage, time.time() - start, path)
+
+    def clear(self):
+        with self._lock:
+            for stage in list(self._histograms.keys()):
+                self._histograms[stage] = Histogram()
+
+    def summary(self):
+        """A dict of Histogram summaries, keyed by stage
+        """
+        with self._lock:
+            return OrderedDict((stage, histogram.summary())
+                               for stage, histogram in self._histograms.items())
+
+    def write_json(self, path):
+        with open(str(path), 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def write_csv(self, path):
+        """Writes a row of statistics for each stage. Bucket counts are given
+        only by write_json.
+        """
+        columns = ['count', 'total', 'mean', 'min', 'max']
+        columns += ['p{0}'.format(p) for p in PERCENTILES]
+        if sys.version_info[0] < 3:
+            f = open(str(path), 'wb')
+        else:
+            f = open(str(path), 'w', newline='')
+        with f:
+            writer = csv.writer(f)
+            writer.writerow(['stage'] + columns)
+            for stage, summary in self.summary().items():
+                writer.writerow([stage] + ['' if summary[c] is None else summary[c]
+                                           for c in columns])
+
+    def write(self, path):
+        """Writes CSV if path has the suffix .csv and JSON otherwise
+        """
+        if '.csv' == Path(path).suffix.lower():
+            self.write_csv(path)
+        else:
+            self.write_json(path)
+
+
+# The recorder used throughout the application
+recorder = LatencyRecorder()
@@ -0,0 +1,62 @@
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """A mapping that holds values up to a total size of budget, as measured by
+    sizeof, discarding the least recently used values to make room for new
+    ones. Not thread safe.
+    """
+    def __init__(self, budget, sizeof=lambda value: 1):
+        self._budget = budget
+        self._sizeof = sizeof
+        self._items = OrderedDict()
+        self._sizes = {}
+        self.total = 0
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def keys(self):
+        """Keys, least recently used first
+        """
+        return list(self._items.keys())
+
+    def get(self, key, default=None):
+        """The value for key, which becomes the most recently used, or default
+        """
+        if key in self._items:
+            value = self._items.pop(key)
+            self._items[key] = value
+            return value
+        else:
+            return default
+
+    def put(self, key, value):
+        """Adds value, evicting least recently used values as required. Values
+        larger than the budget are not stored.
+        """
+        self.pop(key)
+        size = self._sizeof(value)
+        if size <= self._budget:
+            while self._items and self.total + size > self._budget:
+                self.pop(next(iter(self._items)))
+            self._items[key] = value
+            self._sizes[key] = size
+            self.total += size
+
+    def pop(self, key, default=None):
+        """Removes and returns the value for key, or default
+        """
+        if key in self._items:
+            self.total -= self._sizes.pop(key)
+            return self._items.pop(key)
+        else:
+            return default
+
+    def clear(self):
+        self._items.clear()
+        self._sizes.clear()
+        self.total = 0
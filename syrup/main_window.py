@@ -1,22 +1,31 @@
+import getpass
+import logging
 import re
 import time
 
 from functools import wraps
 from pathlib import Path
 
-import cv2
-
-import numpy as np
-
 from PySide import QtCore
-from PySide.QtGui import (QPixmap, QImage, QMainWindow, QDesktopServices,
-                          QSplitter, QFileDialog, QMessageBox, QWidget)
+from PySide.QtGui import (QMainWindow, QDesktopServices, QApplication,
+                          QSplitter, QFileDialog, QMessageBox, QWidget,
+                          QStackedWidget, QLabel, QVBoxLayout)
 from PySide.QtCore import QSettings, QEvent
 
+from .analyse_ahead import AnalyseAhead
+from .barcodes import SPECIMEN_RE, LOCATION_RE, destination_path
+from .claims import ClaimRegistry
 from .controls import Controls
+from .decode_ahead import DecodeAhead
+from .filmstrip import Filmstrip
 from .image_label import ImageLabel
-from .move_and_rename import move_and_rename
+from .latency import recorder
+from .manifest_reader import ManifestReader
+from .move_queue import MoveJournal, MoveQueue
 from .new_file_watcher import NewFileWatcher
+from .pending_queue import PendingQueue, ORDERS, LIFO
+from .thumbnail_cache import ThumbnailCache
+from .zoom_view import ZoomView
 
 
 # Supported image formats
@@ -27,24 +36,15 @@ IMAGE_SUFFIXES_RE = '|'.join('{0}'.format(p[1:]) for p in IMAGE_SUFFIXES)
 IMAGE_SUFFIXES_RE = '^.*\\.({0})$'.format(IMAGE_SUFFIXES_RE)
 IMAGE_SUFFIXES_RE = re.compile(IMAGE_SUFFIXES_RE, re.IGNORECASE)
 
-# Regular expression for specimen and location numbers
-SPECIMEN_RE = re.compile('^[0-9]{9}$')
-LOCATION_RE = re.compile('^L[0-9]{9}$')
 
-def qimage_of_bgr(bgr):
-    """ A QImage representation of a BGR numpy array
-    """
-    bgr = cv2.cvtColor(bgr.astype('uint8'), cv2.COLOR_BGR2RGB)
-    bgr = np.ascontiguousarray(bgr)
-    qt_image = QImage(bgr.data,
-                      bgr.shape[1], bgr.shape[0],
-                      bgr.strides[0], QImage.Format_RGB888)
+logger = logging.getLogger(__name__)
 
-    # QImage does not take a deep copy of np_arr.data so hold a reference
-    # to it
-    assert(not hasattr(qt_image, 'bgr_array'))
-    qt_image.bgr_array = bgr
-    return qt_image
+
+class _MoveSignals(QtCore.QObject):
+    """Carries notifications from the MoveQueue's thread to the GUI thread
+    """
+    moved = QtCore.Signal(Path, Path)
+    failed = QtCore.Signal(Path, Path, str)
 
 
 def report_to_user(f):
@@ -66,18 +66,39 @@ class MainWindow(QMainWindow):
     """The application's main window
     """
 
+    # Milliseconds between updates of the pending queue's status
+    QUEUE_STATUS_INTERVAL = 1000
+
+    # Milliseconds between renewals of claims on images in the inbox
+    CLAIM_RENEW_INTERVAL = 1000 * ClaimRegistry.LEASE // 4
+
     # Emitted when there are pending files to be processed
     new_pending_files = QtCore.Signal()
 
     def __init__(self, app):
         super(MainWindow, self).__init__()
 
-        # Window layout - a splitter with the image on the left and controls
-        # on the right
+        # Window layout - a splitter with the image and a filmstrip of
+        # pending images on the left and controls on the right. The image is
+        # shown either scaled to fit or, when the user zooms in, by a
+        # ZoomView.
         self._image_widget = ImageLabel(self)
+        self._zoom_view = ZoomView(self)
+        self._image_stack = QStackedWidget()
+        self._image_stack.addWidget(self._image_widget)
+        self._image_stack.addWidget(self._zoom_view)
+        cache = Path(QDesktopServices.storageLocation(
+            QDesktopServices.CacheLocation))
+        self._filmstrip = Filmstrip(ThumbnailCache(cache / 'thumbnails'), self)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self._image_stack)
+        layout.addWidget(self._filmstrip)
+        images = QWidget()
+        images.setLayout(layout)
         self._controls = Controls(self)
         self._splitter = QSplitter()
-        self._splitter.addWidget(self._image_widget)
+        self._splitter.addWidget(images)
         self._splitter.addWidget(self._controls)
         self._splitter.setSizes([1200, 600])
 
@@ -85,10 +106,15 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(self._splitter)
 
         # Connect controls to handlers
+        self._image_widget.zoom_requested.connect(self.zoom)
+        self._zoom_view.fit_requested.connect(self.fit_image)
+        self._filmstrip.selected.connect(self.review_pending)
         self._controls.ok.clicked.connect(self.ok)
         self._controls.cancel.clicked.connect(self.cancel)
         self._controls.inbox.choose_directory.clicked.connect(self.choose_inbox)
         self._controls.processed.choose_directory.clicked.connect(self.choose_processed)
+        self._controls.ingest_backlog.toggled.connect(self.toggle_ingest_backlog)
+        self._controls.embed_metadata.toggled.connect(self.toggle_embed_metadata)
 
         # Directories
         mydocuments = QDesktopServices.storageLocation(
@@ -101,11 +127,85 @@ class MainWindow(QMainWindow):
         self._controls.inbox.set_link(str(self._inbox.as_uri()), self._inbox.name)
         self._controls.processed.set_link(str(self._processed.as_uri()), self._processed.name)
 
-        # A stack of Path objects to be processed
-        self._pending_files = []
-
-        # The Path currently shown in the UI
+        # Whether images that are in the inbox when it is first watched are
+        # queued. QSettings might give booleans as strings.
+        self._ingest_backlog = QSettings().value('ingest_backlog', False) in (True, 'true')
+        self._controls.ingest_backlog.setChecked(self._ingest_backlog)
+
+        # Whether barcodes are written into the metadata of moved images
+        self._embed_metadata = QSettings().value('embed_metadata', False) in (True, 'true')
+        self._controls.embed_metadata.setChecked(self._embed_metadata)
+
+        # Path objects to be processed, in the order chosen by the user
+        order = QSettings().value('review_order', LIFO)
+        self._pending_files = PendingQueue(order if order in ORDERS else LIFO)
+        self._controls.review_order.setCurrentIndex(
+            list(ORDERS).index(self._pending_files.order))
+        self._controls.review_order.currentIndexChanged.connect(
+            self.review_order_changed)
+
+        # Pending files that other instances have claimed
+        self._claimed_elsewhere = set()
+
+        # The number of pending files and how long the oldest has waited,
+        # shown in the status bar
+        self._queue_status = QLabel()
+        self.statusBar().addPermanentWidget(self._queue_status)
+        self._queue_status_timer = QtCore.QTimer(self)
+        self._queue_status_timer.timeout.connect(self.update_queue_status)
+        self._queue_status_timer.start(self.QUEUE_STATUS_INTERVAL)
+        self.update_queue_status()
+
+        # The Path currently shown in the UI and the time at which it was
+        # shown
         self._under_review = None
+        self._review_started = None
+
+        # Decodes pending images before they are reviewed
+        self._decode_ahead = DecodeAhead(parent=self)
+
+        # Reads barcodes in pending images, to fill in the controls, computes
+        # their perceptual hashes and checks their focus and exposure. Created
+        # when first needed so that OpenCV is not imported at startup.
+        self._analyse_ahead = None
+        self._quality_analyser = None
+
+        # Files are moved in the background. Moves that were not completed
+        # when the application last exited are made again.
+        data = Path(QDesktopServices.storageLocation(
+            QDesktopServices.DataLocation))
+        if not data.is_dir():
+            data.mkdir(parents=True)
+        self._move_signals = _MoveSignals(self)
+        self._move_signals.moved.connect(self.moved, QtCore.Qt.QueuedConnection)
+        self._move_signals.failed.connect(self.move_failed,
+            QtCore.Qt.QueuedConnection)
+        self._move_queue = MoveQueue(MoveJournal(data / 'moves.journal'),
+                                     self._move_signals.moved.emit,
+                                     self._move_signals.failed.emit)
+        replayed = self._move_queue.replay()
+        if replayed:
+            logger.info('MainWindow replaying [%d] unfinished moves', replayed)
+
+        # Moved images are recorded, with the operator's name, in the
+        # processed directory's manifest. Its entries, including those added
+        # by other workstations, are read in the background when each review
+        # starts. Their perceptual hashes wait in self._unindexed_hashes until
+        # they are added to a HashIndex, to find near-duplicates, when one is
+        # next needed. Hashes of images that are being moved by this
+        # workstation are added when their moves complete, keyed by source.
+        self._operator = getpass.getuser()
+        self._manifest_reader = ManifestReader(self._processed, self)
+        self._manifest_reader.read.connect(self.manifest_read)
+        self._processed_hashes = None
+        self._unindexed_hashes = []
+        self._moving_hashes = {}
+
+        # The time taken by each stage of handling images is written on exit
+        # and when the user asks
+        self._latency_path = data / 'latency.json'
+        tools = self.menuBar().addMenu('&Tools')
+        tools.addAction('&Export timings...', self.export_timings)
 
         # Watch the inbox directory, if it exists
         self.new_pending_files.connect(self.process_next_pending,
@@ -113,10 +213,21 @@ class MainWindow(QMainWindow):
 
         if self._inbox.is_dir():
             self._watcher = NewFileWatcher(self._inbox, IMAGE_SUFFIXES_RE)
-            self._watcher.new_file.connect(self.new_image_file)
+            self._watcher.file_complete.connect(self.new_image_file)
+            self._watcher.backlog_complete.connect(self.new_image_files)
+            self._watcher.file_removed.connect(self.removed_image_file)
+            if self._ingest_backlog:
+                self._watcher.ingest_backlog()
         else:
             self._watcher = None
 
+        # Claims on images in the inbox, which might be shared with other
+        # instances
+        self._claims = self.open_claims() if self._inbox.is_dir() else None
+        self._claims_timer = QtCore.QTimer(self)
+        self._claims_timer.timeout.connect(self.renew_claims)
+        self._claims_timer.start(self.CLAIM_RENEW_INTERVAL)
+
         self.empty_controls()
 
         # Setup drag-drop handling
@@ -127,66 +238,379 @@ class MainWindow(QMainWindow):
     def new_inbox_directory(self):
         """Watch the inbox directory
         """
-        print('MainWindow.new_inbox_directory [{0}]'.format(self._inbox))
+        logger.debug('MainWindow.new_inbox_directory [%s]', self._inbox)
         if self._watcher:
-            self._watcher.new_file.disconnect()
+            self._watcher.close()
+            self._watcher.file_complete.disconnect()
+            self._watcher.backlog_complete.disconnect()
+            self._watcher.file_removed.disconnect()
 
         self._watcher = NewFileWatcher(self._inbox, IMAGE_SUFFIXES_RE)
-        self._watcher.new_file.connect(self.new_image_file)
+        self._watcher.file_complete.connect(self.new_image_file)
+        self._watcher.backlog_complete.connect(self.new_image_files)
+        self._watcher.file_removed.connect(self.removed_image_file)
+        if self._ingest_backlog:
+            self._watcher.ingest_backlog()
+
+        if self._claims:
+            self._claims.release_all()
+        self._claims = self.open_claims()
+        self._claimed_elsewhere.clear()
+
+    def open_claims(self):
+        """A ClaimRegistry for the inbox or None if claims cannot be made in
+        the inbox
+        """
+        try:
+            return ClaimRegistry(self._inbox)
+        except (IOError, OSError) as e:
+            logger.warning('Unable to claim images in [%s]: %s', self._inbox, e)
+            return None
+
+    def claim(self, path):
+        """Claims path for review by this instance. Returns False if another
+        instance has claimed path, which is then queued again if the claim is
+        released.
+        """
+        try:
+            if not self._claims or self._claims.claim(path):
+                return True
+        except (IOError, OSError) as e:
+            logger.warning('Unable to claim [%s]: %s', path, e)
+            return True
+        logger.info('[%s] is being reviewed by another instance', path)
+        self._claimed_elsewhere.add(path)
+        return False
+
+    def release(self, path):
+        """Releases this instance's claim on path, if any
+        """
+        if self._claims:
+            try:
+                self._claims.release(path)
+            except (IOError, OSError) as e:
+                logger.warning('Unable to release claim on [%s]: %s', path, e)
+
+    def renew_claims(self):
+        """Slot for self._claims_timer. Renews this instance's claims and
+        queues images whose claims by other instances have been released or
+        have expired.
+        """
+        if self._claims:
+            try:
+                lost = self._claims.renew()
+            except (IOError, OSError) as e:
+                logger.warning('Unable to renew claims: %s', e)
+                return
+            if self._under_review in lost:
+                self.claim_lost()
+            for path in list(self._claimed_elsewhere):
+                if not path.is_file():
+                    self._claimed_elsewhere.discard(path)
+                elif not self._claims.claimed_elsewhere(path):
+                    self._claimed_elsewhere.discard(path)
+                    self.new_image_file(path)
+
+    def claim_lost(self):
+        """Stops reviewing the image under review, whose claim has been lost
+        to another instance, so that it cannot be moved by both
+        """
+        path = self._under_review
+        logger.warning('Claim on [%s] lost to another instance', path)
+        self.statusBar().showMessage(u'{0} has been claimed by another '
+                                     u'workstation'.format(path.name), 10000)
+        self._claimed_elsewhere.add(path)
+        self.end_review()
+        self.process_next_pending()
+
+    def toggle_ingest_backlog(self, checked):
+        """Slot for self._controls.ingest_backlog.toggled
+        """
+        self._ingest_backlog = checked
+        QSettings().setValue('ingest_backlog', checked)
+
+    def toggle_embed_metadata(self, checked):
+        """Slot for self._controls.embed_metadata.toggled
+        """
+        self._embed_metadata = checked
+        QSettings().setValue('embed_metadata', checked)
+
+    def review_order_changed(self, index):
+        """Slot for self._controls.review_order.currentIndexChanged
+        """
+        order = self._controls.review_order.itemData(index)
+        self._pending_files.set_order(order)
+        QSettings().setValue('review_order', order)
+        self.pending_changed()
 
     def new_image_file(self, path):
-        """Slot for self._watcher.new_file
+        """Slot for self._watcher.file_complete
+        """
+        self.new_image_files([path])
+
+    def new_image_files(self, paths):
+        """Slot for self._watcher.backlog_complete. Queues paths and then
+        updates the filmstrip, decoding and analysis once.
+        """
+        logger.debug('MainWindow.new_image_files [%d] files', len(paths))
+        added = False
+        for path in paths:
+            if path == self._under_review:
+                logger.debug('MainWindow.new_image_files [%s] is under '
+                             'review', path)
+            elif self._pending_files.push(path):
+                added = True
+        if added:
+            self.pending_changed()
+            self.new_pending_files.emit()
+
+    def removed_image_file(self, path):
+        """Slot for self._watcher.file_removed
+        """
+        logger.debug('MainWindow.removed_image_file [%s]', path)
+        self._claimed_elsewhere.discard(path)
+        if self._pending_files.remove(path):
+            self._decode_ahead.evict(path)
+            self.analyse_ahead().evict(path)
+            self.pending_changed()
+
+    def pending_changed(self):
+        """Updates the filmstrip, status, decoded images and analyses after
+        files have been added to or taken from self._pending_files
+        """
+        upcoming = self._pending_files.peek(Filmstrip.MAX_ITEMS)
+        self._decode_ahead.prefetch(upcoming[:DecodeAhead.DEPTH],
+                                    self.display_size())
+        self.analyse_ahead().analyse(upcoming[:AnalyseAhead.DEPTH])
+        self._filmstrip.set_paths(upcoming)
+        self.update_queue_status()
+
+    def analyse_ahead(self):
+        """The AnalyseAhead of pending images
+        """
+        if not self._analyse_ahead:
+            from .barcode_detection import BarcodeAnalyser, available
+            from .capture_quality import QualityAnalyser
+            from .perceptual_hash import PerceptualHashAnalyser
+            self._quality_analyser = QualityAnalyser()
+            analysers = [PerceptualHashAnalyser(), self._quality_analyser]
+            if available():
+                analysers.append(BarcodeAnalyser())
+            self._analyse_ahead = AnalyseAhead(analysers, parent=self)
+            self._analyse_ahead.analysed.connect(self.analysed)
+        return self._analyse_ahead
+
+    def analysed(self, path):
+        """Slot for self._analyse_ahead.analysed
+        """
+        if path == self._under_review:
+            self.apply_analysis(path)
+
+    def apply_analysis(self, path):
+        """Fills the specimen and location controls with the barcodes read
+        from path, unless the user has edited them, and warns of problems with
+        path. Analyses path now if it has not yet been analysed.
+        """
+        results = self.analyse_ahead().results(path)
+        if results is None:
+            # Ahead of the images that are waiting
+            self.analyse_ahead().analyse([path], priority=1)
+        else:
+            barcodes = results.get('barcodes') or {}
+            for field, edit, label in (
+                    ('specimen', self._controls.specimen,
+                     self._controls.specimen_detected),
+                    ('location', self._controls.location,
+                     self._controls.location_detected)):
+                reading = barcodes.get(field)
+                if reading and not edit.isModified():
+                    edit.setText(reading.value)
+                    self._controls.show_detection(label, reading.confidence)
+
+            warnings = []
+            duplicates = self.near_duplicates(path)
+            if duplicates:
+                warnings.append(u'Looks like {0}, which has already been '
+                                u'processed'.format(duplicates[0].name))
+            if results.get('quality'):
+                warnings.extend(self._quality_analyser.problems(
+                    results['quality']))
+            else:
+                warnings.append(u'Focus and exposure not checked')
+            self._controls.set_warnings(warnings)
+
+    def manifest_read(self, entries):
+        """Slot for self._manifest_reader.read
+        """
+        self._unindexed_hashes.extend((Path(e.destination), e.phash)
+                                      for e in entries if e.phash)
+
+    def processed_hashes(self):
+        """A HashIndex of the perceptual hashes of processed images, keyed by
+        the Paths to which they were moved, including those read from the
+        manifest since it was last used
         """
-        print('MainWindow.new_image_file [{0}]'.format(path))
-        self._pending_files.append(path)
-        self.new_pending_files.emit()
+        from .perceptual_hash import HashIndex, hash_of_hex
+        if self._processed_hashes is None:
+            self._processed_hashes = HashIndex()
+        for destination, phash in self._unindexed_hashes:
+            # Moves made by this workstation might already have been added
+            if destination not in self._processed_hashes:
+                try:
+                    self._processed_hashes.add(destination, hash_of_hex(phash))
+                except ValueError:
+                    # A hash of an earlier form, which cannot be compared
+                    pass
+        self._unindexed_hashes = []
+        return self._processed_hashes
+
+    def near_duplicates(self, path):
+        """A list of Paths of processed images that look like path, most
+        alike first. Empty if path has not been analysed.
+        """
+        results = self.analyse_ahead().results(path)
+        hash = results.get('phash') if results else None
+        if hash is None:
+            return []
+        else:
+            return [key for key, distance in
+                    self.processed_hashes().near(hash)]
+
+    def update_queue_status(self):
+        """Shows the number of pending files and the time for which the
+        oldest has waited
+        """
+        age = self._pending_files.oldest_age()
+        if age is None:
+            self._queue_status.setText(u'No images waiting')
+        else:
+            minutes, seconds = divmod(int(age), 60)
+            self._queue_status.setText(
+                u'{0} waiting, oldest for {1}:{2:02d}'.format(
+                    len(self._pending_files), minutes, seconds))
+        if self._claimed_elsewhere:
+            self._queue_status.setText(u'{0}, {1} claimed elsewhere'.format(
+                self._queue_status.text(), len(self._claimed_elsewhere)))
+
+    def display_size(self):
+        """The (width, height) available for showing images. Images are
+        decoded at a reduced scale that fills this size.
+        """
+        size = self._image_widget.size()
+        return (size.width(), size.height())
 
     @report_to_user
     def process_next_pending(self):
         """Loads the next pending image for review
         """
-        print('MainWindow.process_next_pending: [{0}] files'.format(
-            len(self._pending_files)))
+        logger.debug('MainWindow.process_next_pending: [%d] files',
+                     len(self._pending_files))
         if not self._under_review:
-            if self._pending_files:
-                self.review_image(self._pending_files.pop())
+            while self._pending_files:
+                path = self._pending_files.pop()
+                if self.claim(path):
+                    try:
+                        self.review_image(path)
+                    except Exception:
+                        # Other instances are free to try path
+                        self.release(path)
+                        self.empty_controls()
+                        self.pending_changed()
+                        raise
+                    break
             else:
                 self.empty_controls()
+            self.pending_changed()
+
+    @report_to_user
+    def review_pending(self, path):
+        """Slot for self._filmstrip.selected. Reviews path, returning the
+        image under review, if any, to the pending files.
+        """
+        if self._pending_files.remove(path):
+            if not self.claim(path):
+                self.pending_changed()
+                raise ValueError(u'{0} is being reviewed at another '
+                                 u'workstation'.format(path.name))
+            if self._under_review:
+                self.release(self._under_review)
+                self._pending_files.push(self._under_review)
+                self.record_dwell()
+                self._under_review = None
+            try:
+                self.review_image(path)
+            except Exception:
+                # Other instances are free to try path
+                self.release(path)
+                self.empty_controls()
+                raise
+            finally:
+                self.pending_changed()
 
     def review_image(self, path):
         """Loads path for review
         """
-        print('MainWindow.review_image [{0}]'.format(path))
+        logger.debug('MainWindow.review_image [%s]', path)
 
-        # Arbitrary delay to give the capture software time to finish writing
-        # the image.
-        time.sleep(1)
-        image = cv2.imread(str(path))
+        # Files from the inbox have been completely written by the time they
+        # reach here - NewFileWatcher waits for the capture software to
+        # finish writing them.
+        image = self._decode_ahead.take(path, self.display_size())
         if image is None:
-            raise ValueError('Unable to read [{0}]'.format(path))
-        else:
-            self._under_review = path
-            self.setWindowTitle('')
-            self.setWindowFilePath(str(path))
-            self._controls.specimen.setText(QSettings().value('specimen'))
-            self._controls.location.setText(QSettings().value('location'))
-            self._image_widget.set_pixmap(QPixmap.fromImage(qimage_of_bgr(image)))
-            self._controls.image_handling.setEnabled(True)
+            from .imaging import read_image
+            image = read_image(path, self.display_size())
+        self._under_review = path
+        self._zoom_view.discard()
+        self.fit_image()
+        self.setWindowTitle('')
+        self.setWindowFilePath(str(path))
+        self._controls.clear()
+        self._controls.specimen.setText(QSettings().value('specimen'))
+        self._controls.location.setText(QSettings().value('location'))
+        with recorder.timed('display', path):
+            self._image_widget.set_image(image)
+        self.apply_analysis(path)
+        self._manifest_reader.refresh()
+        self._review_started = time.time()
+        self._controls.image_handling.setEnabled(True)
+
+    @report_to_user
+    def zoom(self, x, y):
+        """Shows the image under review at full resolution, centred on the
+        point x, y given as fractions of the image's width and height
+        """
+        if self._under_review:
+            self._image_stack.setCurrentWidget(self._zoom_view)
+            self._zoom_view.set_image(self._under_review,
+                                      self._image_widget.image(), (x, y))
+            self._zoom_view.setFocus()
+
+    def fit_image(self):
+        """Shows the image under review scaled to fit
+        """
+        self._image_stack.setCurrentWidget(self._image_widget)
+        self._zoom_view.clear()
 
     def empty_controls(self):
         """Clears controls
         """
-        print('MainWindow.empty_controls')
+        logger.debug('MainWindow.empty_controls')
         self._under_review = None
+        self._zoom_view.discard()
+        self.fit_image()
         self.setWindowTitle('Syrup')
         self.setWindowFilePath(None)
-        self._image_widget.set_pixmap(None)
+        self._image_widget.set_image(None)
         self._controls.clear()
         self._controls.image_handling.setEnabled(False)
 
     @report_to_user
     def ok(self):
-        print('MainWindow.ok')
+        logger.debug('MainWindow.ok')
+        if not self.claim(self._under_review):
+            # Lost since claims were last renewed
+            self.claim_lost()
+            return
         specimen = self._controls.specimen.text()
         location = self._controls.location.text()
         if not SPECIMEN_RE.match(specimen):
@@ -194,25 +618,151 @@ class MainWindow(QMainWindow):
         elif not LOCATION_RE.match(location):
             raise ValueError('Please enter a letter "L" and nine digits for the '
                              'location barcode')
-        else:
-            if not self._processed.is_dir():
-                self._processed.mkdir(parents=True)
-            destination = self._processed / '{0}_{1}'.format(specimen, location)
-            destination = destination.with_suffix(self._under_review.suffix)
-            move_and_rename(self._under_review, destination)
+        elif (self.confirm_new_specimen(specimen) and
+              self.confirm_not_duplicate(self._under_review)):
+            destination = destination_path(self._processed, specimen, location,
+                                           self._under_review.suffix)
+            metadata = {
+                'processed': str(self._processed),
+                'specimen': specimen,
+                'location': location,
+                'operator': self._operator,
+                'embed': self._embed_metadata,
+            }
+            results = self.analyse_ahead().results(self._under_review)
+            if results and results.get('phash') is not None:
+                from .perceptual_hash import hex_of_hash
+                metadata['phash'] = hex_of_hash(results['phash'])
+                self._moving_hashes[self._under_review] = (self._processed,
+                                                           results['phash'])
+            # Releases the image file, which might be memory mapped
+            self._zoom_view.discard()
+            self._move_queue.put(self._under_review, destination, metadata)
             QSettings().setValue('specimen', specimen)
             QSettings().setValue('location', location)
-            self._under_review = None
+            self.end_review()
             self.process_next_pending()
 
+    def confirm_new_specimen(self, specimen):
+        """Returns True if specimen has not been processed before, as far as
+        the manifest has been read, and no image of it is waiting to be
+        moved, or if the user confirms that another image of it should be
+        moved
+        """
+        earlier = self._manifest_reader.by_specimen(specimen)
+
+        # Images of specimen that are waiting to be moved
+        queued = [destination for src, destination, metadata
+                  in self._move_queue.queued()
+                  if metadata and metadata.get('specimen') == specimen and
+                  metadata.get('processed') == str(self._processed)]
+        if not earlier and not queued:
+            return True
+        else:
+            if queued:
+                message = (u'{0} other image(s) of specimen {1} are waiting '
+                           u'to be moved, most recently as {2}.'.format(
+                               len(queued), specimen, queued[-1].name))
+            else:
+                latest = earlier[-1]
+                message = (u'Specimen {0} has been processed {1} time(s) '
+                           u'before, most recently as {2} on {3}.'.format(
+                               specimen, len(earlier),
+                               Path(latest.destination).name,
+                               time.strftime('%Y-%m-%d %H:%M',
+                                             time.localtime(latest.timestamp))))
+            res = QMessageBox.question(self, u'Specimen already processed',
+                message + u'\n\nMove this image anyway?',
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            return QMessageBox.Yes == res
+
+    def confirm_not_duplicate(self, path):
+        """Returns True if path does not look like a processed image or if
+        the user confirms that it should be moved
+        """
+        duplicates = self.near_duplicates(path)
+        if not duplicates:
+            return True
+        else:
+            res = QMessageBox.question(self, u'Possible duplicate',
+                u'This image looks like {0}, which has already been '
+                u'processed. The capture software might have written the '
+                u'same shot twice.\n\nMove this image anyway?'.format(
+                    u', '.join(p.name for p in duplicates[:3])),
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            return QMessageBox.Yes == res
+
+    def moved(self, src, destination):
+        """Slot for self._move_signals.moved
+        """
+        logger.debug('MainWindow.moved [%s] to [%s]', src, destination)
+        self.release(src)
+
+        # Reads the entry recorded for the move
+        self._manifest_reader.refresh()
+        processed, hash = self._moving_hashes.pop(src, (None, None))
+        if hash is not None and processed == self._processed:
+            # Might have been read from the manifest, in which the move has
+            # been recorded
+            hashes = self.processed_hashes()
+            if destination not in hashes:
+                hashes.add(destination, hash)
+        self.statusBar().showMessage(u'Moved {0} to {1}'.format(
+            src.name, destination.name), 5000)
+
+    def move_failed(self, src, destination, message):
+        """Slot for self._move_signals.failed. Reports the failure without
+        blocking review of other images.
+        """
+        logger.error('MainWindow.move_failed [%s] to [%s]: %s', src,
+                     destination, message)
+        self.release(src)
+        self._moving_hashes.pop(src, None)
+        box = QMessageBox(QMessageBox.Warning, u'Unable to move file',
+            u'Unable to move\n{0}\nto\n{1}:\n{2}'.format(src, destination,
+                                                       message),
+            QMessageBox.Ok, self)
+        box.setWindowModality(QtCore.Qt.NonModal)
+        box.setAttribute(QtCore.Qt.WA_DeleteOnClose)
+        box.show()
+
     @report_to_user
     def cancel(self):
         """Closes the image under review without moving the image file
         """
-        print('MainWindow.cancel')
-        self._under_review = None
+        logger.debug('MainWindow.cancel')
+        path = self._under_review
+        self.end_review()
+        self.release(path)
         self.process_next_pending()
 
+    def record_dwell(self):
+        """Records the time for which the image under review was shown
+        """
+        if self._review_started is not None:
+            recorder.record('dwell', time.time() - self._review_started,
+                            self._under_review)
+            self._review_started = None
+
+    def end_review(self):
+        """Records the time for which the image under review was shown and
+        discards its decoded image
+        """
+        self.record_dwell()
+        self._decode_ahead.evict(self._under_review)
+        self.analyse_ahead().evict(self._under_review)
+        self._under_review = None
+
+    @report_to_user
+    def export_timings(self):
+        """Prompts the user for a JSON or CSV file to which to write the
+        time taken by each stage of handling images
+        """
+        path, filter = QFileDialog.getSaveFileName(self, 'Export timings',
+            str(self._latency_path), 'JSON (*.json);;CSV (*.csv)')
+        if path:
+            recorder.write(path)
+
     @report_to_user
     def choose_inbox(self):
         """Prompts the user to choose the inbox directory
@@ -226,7 +776,7 @@ class MainWindow(QMainWindow):
                                  'the processed directory')
             else:
                 self._inbox = directory
-                print('New inbox directory [{0}]'.format(self._inbox))
+                logger.info('New inbox directory [%s]', self._inbox)
                 self._controls.inbox.set_link(str(self._inbox.as_uri()),
                     self._inbox.name)
                 QSettings().setValue('inbox', str(self._inbox))
@@ -245,14 +795,17 @@ class MainWindow(QMainWindow):
                                  'the processed directory')
             else:
                 self._processed = directory
-                print('New processed directory [{0}]'.format(self._processed))
+                logger.info('New processed directory [%s]', self._processed)
+                self._processed_hashes = None
+                self._unindexed_hashes = []
+                self._manifest_reader.set_directory(self._processed)
                 self._controls.processed.set_link(str(self._processed.as_uri()),
                     self._processed.name)
                 QSettings().setValue('processed', str(self._processed))
 
     def write_geometry_settings(self):
         "Writes geometry to settings"
-        print('MainWindow.write_geometry_settings')
+        logger.debug('MainWindow.write_geometry_settings')
 
         # Taken from http://stackoverflow.com/a/8736705
         # TODO LH Test on multiple display system
@@ -263,7 +816,7 @@ class MainWindow(QMainWindow):
         s.setValue("mainwindow/size", self.size())
 
     def show_from_geometry_settings(self):
-        print('MainWindow.show_from_geometry_settings')
+        logger.debug('MainWindow.show_from_geometry_settings')
 
         # TODO LH What if screen resolution, desktop config change or roaming
         # profile means that restored state is outside desktop?
@@ -278,8 +831,25 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         """QWidget virtual
         """
-        print('MainWindow.closeEvent')
+        logger.debug('MainWindow.closeEvent')
         self.write_geometry_settings()
+
+        # Finish moves that have been queued
+        QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        try:
+            self._move_queue.close()
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        # Other instances can now review images that this instance claimed
+        if self._claims:
+            self._claims.release_all()
+
+        try:
+            recorder.write_json(self._latency_path)
+        except (IOError, OSError) as e:
+            logger.warning('Unable to write timings to [%s]: %s',
+                           self._latency_path, e)
         event.accept()
 
     def eventFilter(self, obj, event):
@@ -298,7 +868,7 @@ class MainWindow(QMainWindow):
         else:
             urls = event.mimeData().urls() if event.mimeData() else None
             path = Path(urls[0].toLocalFile()) if urls and 1 == len(urls) else None
-            print(path, IMAGE_SUFFIXES_RE.match(path.suffix))
+            logger.debug('MainWindow._accept_drag_drop [%s]', path)
             if path and IMAGE_SUFFIXES_RE.match(path.suffix):
                 return urls[0].toLocalFile()
             else:
@@ -307,7 +877,7 @@ class MainWindow(QMainWindow):
     def dragEnterEvent(self, event):
         """QWidget virtual
         """
-        print('MainWindow.dragEnterEvent')
+        logger.debug('MainWindow.dragEnterEvent')
         if self._accept_drag_drop(event):
             event.acceptProposedAction()
         else:
@@ -317,7 +887,7 @@ class MainWindow(QMainWindow):
     def dropEvent(self, event):
         """QWidget virtual
         """
-        print('MainWindow.dropEvent')
+        logger.debug('MainWindow.dropEvent')
         res = self._accept_drag_drop(event)
         if res:
             event.acceptProposedAction()
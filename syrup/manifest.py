@@ -0,0 +1,147 @@
+"""A record, in an SQLite database within the processed directory, of the
+images that have been moved there, indexed so that earlier images of a
+specimen or location can be found without listing the directory.
+
+The database uses SQLite's default rollback journal rather than WAL, which
+does not work on network filesystems. Each ProcessedManifest holds its own
+connection, which must be used only by the thread that created it.
+"""
+import sqlite3
+import time
+
+from collections import namedtuple
+
+from pathlib import Path
+
+
+# Name of the database within the processed directory
+MANIFEST_NAME = '.syrup-manifest.sqlite'
+
+# Seconds to wait for other connections, possibly from other workstations,
+# to release their locks
+TIMEOUT = 30
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS processed (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    specimen TEXT NOT NULL,
+    location TEXT NOT NULL,
+    size INTEGER,
+    hash TEXT,
+    timestamp REAL NOT NULL,
+    operator TEXT,
+    phash TEXT
+);
+CREATE INDEX IF NOT EXISTS processed_specimen ON processed (specimen);
+CREATE INDEX IF NOT EXISTS processed_location ON processed (location);
+CREATE INDEX IF NOT EXISTS processed_hash ON processed (hash);
+'''
+
+# A processed image. timestamp is seconds since the epoch and phash is the
+# hex of the image's perceptual hash.
+Entry = namedtuple('Entry', ['id', 'source', 'destination', 'specimen',
+                             'location', 'size', 'hash', 'timestamp',
+                             'operator', 'phash'])
+
+
+class ProcessedManifest(object):
+    """The manifest held in the SQLite database at path, which is created if
+    necessary
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self._connection = sqlite3.connect(str(self.path), timeout=TIMEOUT)
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+        self._add_column('phash', 'TEXT')
+
+    def _add_column(self, name, type):
+        """Adds the column name to databases that were created before it was
+        added to the schema
+        """
+        columns = [row[1] for row in
+                   self._connection.execute('PRAGMA table_info(processed)')]
+        if name not in columns:
+            try:
+                with self._connection:
+                    self._connection.execute(
+                        'ALTER TABLE processed ADD COLUMN {0} {1}'.format(
+                            name, type))
+            except sqlite3.OperationalError:
+                # Added by another instance
+                pass
+
+    @classmethod
+    def for_directory(cls, processed):
+        """The manifest of the processed directory
+        """
+        return cls(Path(processed) / MANIFEST_NAME)
+
+    def close(self):
+        self._connection.close()
+
+    def record(self, source, destination, specimen, location, size=None,
+               hash=None, operator=None, timestamp=None, phash=None):
+        """Records that source was moved to destination. Returns the id of the
+        new Entry.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._connection:
+            cursor = self._connection.execute(
+                'INSERT INTO processed (source, destination, specimen, '
+                'location, size, hash, timestamp, operator, phash) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (str(source), str(destination), specimen, location, size, hash,
+                 timestamp, operator, phash))
+            return cursor.lastrowid
+
+    def _select(self, where, value):
+        cursor = self._connection.execute(
+            'SELECT {0} FROM processed WHERE {1} = ? ORDER BY timestamp, '
+            'id'.format(', '.join(Entry._fields), where), (value,))
+        return [Entry(*row) for row in cursor]
+
+    def by_specimen(self, specimen):
+        """Entries for specimen, oldest first
+        """
+        return self._select('specimen', specimen)
+
+    def by_location(self, location):
+        """Entries for location, oldest first
+        """
+        return self._select('location', location)
+
+    def by_hash(self, hash):
+        """Entries for files whose contents have the hex digest hash, oldest
+        first
+        """
+        return self._select('hash', hash)
+
+    def perceptual_hashes(self, after=0):
+        """A list of (id, destination, phash) of entries whose id is greater
+        than after and that have a perceptual hash, in order of id. Entries
+        recorded since an earlier call are those after the greatest id that
+        it returned.
+        """
+        cursor = self._connection.execute(
+            'SELECT id, destination, phash FROM processed WHERE id > ? AND '
+            'phash IS NOT NULL ORDER BY id', (after,))
+        return list(cursor)
+
+    def since(self, after=0):
+        """Entries whose id is greater than after, in order of id
+        """
+        cursor = self._connection.execute(
+            'SELECT {0} FROM processed WHERE id > ? ORDER BY id'.format(
+                ', '.join(Entry._fields)), (after,))
+        return [Entry(*row) for row in cursor]
+
+    def entries(self):
+        """All entries, oldest first
+        """
+        cursor = self._connection.execute(
+            'SELECT {0} FROM processed ORDER BY timestamp, id'.format(
+                ', '.join(Entry._fields)))
+        return [Entry(*row) for row in cursor]
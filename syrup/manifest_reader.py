@@ -0,0 +1,104 @@
+import logging
+import sqlite3
+
+from PySide import QtCore
+
+from .manifest import ProcessedManifest
+
+
+logger = logging.getLogger(__name__)
+
+
+class _ReadSignals(QtCore.QObject):
+    """Signals emitted by _ReadTask
+    """
+    read = QtCore.Signal(int, list)
+    failed = QtCore.Signal(int, str)
+
+
+class _ReadTask(QtCore.QRunnable):
+    """Reads, on a thread pool thread, the entries of the manifest of a
+    processed directory whose ids are greater than after. The manifest is
+    opened and closed by the task because SQLite connections cannot be shared
+    between threads. Signals carry generation, which identifies the directory.
+    """
+    def __init__(self, processed, after, generation, signals):
+        super(_ReadTask, self).__init__()
+        self._processed = processed
+        self._after = after
+        self._generation = generation
+        self._signals = signals
+
+    def run(self):
+        try:
+            manifest = ProcessedManifest.for_directory(self._processed)
+            try:
+                entries = manifest.since(self._after)
+            finally:
+                manifest.close()
+        except (sqlite3.Error, OSError) as e:
+            self._signals.failed.emit(self._generation, str(e))
+        else:
+            self._signals.read.emit(self._generation, entries)
+
+
+class ManifestReader(QtCore.QObject):
+    """A copy of the entries in the manifest of a processed directory, which
+    might be on a file server, that is brought up to date in the background
+    so that it can be consulted on the GUI thread without waiting for SQLite.
+    Entries recorded by other workstations appear once refresh() has been
+    called and the read has finished.
+    """
+
+    # Emitted with a list of the Entries read by a refresh
+    read = QtCore.Signal(list)
+
+    def __init__(self, processed, parent=None):
+        super(ManifestReader, self).__init__(parent)
+        self._pool = QtCore.QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._signals = _ReadSignals(self)
+        self._signals.read.connect(self._read, QtCore.Qt.QueuedConnection)
+        self._signals.failed.connect(self._failed, QtCore.Qt.QueuedConnection)
+        self._generation = 0
+        self.set_directory(processed)
+
+    def set_directory(self, processed):
+        """Discards the entries read so far and reads those of processed
+        """
+        self._processed = processed
+        self._generation += 1
+        self._last_id = 0
+        self._by_specimen = {}
+        self._reading = False
+        self.refresh()
+
+    def refresh(self):
+        """Starts reading the entries recorded since the last read, unless a
+        read is in progress or the processed directory does not exist
+        """
+        if not self._reading and self._processed.is_dir():
+            self._reading = True
+            self._pool.start(_ReadTask(self._processed, self._last_id,
+                                       self._generation, self._signals))
+
+    def by_specimen(self, specimen):
+        """Entries for specimen that have been read, in the order in which
+        they were recorded
+        """
+        return list(self._by_specimen.get(specimen, []))
+
+    def _read(self, generation, entries):
+        if generation == self._generation:
+            self._reading = False
+            for entry in entries:
+                self._by_specimen.setdefault(entry.specimen, []).append(entry)
+                self._last_id = entry.id
+            if entries:
+                self.read.emit(entries)
+
+    def _failed(self, generation, message):
+        if generation == self._generation:
+            logger.warning(u'Unable to read manifest in [%s]: %s',
+                           self._processed, message)
+            self._reading = False
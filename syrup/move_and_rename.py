@@ -1,21 +1,202 @@
-import shutil
+import errno
+import logging
+import os
+import re
+import threading
 
+from collections import namedtuple
 from pathlib import Path
 
+from .directory_index import scandir
+from .embed_metadata import can_embed, move_with_metadata
+from .verified_copy import move_file, replace
 
-def move_and_rename(src, destination):
+
+logger = logging.getLogger(__name__)
+
+
+# Matches a file stem that ends with a numerical suffix such as '_(2)'
+_NUMBERED_RE = re.compile(r'^(?P<stem>.*)_\((?P<n>[0-9]+)\)$')
+
+# The outcome of move_to_free_name. digest is the hex digest, as given by
+# verified_copy.hash_file, of the moved file if it was copied and verified,
+# otherwise None.
+Moved = namedtuple('Moved', ['path', 'size', 'digest'])
+
+
+class DestinationIndex(object):
+    """The names of the files in a directory together with, for each stem and
+    extension, the highest numerical suffix in use. The directory is read once,
+    with scandir, and the index is updated as files are moved into it so that
+    free names can be found without probing the filesystem. Thread safe.
+    """
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._names = set()
+
+        # Highest numerical suffix, keyed by (stem, suffix). 0 indicates that
+        # only the unnumbered name is in use.
+        self._highest = {}
+        for entry in scandir(str(self.directory)):
+            if entry.is_file():
+                self.add(entry.name)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def add(self, name):
+        """Records that a file called name exists in the directory
+        """
+        path = Path(name)
+        match = _NUMBERED_RE.match(path.stem)
+        if match:
+            key, n = (match.group('stem'), path.suffix), int(match.group('n'))
+        else:
+            key, n = (path.stem, path.suffix), 0
+        with self._lock:
+            self._names.add(path.name)
+            self._highest[key] = max(self._highest.get(key, n), n)
+
+    def free_name(self, destination):
+        """destination if its name is not in use, otherwise destination with a
+        numerical suffix one higher than any in use
+        """
+        with self._lock:
+            if destination.name not in self._names:
+                return destination
+            else:
+                n = 1 + self._highest.get((destination.stem, destination.suffix), 0)
+                return destination.parent / '{0}_({1}){2}'.format(
+                    destination.stem, n, destination.suffix)
+
+
+def _probe_free_name(destination):
+    """destination if it does not exist, otherwise destination with the lowest
+    numerical suffix that does not exist
+    """
+    suffix_n = 1
+
+    # A string format to avoid collisions
+    template = destination.stem + '_({0})' + destination.suffix
+    while destination.is_file():
+        logger.debug('Destination file [%s] exists', destination)
+        destination = destination.parent / template.format(suffix_n)
+        suffix_n += 1
+    return destination
+
+
+def _reserve(destination):
+    """Atomically creates destination as an empty file. Returns False if
+    destination already exists.
+    """
+    try:
+        fd = os.open(str(destination), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except OSError as e:
+        if errno.EEXIST == e.errno:
+            return False
+        else:
+            raise
+    else:
+        os.close(fd)
+        return True
+
+
+def _move_embedding(src, destination, embed, verify):
+    """Moves src to destination with the barcodes in embed written into its
+    metadata. Returns the CopyResult, or None if the metadata could not be
+    written, in which case src is left in place.
+    """
+    try:
+        result = move_with_metadata(src, destination, embed[0], embed[1],
+                                    verify)
+    except ValueError as e:
+        logger.warning('Unable to write metadata into [%s], which will be '
+                       'moved unaltered: %s', src, e)
+        return None
+    else:
+        logger.info('Copied [%s] to [%s] with metadata: %s', src, destination,
+                    result)
+        return result
+
+
+def _move(src, destination, verify):
+    """Moves src to destination. Returns the CopyResult if src was copied or
+    None if it was renamed.
+    """
+    try:
+        replace(src, destination)
+    except OSError as e:
+        if errno.EXDEV == e.errno:
+            # Different filesystems
+            result = move_file(src, destination, verify)
+            logger.info('Copied [%s] to [%s]: %s', src, destination, result)
+            return result
+        else:
+            raise
+    else:
+        return None
+
+
+def move_and_rename(src, destination, index=None, verify=True, embed=None):
+    """Moves the file src to destination, appending a numerical suffix to avoid
+    overwritting existing files. Returns the Path to which src was moved. See
+    move_to_free_name.
+    """
+    return move_to_free_name(src, destination, index, verify, embed).path
+
+
+def move_to_free_name(src, destination, index=None, verify=True, embed=None):
     """Moves the file src to destination, appending a numerical suffix to avoid
-    overwritting existing files
+    overwritting existing files. Returns a Moved.
+
+    If src and destination are on different filesystems then src is copied
+    and removed only after the copy has been made. If verify is True then the
+    copy is read back and checked against the data read from src, and its
+    digest is returned so that callers need not read it again.
+
+    If embed, a tuple (specimen, location), is given and src is a JPEG or TIFF
+    then the barcodes are written into the moved file's XMP metadata as it is
+    copied - see embed_metadata. Other files, and files into which the
+    metadata cannot be written, are moved unaltered.
+
+    If index, a DestinationIndex of destination's directory, is given then
+    the suffix is one higher than the highest in use and is found without
+    probing the filesystem. The chosen name is reserved by exclusively
+    creating it so that files created by other processes are not overwritten.
     """
-    if src != destination:
-        suffix_n = 1
-
-        # A string format to avoid collisions
-        template = destination.stem + '_({0})' + destination.suffix
-        while destination.is_file():
-            print('Destination file [{0}] exists'.format(destination))
-            destination = destination.parent / template.format(suffix_n)
-            suffix_n += 1
-
-        print('Moving [{0}] to [{1}]'.format(src, destination))
-        shutil.move(str(src), str(destination))
+    if src == destination:
+        return Moved(destination, destination.stat().st_size, None)
+
+    while True:
+        if index:
+            candidate = index.free_name(destination)
+        else:
+            candidate = _probe_free_name(destination)
+        if _reserve(candidate):
+            break
+        else:
+            logger.debug('Destination file [%s] exists', candidate)
+            if index:
+                index.add(candidate.name)
+
+    logger.info('Moving [%s] to [%s]', src, candidate)
+    try:
+        result = None
+        if embed and can_embed(src):
+            # Copied, even within a filesystem, with the metadata inserted
+            result = _move_embedding(src, candidate, embed, verify)
+        if result is None:
+            result = _move(src, candidate, verify)
+    except Exception:
+        # Release the reserved name if src remains
+        if src.is_file() and candidate.is_file():
+            candidate.unlink()
+        raise
+
+    if index:
+        index.add(candidate.name)
+    if result:
+        return Moved(candidate, result.size, result.digest)
+    else:
+        return Moved(candidate, candidate.stat().st_size, None)
@@ -0,0 +1,277 @@
+"""Moves files on a background thread, keeping a journal so that moves that
+were requested but not completed, for example because the application crashed,
+can be made when the application next starts.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from collections import OrderedDict
+
+try:
+    from queue import Queue
+except ImportError:
+    # Python 2
+    from Queue import Queue
+
+from pathlib import Path
+
+from .latency import recorder
+from .manifest import ProcessedManifest
+from .move_and_rename import move_to_free_name, DestinationIndex
+from .verified_copy import hash_file
+
+
+logger = logging.getLogger(__name__)
+
+
+class MoveJournal(object):
+    """A record, in a file of JSON lines, of moves that have been requested and
+    of their outcomes. Thread safe.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def _append(self, record, sync=False):
+        record['time'] = time.time()
+        line = json.dumps(record) + '\n'
+        with self._lock:
+            with open(str(self.path), 'a') as f:
+                f.write(line)
+                if sync:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def intend(self, src, destination, metadata=None):
+        """Records that src is to be moved to destination and returns the
+        identifier of the move. metadata is an optional dict that can be
+        serialised as JSON. The record is flushed to disk before returning.
+        """
+        id = uuid.uuid4().hex
+        record = {'id': id, 'event': 'intent', 'src': str(src),
+                  'destination': str(destination)}
+        if metadata:
+            record['metadata'] = metadata
+        self._append(record, sync=True)
+        return id
+
+    def complete(self, id, destination):
+        """Records that move id completed, moving the file to destination
+        """
+        self._append({'id': id, 'event': 'complete',
+                      'destination': str(destination)})
+
+    def fail(self, id, message):
+        """Records that move id failed
+        """
+        self._append({'id': id, 'event': 'fail', 'message': message})
+
+    def _records(self):
+        try:
+            f = open(str(self.path))
+        except IOError:
+            return []
+        records = []
+        with f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A line that was being written when the application
+                    # stopped
+                    pass
+        return records
+
+    def unfinished_records(self):
+        """A list of the intent records, as dicts, of moves that have been
+        requested but neither completed nor failed, in the order in which they
+        were requested
+        """
+        intents, finished = [], set()
+        for record in self._records():
+            if 'intent' == record.get('event'):
+                intents.append(record)
+            else:
+                finished.add(record.get('id'))
+        return [r for r in intents if r['id'] not in finished]
+
+    def unfinished(self):
+        """A list of tuples (id, src, destination) of moves that have been
+        requested but neither completed nor failed, in the order in which they
+        were requested
+        """
+        return [(r['id'], Path(r['src']), Path(r['destination']))
+                for r in self.unfinished_records()]
+
+    def compact(self):
+        """Rewrites the journal so that it contains only unfinished moves
+        """
+        with self._lock:
+            unfinished = set(id for id, src, destination in self.unfinished())
+            records = [r for r in self._records() if r.get('id') in unfinished]
+            temp = self.path.with_name(self.path.name + '.tmp')
+            with open(str(temp), 'w') as f:
+                for record in records:
+                    f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            if hasattr(os, 'replace'):
+                os.replace(str(temp), str(self.path))
+            else:
+                # Python 2 on Windows cannot rename over an existing file
+                if self.path.exists():
+                    self.path.unlink()
+                temp.rename(self.path)
+
+
+class MoveQueue(object):
+    """Moves files, in the order in which they are put, on a background thread.
+    Each move is recorded in journal before it is queued.
+
+    on_moved(src, destination) and on_failed(src, destination, message), if
+    given, are called on the background thread after each move.
+
+    Moves that are put with metadata that includes 'processed', 'specimen'
+    and 'location' are recorded, with the size and hash of the moved file and
+    any 'operator' and 'phash' in metadata, in the ProcessedManifest of the
+    processed directory. The hash is that computed when a copy is verified;
+    files that are renamed are read once to be hashed. If metadata's 'embed'
+    is True then the barcodes are also written into the moved file's metadata
+    - see move_and_rename.
+    """
+    def __init__(self, journal, on_moved=None, on_failed=None):
+        self._journal = journal
+        self._on_moved = on_moved
+        self._on_failed = on_failed
+        self._queue = Queue()
+
+        # Tuples (src, destination, metadata) of moves not yet made, keyed by
+        # id
+        self._queued = OrderedDict()
+        self._queued_lock = threading.Lock()
+
+        # DestinationIndex for each destination directory and
+        # ProcessedManifest for each processed directory, created and used
+        # only by the background thread
+        self._indexes = {}
+        self._manifests = {}
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def put(self, src, destination, metadata=None):
+        """Queues a move of src to destination, or to destination with a
+        numerical suffix if destination exists. metadata is an optional dict
+        that is recorded in the journal and, if it describes the image, in the
+        manifest.
+        """
+        id = self._journal.intend(src, destination, metadata)
+        self._enqueue(id, Path(src), Path(destination), metadata)
+
+    def replay(self):
+        """Queues moves that were recorded in the journal but not completed.
+        Returns the number of moves queued.
+        """
+        unfinished = self._journal.unfinished_records()
+        self._journal.compact()
+        for r in unfinished:
+            self._enqueue(r['id'], Path(r['src']), Path(r['destination']),
+                          r.get('metadata'))
+        return len(unfinished)
+
+    def _enqueue(self, id, src, destination, metadata):
+        with self._queued_lock:
+            self._queued[id] = (src, destination, metadata)
+        self._queue.put((id, src, destination, metadata))
+
+    def queued(self):
+        """A list of tuples (src, destination, metadata) of the moves that have
+        been put and not yet made, in the order in which they were put
+        """
+        with self._queued_lock:
+            return list(self._queued.values())
+
+    def pending(self):
+        """The approximate number of moves not yet made
+        """
+        return self._queue.qsize()
+
+    def close(self):
+        """Makes all queued moves and stops the background thread
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+    def _index(self, directory):
+        """The DestinationIndex of directory, which is created if necessary
+        """
+        if directory not in self._indexes:
+            if not directory.is_dir():
+                directory.mkdir(parents=True)
+            self._indexes[directory] = DestinationIndex(directory)
+        return self._indexes[directory]
+
+    def _record(self, src, moved, metadata):
+        """Records moved, the Moved of src, in the manifest, if metadata
+        describes the image
+        """
+        if metadata and all(k in metadata for k in ('processed', 'specimen',
+                                                    'location')):
+            try:
+                processed = Path(metadata['processed'])
+                if processed not in self._manifests:
+                    self._manifests[processed] = ProcessedManifest.for_directory(
+                        processed)
+                digest = moved.digest
+                if digest is None:
+                    # Renamed - the file's pages are likely to be cached
+                    digest = hash_file(moved.path, cached=True)
+                self._manifests[processed].record(
+                    src, moved.path, metadata['specimen'],
+                    metadata['location'], moved.size, digest,
+                    metadata.get('operator'), phash=metadata.get('phash'))
+            except Exception as e:
+                # The file has been moved so the move has not failed
+                logger.error('Unable to record move of [%s] in manifest: %s',
+                             src, e)
+
+    def _dequeue(self, id):
+        with self._queued_lock:
+            self._queued.pop(id, None)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            id, src, destination, metadata = item
+            start = time.time()
+            try:
+                if not src.is_file():
+                    raise ValueError('[{0}] no longer exists - it might '
+                                     'already have been moved'.format(src))
+                embed = None
+                if metadata and metadata.get('embed'):
+                    embed = (metadata['specimen'], metadata['location'])
+                moved = move_to_free_name(src, destination,
+                                          self._index(destination.parent),
+                                          embed=embed)
+            except Exception as e:
+                self._journal.fail(id, str(e))
+                self._dequeue(id)
+                if self._on_failed:
+                    self._on_failed(src, destination, str(e))
+            else:
+                recorder.record('move', time.time() - start, src)
+                self._record(src, moved, metadata)
+                self._journal.complete(id, moved.path)
+                self._dequeue(id)
+                if self._on_moved:
+                    self._on_moved(src, moved.path)
+
+        for manifest in self._manifests.values():
+            manifest.close()
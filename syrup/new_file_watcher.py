@@ -1,39 +1,468 @@
+import logging
 import sys
+import threading
+import time
 
+from collections import deque
 from pathlib import Path
 
 from PySide import QtCore, QtGui
 
+from . import inotify
+from .directory_index import DirectoryIndex, backlog, scandir
+from .filesystem import is_network_filesystem
+from .latency import recorder
+from . import polling, write_settle
+from .polling import AdaptiveInterval, DirectoryPoller
+from .write_settle import wait_until_written
+
+
+logger = logging.getLogger(__name__)
+
+
+class _SettleSignals(QtCore.QObject):
+    """Signals emitted by _SettleTask. QRunnable is not a QObject so cannot
+    emit signals itself.
+    """
+    settled = QtCore.Signal(Path)
+    abandoned = QtCore.Signal(Path)
+
+
+class _SettleTask(QtCore.QRunnable):
+    """Waits, on a thread pool thread, for a file to be completely written
+    """
+    def __init__(self, path, settle_time, signals):
+        super(_SettleTask, self).__init__()
+        self._path = path
+        self._settle_time = settle_time
+        self._signals = signals
+
+    def run(self):
+        start = time.time()
+        if wait_until_written(self._path, settle_time=self._settle_time):
+            recorder.record('write-settle', time.time() - start, self._path)
+            self._signals.settled.emit(self._path)
+        else:
+            self._signals.abandoned.emit(self._path)
+
+
+class _QtBackend(QtCore.QObject):
+    """Watches a directory with QFileSystemWatcher.
+
+    QFileSystemWatcher reports only that something in the directory changed,
+    so the directory is rescanned once changes have paused for COALESCE_DELAY
+    milliseconds, or after COALESCE_LIMIT milliseconds of continuous changes.
+    A single write can fire many directoryChanged signals. Subdirectories are
+    not watched.
+    """
+
+    # Emitted with a path and whether the file is known to be complete
+    appeared = QtCore.Signal(Path, bool)
+    removed = QtCore.Signal(Path)
+
+    # Milliseconds after the last change before the directory is rescanned
+    COALESCE_DELAY = 200
+
+    # Greatest number of milliseconds for which a rescan is postponed
+    COALESCE_LIMIT = 1000
+
+    # Seconds for which a file must be unchanged to be complete
+    SETTLE_TIME = write_settle.SETTLE_TIME
+
+    def __init__(self, directory, regex, recursive=False, parent=None):
+        super(_QtBackend, self).__init__(parent)
+        self._directory = Path(directory)
+        self._index = DirectoryIndex(directory, regex)
+
+        self._rescan_timer = QtCore.QTimer(self)
+        self._rescan_timer.setSingleShot(True)
+        self._rescan_timer.setInterval(self.COALESCE_DELAY)
+        self._rescan_timer.timeout.connect(self.rescan)
+        self._first_change = None
+
+        self._watch = QtCore.QFileSystemWatcher([str(directory)])
+        self._watch.directoryChanged.connect(self.changed)
+
+    def close(self):
+        self._rescan_timer.stop()
+        self._watch.directoryChanged.disconnect(self.changed)
+
+    def changed(self, path):
+        logger.debug(u'_QtBackend.changed [%s]', path)
+        now = time.time()
+        if self._first_change is None:
+            self._first_change = now
+        if 1000 * (now - self._first_change) >= self.COALESCE_LIMIT:
+            self.rescan()
+        else:
+            self._rescan_timer.start()
+
+    def rescan(self):
+        """Reports files added to and removed from the directory
+        """
+        self._rescan_timer.stop()
+        self._first_change = None
+        added, removed = self._index.rescan()
+        for path in removed:
+            self.removed.emit(path)
+        for path in added:
+            self.appeared.emit(path, False)
+
+
+class _InotifyBackend(QtCore.QObject):
+    """Watches a directory, and optionally its subdirectories, by reading
+    inotify events on a background thread. Files are reported when they are
+    closed after writing or are moved into a watched directory, so are
+    complete when reported. Linux only.
+    """
+
+    appeared = QtCore.Signal(Path, bool)
+    removed = QtCore.Signal(Path)
+
+    MASK = (inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO | inotify.IN_CREATE |
+            inotify.IN_DELETE | inotify.IN_MOVED_FROM | inotify.IN_ONLYDIR)
+
+    # Seconds between checks for close()
+    POLL_INTERVAL = 0.5
+
+    # Seconds for which a file must be unchanged to be complete
+    SETTLE_TIME = write_settle.SETTLE_TIME
+
+    def __init__(self, directory, regex, recursive=False, parent=None):
+        super(_InotifyBackend, self).__init__(parent)
+        self._regex = regex
+        self._recursive = recursive
+        self._inotify = inotify.Inotify()
+
+        # Watched directories, keyed by watch descriptor, and the matching
+        # files within them. Altered only by the background thread once it has
+        # started.
+        self._directories = {}
+        self._known = set()
+        self._watch(Path(directory), report=False)
+
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        self._closed.set()
+
+    def _run(self):
+        try:
+            while not self._closed.is_set():
+                for wd, mask, cookie, name in self._inotify.read_events(
+                        self.POLL_INTERVAL):
+                    self._event(wd, mask, name)
+        finally:
+            self._inotify.close()
+
+    def _watch(self, directory, report):
+        """Watches directory and, if recursive, its subdirectories. Emits
+        appeared for files already within directory if report is True.
+        """
+        wd = self._inotify.add_watch(directory, self.MASK)
+        self._directories[wd] = directory
+        for entry in scandir(str(directory)):
+            if entry.is_dir():
+                if self._recursive:
+                    self._watch(Path(entry.path), report)
+            elif entry.is_file() and self._regex.match(entry.path):
+                path = Path(entry.path)
+                if path not in self._known:
+                    self._known.add(path)
+                    if report:
+                        # Might still be being written
+                        self.appeared.emit(path, False)
+
+    def _event(self, wd, mask, name):
+        if mask & inotify.IN_Q_OVERFLOW:
+            logger.warning(u'_InotifyBackend event queue overflowed')
+            self._resync()
+        elif mask & inotify.IN_IGNORED:
+            self._directories.pop(wd, None)
+        elif wd in self._directories and name:
+            path = self._directories[wd] / name
+            if mask & inotify.IN_ISDIR:
+                self._directory_event(path, mask)
+            elif not self._regex.match(str(path)):
+                pass
+            elif mask & (inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO):
+                if path not in self._known:
+                    self._known.add(path)
+                    self.appeared.emit(path, True)
+            elif mask & (inotify.IN_DELETE | inotify.IN_MOVED_FROM):
+                if path in self._known:
+                    self._known.discard(path)
+                    self.removed.emit(path)
+
+    def _directory_event(self, path, mask):
+        if mask & (inotify.IN_CREATE | inotify.IN_MOVED_TO):
+            if self._recursive:
+                try:
+                    self._watch(path, report=True)
+                except OSError:
+                    # Already gone
+                    pass
+        elif mask & (inotify.IN_DELETE | inotify.IN_MOVED_FROM):
+            for wd, directory in list(self._directories.items()):
+                if directory == path or path in directory.parents:
+                    self._inotify.rm_watch(wd)
+                    del self._directories[wd]
+            for known in [p for p in self._known if path in p.parents]:
+                self._known.discard(known)
+                self.removed.emit(known)
+
+    def _resync(self):
+        """Reports differences between the known files and those present in
+        the watched directories
+        """
+        current = set()
+        for directory in self._directories.values():
+            try:
+                entries = list(scandir(str(directory)))
+            except OSError:
+                continue
+            current.update(Path(e.path) for e in entries
+                           if e.is_file() and self._regex.match(e.path))
+        for path in sorted(self._known.difference(current)):
+            self.removed.emit(path)
+        for path in sorted(current.difference(self._known)):
+            self.appeared.emit(path, False)
+        self._known = current
+
+
+class _PollingBackend(QtCore.QObject):
+    """Watches a directory by polling it on a background thread, for network
+    filesystems on which change notifications are not delivered. The
+    directory is read only when it might have changed - see DirectoryPoller.
+    Polls are frequent while files are arriving and back off to
+    AdaptiveInterval.MAXIMUM seconds while the directory is unchanged, which
+    bounds the time taken to detect a new file. Subdirectories are not
+    watched.
+    """
+
+    appeared = QtCore.Signal(Path, bool)
+    removed = QtCore.Signal(Path)
+
+    # Seconds for which a file must be unchanged to be complete, longer than
+    # the network filesystem client caches attributes - see polling.py
+    SETTLE_TIME = polling.SETTLE_TIME
+
+    def __init__(self, directory, regex, recursive=False, parent=None):
+        super(_PollingBackend, self).__init__(parent)
+        self._poller = DirectoryPoller(Path(directory), regex)
+        self._interval = AdaptiveInterval()
+
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        self._closed.set()
+
+    def _run(self):
+        while not self._closed.wait(self._interval.seconds):
+            try:
+                added, removed = self._poller.poll()
+            except OSError as e:
+                # The file server might be unavailable for a while
+                logger.warning(u'_PollingBackend unable to read [%s]: %s',
+                               self._poller.directory, e)
+                self._interval.unchanged()
+                continue
+            for path in removed:
+                self.removed.emit(path)
+            for path in added:
+                self.appeared.emit(path, False)
+            if added or removed:
+                self._interval.changed()
+            else:
+                self._interval.unchanged()
+        logger.debug(u'_PollingBackend made [%d] polls and [%d] scans of [%s]',
+                     self._poller.polls, self._poller.scans,
+                     self._poller.directory)
+
+
+# Watcher backends, by name
+BACKENDS = {
+    'qt': _QtBackend,
+    'inotify': _InotifyBackend,
+    'polling': _PollingBackend,
+}
+
+
+def default_backend(directory=None):
+    """The name of the best backend for this platform and, if given, for
+    directory
+    """
+    if directory and is_network_filesystem(directory):
+        return 'polling'
+    else:
+        return 'inotify' if inotify.available() else 'qt'
+
+
 class NewFileWatcher(QtCore.QObject):
     """Emits self.new_file(path) whenever a file name matches the given regular
-    expression appears in the given directory
+    expression appears in the given directory and self.file_complete(path)
+    once the file has been completely written. Emits self.file_removed(path)
+    when a matching file disappears.
+
+    Changes are detected by one of BACKENDS, by default that given by
+    default_backend() for directory. Subdirectories are watched if recursive
+    is True and the backend supports it.
+
+    Files that are already in the directory are not reported unless
+    ingest_backlog() is called. Those that have been completely written are
+    reported a page at a time by backlog_complete(paths).
     """
 
     # Emitted when a file appears in the directory given in __init__
     new_file = QtCore.Signal(Path)
 
-    def __init__(self, directory, regex, parent=None):
-        super(NewFileWatcher, self).__init__(parent)
+    # Emitted when a file given by new_file has been completely written
+    file_complete = QtCore.Signal(Path)
+
+    # Emitted with a list of files from the backlog that have been completely
+    # written
+    backlog_complete = QtCore.Signal(list)
 
-        print(u'Watching [{0}]'.format(directory))
+    # Emitted when a matching file disappears from the directory
+    file_removed = QtCore.Signal(Path)
 
+    # Maximum number of files waited upon concurrently
+    MAX_SETTLING = 8
+
+    # Number of backlog files reported at a time and milliseconds between
+    # pages, which leave the event loop free to handle input and to review
+    # the files already reported
+    BACKLOG_PAGE = 50
+    BACKLOG_INTERVAL = 100
+
+    # Backlog files modified less than this many seconds ago might still be
+    # being written
+    BACKLOG_SETTLED_AGE = 10
+
+    # Emitted, from a background thread, with the result of backlog()
+    _backlog_scanned = QtCore.Signal(object)
+
+    def __init__(self, directory, regex, backend=None, recursive=False,
+                 parent=None):
+        super(NewFileWatcher, self).__init__(parent)
+
+        backend = backend if backend else default_backend(directory)
+        logger.info(u'Watching [%s] using [%s]', directory, backend)
         self._directory = Path(directory)
         self._regex = regex
-        self._previous_files = self._matching_files()
+        self._closed = False
 
-        self._watch = QtCore.QFileSystemWatcher([unicode(directory)])
-        self._watch.directoryChanged.connect(self.changed)
+        # Files that were in the directory when watching started and that
+        # have yet to be reported
+        self._backlog = deque()
+        self._backlog_timer = QtCore.QTimer(self)
+        self._backlog_timer.timeout.connect(self._report_backlog_page)
+        self._backlog_scanned.connect(self._backlog_ready,
+            QtCore.Qt.QueuedConnection)
 
-    def changed(self, path):
-        print(u'NewFileWatcher.changed [{0}]'.format(path))
-        current = self._matching_files()
-        for new_file in sorted(current.difference(self._previous_files)):
-            print(u'New matching file in [{0}]: [{1}]'.format(path, new_file))
-            self.new_file.emit(new_file)
-        self._previous_files = current
-
-    def _matching_files(self):
-        """Returns set of files in self._directory that match IMAGE_SUFFIXES_RE
+        # Files are waited upon off the GUI thread
+        self._settle_pool = QtCore.QThreadPool(self)
+        self._settle_pool.setMaxThreadCount(self.MAX_SETTLING)
+        self._settle_signals = _SettleSignals(self)
+        self._settle_signals.settled.connect(self.file_complete,
+            QtCore.Qt.QueuedConnection)
+        self._settle_signals.abandoned.connect(self.abandoned,
+            QtCore.Qt.QueuedConnection)
+
+        try:
+            self._backend = BACKENDS[backend](directory, regex, recursive, self)
+        except OSError as e:
+            logger.warning(u'Unable to watch [%s] using [%s]: %s. Falling back '
+                           u'to [qt]', directory, backend, e)
+            self._backend = _QtBackend(directory, regex, recursive, self)
+        self._backend.appeared.connect(self._detected, QtCore.Qt.QueuedConnection)
+        self._backend.removed.connect(self.removed, QtCore.Qt.QueuedConnection)
+
+    def close(self):
+        """Stops watching
         """
-        files = self._directory.iterdir()
-        return set(p for p in files if p.is_file() and self._regex.match(unicode(p)))
+        self._closed = True
+        self._backend.close()
+        self._backlog_timer.stop()
+        self._backlog.clear()
+
+    def ingest_backlog(self):
+        """Reports, oldest first, the files that were in the directory before
+        watching started. The directory is read on a background thread and
+        files are reported a page at a time.
+        """
+        logger.debug(u'NewFileWatcher.ingest_backlog [%s]', self._directory)
+        scan = lambda: self._backlog_scanned.emit(backlog(self._directory,
+                                                          self._regex))
+        thread = threading.Thread(target=scan)
+        thread.daemon = True
+        thread.start()
+
+    def _backlog_ready(self, files):
+        if self._closed:
+            # Scanned after close() was called
+            return
+        logger.info(u'NewFileWatcher backlog of [%d] files', len(files))
+        self._backlog.extend(files)
+        self._report_backlog_page()
+        if self._backlog:
+            self._backlog_timer.start(self.BACKLOG_INTERVAL)
+
+    def _report_backlog_page(self):
+        settled = time.time() - self.BACKLOG_SETTLED_AGE
+        complete = []
+        for i in range(min(self.BACKLOG_PAGE, len(self._backlog))):
+            mtime, path = self._backlog.popleft()
+            if path.is_file():
+                logger.debug(u'New matching file [%s]', path)
+                self.new_file.emit(path)
+                if mtime < settled:
+                    complete.append(path)
+                else:
+                    self.settle(path)
+        if complete:
+            self.backlog_complete.emit(complete)
+        if not self._backlog:
+            self._backlog_timer.stop()
+
+    def _detected(self, path, complete):
+        """Slot for self._backend.appeared. Records the time between the file's
+        last modification and its detection.
+        """
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            # Already gone - will be reported as abandoned
+            pass
+        else:
+            recorder.record('detection', time.time() - mtime, path)
+        self.appeared(path, complete)
+
+    def appeared(self, path, complete):
+        logger.debug(u'New matching file [%s]', path)
+        self.new_file.emit(path)
+        if complete:
+            self.file_complete.emit(path)
+        else:
+            self.settle(path)
+
+    def removed(self, path):
+        logger.debug(u'Matching file removed [%s]', path)
+        self.file_removed.emit(path)
+
+    def settle(self, path):
+        """Waits in the background for path to be completely written, for as
+        long as the backend requires
+        """
+        self._settle_pool.start(_SettleTask(path, self._backend.SETTLE_TIME,
+                                            self._settle_signals))
+
+    def abandoned(self, path):
+        logger.warning(u'NewFileWatcher.abandoned [%s] - file vanished or did '
+                       u'not finish being written', path)
@@ -0,0 +1,165 @@
+import bisect
+import heapq
+import os
+import time
+
+from collections import OrderedDict
+from itertools import count, islice
+
+
+# Orders in which files are taken from a PendingQueue
+LIFO = 'lifo'
+FIFO = 'fifo'
+MTIME = 'mtime'
+
+# Descriptions of orders, for the user
+ORDERS = OrderedDict([
+    (LIFO, 'Most recently added first'),
+    (FIFO, 'Least recently added first'),
+    (MTIME, 'Oldest modification time first'),
+])
+
+
+class PendingQueue(object):
+    """Files awaiting review, taken in one of the orders LIFO, FIFO or MTIME.
+    Each file is held at most once. Membership tests and removal take constant
+    time.
+    """
+    def __init__(self, order=LIFO):
+        # Values are tuples (sequence number, time added, mtime), in the
+        # order in which files were added
+        self._entries = OrderedDict()
+        self._sequence = count()
+
+        # Tuples (mtime, sequence number, path) for MTIME. Entries for files
+        # that have been removed are discarded lazily, and the heap is rebuilt
+        # when they outnumber the entries of queued files.
+        self._heap = []
+
+        # The first of the heap's current tuples, in order, for peek, and the
+        # greatest number that are held. Kept up to date as files are added
+        # and removed, so that peek does not read the whole heap each time.
+        self._prefix = []
+        self._prefix_size = 0
+        self.order = None
+        self.set_order(order)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, path):
+        return path in self._entries
+
+    def __iter__(self):
+        """Paths in the order in which they will be taken
+        """
+        return iter(self.peek(len(self)))
+
+    def set_order(self, order):
+        if order not in ORDERS:
+            raise ValueError('Unknown order [{0}]'.format(order))
+        self.order = order
+        self._prefix = []
+        if MTIME == order:
+            self._heap = []
+            for path, (sequence, added, mtime) in list(self._entries.items()):
+                if mtime is None:
+                    mtime = self._mtime(path)
+                    self._entries[path] = (sequence, added, mtime)
+                self._heap.append((mtime, sequence, path))
+            heapq.heapify(self._heap)
+
+    def push(self, path, mtime=None):
+        """Adds path. Returns False if path was already queued.
+        """
+        if path in self._entries:
+            return False
+        else:
+            sequence = next(self._sequence)
+            if mtime is None and MTIME == self.order:
+                mtime = self._mtime(path)
+            self._entries[path] = (sequence, time.time(), mtime)
+            if MTIME == self.order:
+                entry = (mtime, sequence, path)
+                heapq.heappush(self._heap, entry)
+                if self._prefix and entry < self._prefix[-1]:
+                    bisect.insort(self._prefix, entry)
+                    if len(self._prefix) > self._prefix_size:
+                        self._prefix.pop()
+            return True
+
+    def pop(self):
+        """Removes and returns the next path. Raises IndexError if empty.
+        """
+        if not self._entries:
+            raise IndexError('pop from an empty PendingQueue')
+        elif LIFO == self.order:
+            return self._entries.popitem(last=True)[0]
+        elif FIFO == self.order:
+            return self._entries.popitem(last=False)[0]
+        else:
+            while True:
+                mtime, sequence, path = heapq.heappop(self._heap)
+                if self._current(sequence, path):
+                    del self._entries[path]
+                    if self._prefix:
+                        # The first of the prefix is the entry popped
+                        del self._prefix[0]
+                    return path
+
+    def remove(self, path):
+        """Removes path. Returns False if path was not queued.
+        """
+        entry = self._entries.pop(path, None)
+        if entry is None:
+            return False
+        elif MTIME == self.order:
+            sequence, added, mtime = entry
+            if self._prefix and (mtime, sequence, path) <= self._prefix[-1]:
+                self._prefix.remove((mtime, sequence, path))
+            if len(self._heap) > 2 * len(self._entries):
+                self._compact()
+        return True
+
+    def peek(self, n):
+        """A list of the next n paths, in the order in which they will be taken
+        """
+        if LIFO == self.order:
+            return list(islice(reversed(self._entries), n))
+        elif FIFO == self.order:
+            return list(islice(iter(self._entries), n))
+        else:
+            if len(self._prefix) < min(n, len(self._entries)):
+                # Twice as many as needed, so that the heap is not read again
+                # until n of them have been taken or removed
+                self._prefix_size = 2 * n
+                current = (e for e in self._heap if self._current(e[1], e[2]))
+                self._prefix = heapq.nsmallest(self._prefix_size, current)
+            return [path for mtime, sequence, path in self._prefix[:n]]
+
+    def oldest_age(self, now=None):
+        """Seconds for which the longest-waiting path has been queued, or None
+        if the queue is empty
+        """
+        if self._entries:
+            sequence, added, mtime = next(iter(self._entries.values()))
+            return (time.time() if now is None else now) - added
+        else:
+            return None
+
+    def _compact(self):
+        """Discards the heap's entries for files that have been removed
+        """
+        self._heap = [e for e in self._heap if self._current(e[1], e[2])]
+        heapq.heapify(self._heap)
+
+    def _current(self, sequence, path):
+        entry = self._entries.get(path)
+        return entry is not None and entry[0] == sequence
+
+    def _mtime(self, path):
+        try:
+            return os.stat(str(path)).st_mtime
+        except OSError:
+            # Will fail when reviewed
+            return 0
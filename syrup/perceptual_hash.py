@@ -0,0 +1,121 @@
+"""Perceptual hashes of images, which are similar for images that look alike,
+and an index in which near-duplicates are found by Hamming distance.
+
+phash() is a DCT hash: the image is reduced to REDUCED_SIZE square pixels of
+grey and each bit records whether one of the DCT_SIZE x DCT_SIZE lowest
+frequency coefficients of the reduced image is above their median. Specimens
+are shot against the same copy-stand background, which dominates the very
+lowest frequencies, so enough coefficients are used for the object and its
+labels to set many bits. Captures of different specimens on a shared
+background differ in well over MAX_DISTANCE of the 1024 bits, while two
+captures of the same shot, whatever their format, size or compression,
+differ in a few tens at most.
+"""
+import binascii
+
+import cv2
+
+import numpy as np
+
+
+# Width and height of the reduced image and of the block of coefficients
+REDUCED_SIZE = 128
+DCT_SIZE = 32
+
+# Number of bytes in a hash
+HASH_BYTES = DCT_SIZE * DCT_SIZE // 8
+
+# Number of bits in which hashes can differ and still be near-duplicates
+MAX_DISTANCE = 48
+
+# Number of set bits in each byte value
+_POPCOUNT = np.array([bin(v).count('1') for v in range(256)], dtype=np.uint8)
+
+
+def phash(bgr):
+    """The perceptual hash, as HASH_BYTES bytes, of the BGR or greyscale numpy
+    array bgr
+    """
+    grey = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY) if 3 == bgr.ndim else bgr
+    small = cv2.resize(grey, (REDUCED_SIZE, REDUCED_SIZE),
+                       interpolation=cv2.INTER_AREA).astype(np.float32)
+    coefficients = cv2.dct(small)[:DCT_SIZE, :DCT_SIZE].ravel()
+    return np.packbits(coefficients > np.median(coefficients)).tobytes()
+
+
+def hex_of_hash(hash):
+    return binascii.hexlify(hash).decode('ascii')
+
+
+def hash_of_hex(hex):
+    """The hash given by hex. Raises ValueError if hex is not the hex of a
+    hash of HASH_BYTES.
+    """
+    try:
+        hash = binascii.unhexlify(hex)
+    except (TypeError, binascii.Error):
+        raise ValueError('Not a hex string [{0}]'.format(hex))
+    if HASH_BYTES != len(hash):
+        raise ValueError('Not a hash of {0} bytes [{1}]'.format(HASH_BYTES,
+                                                                 hex))
+    return hash
+
+
+class HashIndex(object):
+    """Perceptual hashes, each with a key, held in a numpy array so that the
+    distance to all of them is computed in a single pass. Not thread safe.
+    """
+
+    # Initial capacity of the array
+    CAPACITY = 1024
+
+    def __init__(self, items=()):
+        self._hashes = np.zeros((self.CAPACITY, HASH_BYTES), dtype=np.uint8)
+        self._keys = []
+        self._key_set = set()
+        for key, hash in items:
+            self.add(key, hash)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._key_set
+
+    def add(self, key, hash):
+        """Adds hash, given by phash(), with key
+        """
+        n = len(self._keys)
+        if n == len(self._hashes):
+            grown = np.zeros((2 * n, HASH_BYTES), dtype=np.uint8)
+            grown[:n] = self._hashes
+            self._hashes = grown
+        self._hashes[n] = np.frombuffer(hash, dtype=np.uint8)
+        self._keys.append(key)
+        self._key_set.add(key)
+
+    def distances(self, hash):
+        """A numpy array of the number of bits in which each hash in the index,
+        in the order in which they were added, differs from hash
+        """
+        differ = self._hashes[:len(self._keys)] ^ np.frombuffer(hash,
+                                                                dtype=np.uint8)
+        return _POPCOUNT[differ].sum(axis=1, dtype=np.int64)
+
+    def near(self, hash, max_distance=MAX_DISTANCE):
+        """A list of (key, distance) of hashes that differ from hash in no more
+        than max_distance bits, nearest first
+        """
+        distances = self.distances(hash)
+        matches = np.flatnonzero(distances <= max_distance)
+        matches = matches[np.argsort(distances[matches], kind='stable')]
+        return [(self._keys[i], int(distances[i])) for i in matches]
+
+
+class PerceptualHashAnalyser(object):
+    """Computes the phash of images. An analyser for AnalyseAhead.
+    """
+    name = 'phash'
+
+    def __call__(self, bgr):
+        return phash(bgr)
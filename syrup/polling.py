@@ -0,0 +1,112 @@
+"""Polling a directory for added and removed files, for filesystems on which
+change notifications are not delivered.
+
+Creating, removing or renaming a file changes the modification time of its
+directory, so DirectoryPoller stats the directory, which is a single request
+to a file server, and reads the whole directory only when its modification
+time has changed. Some filesystems record times to the nearest second or two,
+so that further changes soon after one that was seen might not alter the
+modification time, and so the directory is also read on each poll for
+MTIME_RESOLUTION seconds after its modification time was seen to change.
+Times given by the file server are compared only with each other, never with
+the local clock. Clients of network filesystems cache attributes for some
+seconds, so the directory is also read if it has not been read for
+FULL_SCAN_INTERVAL seconds.
+
+For the same reason a file's size and modification time can appear unchanged
+while it is still being written, so files on network filesystems must be
+unchanged for SETTLE_TIME seconds, which is longer than clients usually cache
+attributes, before they are taken to be complete.
+
+AdaptiveInterval gives the time until the next poll, which is short while
+files are arriving and lengthens while the directory is unchanged.
+"""
+import os
+import time
+
+from .directory_index import DirectoryIndex
+
+
+# Seconds for which clients of network filesystems cache a file's attributes
+# by default - NFS's acregmin; CIFS caches them for one second
+ATTRIBUTE_CACHE_TIME = 3.0
+
+# Seconds for which a file's size and mtime must be unchanged
+SETTLE_TIME = 5.0
+
+
+class AdaptiveInterval(object):
+    """Seconds between polls, from minimum after a change, growing by factor
+    after each poll that finds no change, to at most maximum
+    """
+
+    MINIMUM = 0.25
+    MAXIMUM = 5.0
+    FACTOR = 1.5
+
+    def __init__(self, minimum=MINIMUM, maximum=MAXIMUM, factor=FACTOR):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.seconds = minimum
+
+    def changed(self):
+        """Call when a poll found changes. Returns the new interval.
+        """
+        self.seconds = self.minimum
+        return self.seconds
+
+    def unchanged(self):
+        """Call when a poll found no changes. Returns the new interval.
+        """
+        self.seconds = min(self.maximum, self.seconds * self.factor)
+        return self.seconds
+
+
+class DirectoryPoller(object):
+    """The files in directory whose paths match regex, reread only when the
+    directory might have changed
+    """
+
+    # Seconds after which the directory is read even if its modification time
+    # has not changed
+    FULL_SCAN_INTERVAL = 30.0
+
+    # Seconds within which further changes might not alter the directory's
+    # modification time
+    MTIME_RESOLUTION = 2.0
+
+    def __init__(self, directory, regex,
+                 full_scan_interval=FULL_SCAN_INTERVAL):
+        self.directory = directory
+        self.full_scan_interval = full_scan_interval
+        self._mtime = os.stat(str(directory)).st_mtime
+        self._index = DirectoryIndex(directory, regex)
+
+        # Local times of the last read of the directory and of the last poll
+        # that found its modification time changed
+        self._scanned = time.time()
+        self._changed = None
+
+        # Number of polls and of the reads of the directory that they made
+        self.polls = self.scans = 0
+
+    def poll(self, now=None):
+        """Returns a tuple of sorted lists of the Paths added and removed
+        since the previous poll
+        """
+        now = time.time() if now is None else now
+        self.polls += 1
+        mtime = os.stat(str(self.directory)).st_mtime
+        if mtime != self._mtime:
+            self._changed = now
+        if (mtime != self._mtime or
+                (self._changed is not None and
+                 now - self._changed < self.MTIME_RESOLUTION) or
+                now - self._scanned >= self.full_scan_interval):
+            self._mtime = mtime
+            self._scanned = now
+            self.scans += 1
+            return self._index.rescan()
+        else:
+            return [], []
@@ -0,0 +1,118 @@
+"""Timings of the phases of application startup and of the modules imported
+during each phase.
+"""
+import sys
+import threading
+import time
+
+from contextlib import contextmanager
+
+try:
+    import builtins
+except ImportError:
+    # Python 2
+    import __builtin__ as builtins
+
+
+# A monotonic clock, where available
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+class StartupProfile(object):
+    """Records the duration of named phases and, while the import hook is
+    installed, the time taken by each import that loads new modules. Times
+    are inclusive of nested imports, as with python -X importtime. Thread
+    safe, so imports made by background threads are recorded.
+
+    Timings are written to stream as they are recorded. Nothing is written if
+    stream is None.
+    """
+
+    # Number of imports written by report_imports()
+    IMPORTS_REPORTED = 25
+
+    def __init__(self, stream=None):
+        self.start = _clock()
+        self.stream = stream
+
+        # Tuples (name, start, seconds), in the order in which they finished
+        self.phases = []
+
+        # Seconds, keyed by module name
+        self.imports = {}
+        self._lock = threading.Lock()
+        self._original_import = None
+
+    def elapsed(self):
+        """Seconds since the profile was created
+        """
+        return _clock() - self.start
+
+    @contextmanager
+    def phase(self, name):
+        """A context manager that records the time taken by its body and
+        writes the time to self.stream
+        """
+        start = _clock()
+        try:
+            yield
+        finally:
+            seconds = _clock() - start
+            with self._lock:
+                self.phases.append((name, start - self.start, seconds))
+            self._write(u'{0:8.1f} ms  {1} (finished at {2:.1f} ms)'.format(
+                1000 * seconds, name, 1000 * (start + seconds - self.start)))
+
+    def mark(self, name):
+        """Records that the point name has been reached
+        """
+        now = _clock() - self.start
+        with self._lock:
+            self.phases.append((name, now, 0))
+        self._write(u'{0:>11}  {1} (at {2:.1f} ms)'.format('', name, 1000 * now))
+
+    def install_import_hook(self):
+        """Starts timing imports
+        """
+        if not self._original_import:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._import
+
+    def remove_import_hook(self):
+        """Stops timing imports
+        """
+        if self._original_import:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import or builtins.__import__
+        if 0 == level and name in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+
+        modules, start = len(sys.modules), _clock()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            if len(sys.modules) > modules:
+                if level:
+                    package = (globals or {}).get('__package__') or ''
+                    name = '{0}.{1}'.format(package, name) if name else package
+                seconds = _clock() - start
+                with self._lock:
+                    self.imports[name] = self.imports.get(name, 0) + seconds
+
+    def report_imports(self):
+        """Writes the slowest imports to self.stream
+        """
+        with self._lock:
+            imports = sorted(self.imports.items(), key=lambda i: i[1],
+                             reverse=True)
+        self._write(u'Slowest imports:')
+        for name, seconds in imports[:self.IMPORTS_REPORTED]:
+            self._write(u'{0:8.1f} ms  {1}'.format(1000 * seconds, name))
+
+    def _write(self, line):
+        if self.stream:
+            self.stream.write(line + u'\n')
+            self.stream.flush()
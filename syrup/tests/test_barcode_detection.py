@@ -0,0 +1,62 @@
+import unittest
+
+import cv2
+
+import numpy as np
+
+from syrup.barcode_detection import BarcodeAnalyser, Reading, choose, decode
+from syrup.barcodes import SPECIMEN_RE, LOCATION_RE
+
+
+def _qr_image(values):
+    """A white BGR array with a QR code of each of values, side by side
+    """
+    image = np.full((600, 400 * len(values) + 100, 3), 255, np.uint8)
+    encoder = cv2.QRCodeEncoder.create()
+    for i, value in enumerate(values):
+        code = cv2.resize(encoder.encode(value), None, fx=10, fy=10,
+                          interpolation=cv2.INTER_NEAREST)
+        height, width = code.shape[:2]
+        left = 100 + 400 * i
+        image[100:100 + height, left:left + width] = code[..., np.newaxis]
+    return image
+
+
+class TestChoose(unittest.TestCase):
+    def test_nothing_found(self):
+        self.assertIsNone(choose([set(), set()], SPECIMEN_RE))
+
+    def test_no_match(self):
+        self.assertIsNone(choose([{'hello'}, {'12345'}], SPECIMEN_RE))
+
+    def test_all_scales(self):
+        found = [{'012345678', 'L012345678'}, {'012345678'}]
+        self.assertEqual(Reading('012345678', 1.0), choose(found, SPECIMEN_RE))
+        self.assertEqual(Reading('L012345678', 0.5),
+                         choose(found, LOCATION_RE))
+
+    def test_conflicting(self):
+        found = [{'012345678', '999999999'}, {'012345678'}]
+        self.assertEqual(Reading('012345678', 0.5), choose(found, SPECIMEN_RE))
+
+    def test_tie_is_deterministic(self):
+        found = [{'999999999'}, {'012345678'}]
+        self.assertEqual(Reading('012345678', 0.25), choose(found, SPECIMEN_RE))
+
+
+@unittest.skipUnless(hasattr(cv2, 'QRCodeEncoder'),
+                     'OpenCV cannot encode QR codes')
+class TestDetection(unittest.TestCase):
+    def test_decode(self):
+        found = decode(_qr_image(['L012345678']))
+        self.assertIn('L012345678', set().union(*found))
+
+    def test_analyser(self):
+        res = BarcodeAnalyser()(_qr_image(['012345678', 'L987654321']))
+        self.assertEqual('012345678', res['specimen'].value)
+        self.assertEqual('L987654321', res['location'].value)
+
+    def test_analyser_nothing(self):
+        image = np.full((300, 300, 3), 255, np.uint8)
+        self.assertEqual({'specimen': None, 'location': None},
+                         BarcodeAnalyser()(image))
@@ -0,0 +1,131 @@
+import codecs
+import shutil
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from syrup.batch import main, read_manifest, validate, run, write_report
+from syrup.manifest import ProcessedManifest
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = Path(tempfile.mkdtemp())
+        self.processed = self.tempdir / 'processed'
+        self.processed.mkdir()
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tempdir))
+
+    def _manifest(self, contents, name='manifest.csv'):
+        path = self.tempdir / name
+        with path.open('w') as f:
+            f.write(contents)
+        return path
+
+    def test_read_csv(self):
+        path = self._manifest(u'Location,File,Specimen\n'
+                              u'L000000001, a.jpg ,000000001\n'
+                              u'\n'
+                              u'L000000002,b.jpg,000000002\n')
+        rows = read_manifest(path)
+        self.assertEqual(2, len(rows))
+        self.assertEqual((2, self.tempdir / 'a.jpg', '000000001', 'L000000001'),
+                         tuple(rows[0]))
+        self.assertEqual(4, rows[1].line)
+
+    def test_read_bom(self):
+        path = self.tempdir / 'excel.csv'
+        with path.open('wb') as f:
+            f.write(codecs.BOM_UTF8 + b'file,specimen,location\r\n'
+                                      b'a.jpg,000000001,L000000001\r\n')
+        rows = read_manifest(path)
+        self.assertEqual([(2, self.tempdir / 'a.jpg', '000000001',
+                           'L000000001')], [tuple(r) for r in rows])
+
+    def test_read_tsv(self):
+        path = self._manifest(u'file\tspecimen\tlocation\n'
+                              u'a.jpg\t000000001\tL000000001\n', 'm.tsv')
+        self.assertEqual('L000000001', read_manifest(path)[0].location)
+
+    def test_missing_columns(self):
+        path = self._manifest(u'file,specimen\na.jpg,000000001\n')
+        self.assertRaises(ValueError, read_manifest, path)
+
+    def test_empty(self):
+        path = self._manifest(u'')
+        self.assertRaises(ValueError, read_manifest, path)
+
+    def test_main_bad_manifest(self):
+        path = self._manifest(u'')
+        self.assertEqual(1, main(['batch', str(path), str(self.processed)]))
+        missing = str(self.tempdir / 'missing.csv')
+        self.assertEqual(1, main(['batch', missing, str(self.processed)]))
+
+    def test_validate(self):
+        (self.tempdir / 'a.jpg').open('w').close()
+        path = self._manifest(u'file,specimen,location\n'
+                              u'a.jpg,000000001,L000000001\n'
+                              u'a.jpg,000000001,L000000001\n'
+                              u'b.jpg,000000001,L000000001\n'
+                              u'a.jpg,1,L000000001\n'
+                              u'a.jpg,000000001,000000001\n')
+        tasks, invalid = validate(read_manifest(path), self.processed)
+        self.assertEqual(1, len(tasks))
+        self.assertEqual(self.processed / '000000001_L000000001.jpg', tasks[0][1])
+        self.assertEqual([3, 4, 5, 6], [r.line for r in invalid])
+        self.assertEqual(set(['invalid']), set(r.status for r in invalid))
+
+    def test_run(self):
+        lines = [u'file,specimen,location']
+        for i in range(6):
+            (self.tempdir / '{0}.jpg'.format(i)).open('w').close()
+            lines.append(u'{0}.jpg,00000000{1},L000000001'.format(i, i % 2))
+        path = self._manifest(u'\n'.join(lines))
+        tasks, invalid = validate(read_manifest(path), self.processed)
+
+        results = run(tasks, workers=3, dry_run=True)
+        self.assertEqual(set(['would move']), set(r.status for r in results))
+        self.assertTrue((self.tempdir / '0.jpg').is_file())
+
+        progress = []
+        results = run(tasks, workers=3,
+                      progress=lambda done, total: progress.append(done))
+        self.assertEqual(set(['moved']), set(r.status for r in results))
+        self.assertEqual(6, progress[-1])
+        self.assertEqual(sorted(['000000000_L000000001.jpg',
+                                 '000000000_L000000001_(1).jpg',
+                                 '000000000_L000000001_(2).jpg',
+                                 '000000001_L000000001.jpg',
+                                 '000000001_L000000001_(1).jpg',
+                                 '000000001_L000000001_(2).jpg']),
+                         sorted(p.name for p in self.processed.iterdir()))
+
+        report = self.tempdir / 'report.csv'
+        write_report(results, report)
+        with report.open() as f:
+            self.assertEqual(7, len(f.read().splitlines()))
+
+    def test_main_records(self):
+        with (self.tempdir / 'a.jpg').open('wb') as f:
+            f.write(b'abc')
+        path = self._manifest(u'file,specimen,location\n'
+                              u'a.jpg,000000001,L000000001\n')
+        self.assertEqual(0, main(['batch', str(path), str(self.processed),
+                                  '-q']))
+        manifest = ProcessedManifest.for_directory(self.processed)
+        try:
+            entries = manifest.by_specimen('000000001')
+        finally:
+            manifest.close()
+        self.assertEqual(1, len(entries))
+        self.assertEqual(str(self.tempdir / 'a.jpg'), entries[0].source)
+        self.assertEqual(str(self.processed / '000000001_L000000001.jpg'),
+                         entries[0].destination)
+        self.assertEqual(3, entries[0].size)
+        self.assertTrue(entries[0].hash)
+
+
+if __name__=='__main__':
+    unittest.main()
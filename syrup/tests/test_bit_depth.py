@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+
+from syrup.bit_depth import as_uint8
+
+
+class TestAsUint8(unittest.TestCase):
+    def test_uint8(self):
+        image = np.arange(12, dtype=np.uint8).reshape(2, 2, 3)
+        self.assertIs(image, as_uint8(image))
+
+    def test_uint16(self):
+        image = np.array([[0, 0x00ff, 0x0100, 0xffff]], dtype=np.uint16)
+        converted = as_uint8(image)
+        self.assertEqual(np.uint8, converted.dtype)
+        self.assertEqual([[0, 0, 1, 255]], converted.tolist())
+
+    def test_endianness(self):
+        values = [[0x1234, 0xff00], [0x00ff, 0x8001]]
+        for dtype in ('<u2', '>u2'):
+            image = np.array(values, dtype=dtype)
+            self.assertEqual([[0x12, 0xff], [0, 0x80]],
+                             as_uint8(image).tolist())
+
+    def test_uint16_not_contiguous(self):
+        image = np.arange(0, 0x10000, 0x100, dtype=np.uint16).reshape(16, 16)
+        view = image[::2, 1::3]
+        self.assertFalse(view.flags.c_contiguous)
+        converted = as_uint8(view)
+        self.assertTrue(converted.flags.c_contiguous)
+        self.assertEqual((view >> 8).tolist(), converted.tolist())
+
+    def test_uint16_channels(self):
+        image = np.zeros((2, 3, 3), dtype='>u2')
+        image[..., 2] = 0xabcd
+        converted = as_uint8(image)
+        self.assertEqual((2, 3, 3), converted.shape)
+        self.assertEqual([0, 0, 0xab], converted[1, 2].tolist())
+
+    def test_float(self):
+        for dtype in (np.float32, np.float64):
+            image = np.array([[-1, 0, 0.5, 1, 2]], dtype=dtype)
+            self.assertEqual([[0, 0, 128, 255, 255]], as_uint8(image).tolist())
+
+    def test_other_integers(self):
+        image = np.array([[-5, 100, 300]], dtype=np.int32)
+        self.assertEqual([[0, 100, 255]], as_uint8(image).tolist())
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+import cv2
+
+import numpy as np
+
+from syrup.capture_quality import (assess, exposure, sharpness, Quality,
+                                   QualityAnalyser)
+
+
+def _specimen(blur=0):
+    """A BGR array of dark text on a pale background, blurred by a Gaussian
+    of standard deviation blur
+    """
+    image = np.full((1000, 1500, 3), 220, np.uint8)
+    cv2.putText(image, 'NHMUK 012345678', (100, 500),
+                cv2.FONT_HERSHEY_SIMPLEX, 3, (30, 30, 30), 6)
+    if blur:
+        image = cv2.GaussianBlur(image, (0, 0), blur)
+    return image
+
+
+class TestCaptureQuality(unittest.TestCase):
+    def test_sharpness(self):
+        sharp = sharpness(cv2.cvtColor(_specimen(), cv2.COLOR_BGR2GRAY))
+        blurred = sharpness(cv2.cvtColor(_specimen(4), cv2.COLOR_BGR2GRAY))
+        self.assertGreater(sharp, 10 * blurred)
+
+    def test_sharpness_small(self):
+        self.assertEqual(0, sharpness(np.zeros((10, 10), np.uint8)))
+
+    def test_exposure(self):
+        image = np.full((10, 10, 3), 128, np.uint8)
+        self.assertEqual((0, 0), exposure(image))
+        image[:2, :, 2] = 255
+        image[-1, :] = 0
+        self.assertEqual((0.2, 0.1), exposure(image))
+        self.assertEqual((0, 0.1), exposure(image[:, :, 0]))
+
+    def test_assess(self):
+        quality = assess(_specimen())
+        self.assertEqual((0, 0), (quality.highlights, quality.shadows))
+        self.assertGreater(quality.sharpness, QualityAnalyser.MIN_SHARPNESS)
+        self.assertLess(assess(_specimen(4)).sharpness,
+                        QualityAnalyser.MIN_SHARPNESS)
+
+    def test_assess_reduced(self):
+        # Sharpness is measured at a fixed size
+        image = _specimen()
+        large = cv2.resize(image, None, fx=2, fy=2,
+                           interpolation=cv2.INTER_NEAREST)
+        self.assertAlmostEqual(1, assess(large, size=1000).sharpness /
+                                  assess(image, size=1000).sharpness, 0)
+
+
+class TestQualityAnalyser(unittest.TestCase):
+    def test_problems(self):
+        analyser = QualityAnalyser()
+        self.assertEqual([], analyser.problems(Quality(100, 0, 0)))
+        problems = analyser.problems(Quality(1, 0.5, 0.25))
+        self.assertEqual(3, len(problems))
+        self.assertIn('focus', problems[0])
+        self.assertIn('50%', problems[1])
+        self.assertIn('25%', problems[2])
+
+    def test_call(self):
+        quality = QualityAnalyser()(np.full((100, 100, 3), 255, np.uint8))
+        self.assertEqual(1, quality.highlights)
+        self.assertEqual(['Overexposed - 100% of pixels are white'],
+                         [p for p in QualityAnalyser().problems(quality)
+                          if 'exposed' in p])
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from pathlib import Path
+
+from syrup.claims import ClaimRegistry, CLAIMS_DIRECTORY
+
+
+class TestClaimRegistry(unittest.TestCase):
+    def setUp(self):
+        self.inbox = Path(tempfile.mkdtemp())
+        self.image = self.inbox / 'image.jpg'
+        with self.image.open('wb') as f:
+            f.write(b'image')
+        self.first = ClaimRegistry(self.inbox, owner='first')
+        self.second = ClaimRegistry(self.inbox, owner='second')
+
+    def tearDown(self):
+        shutil.rmtree(str(self.inbox))
+
+    def _age(self, registry, path, seconds):
+        "Makes the claim on path appear seconds old"
+        then = time.time() - seconds
+        os.utime(str(registry._claim_file(path)), (then, then))
+
+    def test_directory(self):
+        self.assertTrue((self.inbox / CLAIMS_DIRECTORY).is_dir())
+
+    def test_exclusive(self):
+        self.assertTrue(self.first.claim(self.image))
+        self.assertFalse(self.second.claim(self.image))
+        self.assertTrue(self.second.claimed_elsewhere(self.image))
+        self.assertFalse(self.first.claimed_elsewhere(self.image))
+        self.assertEqual(set([self.image]), self.first.held)
+        self.assertEqual(set(), self.second.held)
+
+    def test_claim_again(self):
+        self.assertTrue(self.first.claim(self.image))
+        self.assertTrue(self.first.claim(self.image))
+
+    def test_release(self):
+        self.first.claim(self.image)
+        self.first.release(self.image)
+        self.assertFalse(self.second.claimed_elsewhere(self.image))
+        self.assertTrue(self.second.claim(self.image))
+
+    def test_release_not_held(self):
+        self.first.claim(self.image)
+        self.second.release(self.image)
+        self.assertTrue(self.second.claimed_elsewhere(self.image))
+
+    def test_release_all(self):
+        other = self.inbox / 'other.jpg'
+        self.first.claim(self.image)
+        self.first.claim(other)
+        self.first.release_all()
+        self.assertEqual(set(), self.first.held)
+        self.assertTrue(self.second.claim(self.image))
+        self.assertTrue(self.second.claim(other))
+
+    def test_expiry(self):
+        self.first.claim(self.image)
+        self._age(self.first, self.image, 2 * ClaimRegistry.LEASE)
+        self.assertFalse(self.second.claimed_elsewhere(self.image))
+        self.assertTrue(self.second.claim(self.image))
+        self.assertTrue(self.first.claimed_elsewhere(self.image))
+
+    def test_renew(self):
+        self.first.claim(self.image)
+        self._age(self.first, self.image, ClaimRegistry.LEASE - 1)
+        self.assertEqual([], self.first.renew())
+        self._age(self.first, self.image, 1)
+        self.assertFalse(self.second.claim(self.image))
+
+    def test_renew_lost(self):
+        self.first.claim(self.image)
+        self._age(self.first, self.image, 2 * ClaimRegistry.LEASE)
+        self.second.claim(self.image)
+        self.assertEqual([self.image], self.first.renew())
+        self.assertEqual(set(), self.first.held)
+
+    def test_renew_broken(self):
+        self.first.claim(self.image)
+        self.first._claim_file(self.image).unlink()
+        self.assertEqual([], self.first.renew())
+        self.assertTrue(self.second.claimed_elsewhere(self.image))
+
+    def test_break_after_reclaim(self):
+        # first and second both find crashed's claim expired; second breaks
+        # it and makes a fresh claim before first renames the claim file
+        crashed = ClaimRegistry(self.inbox, owner='crashed')
+        crashed.claim(self.image)
+        self._age(crashed, self.image, 2 * ClaimRegistry.LEASE)
+        claim = self.first._claim_file(self.image)
+        self.assertTrue(self.second.claim(self.image))
+        self.first._break(claim, 'crashed')
+        self.assertTrue(claim.is_file())
+        self.assertEqual('second', self.first._owner(claim))
+        self.assertFalse(self.first.claim(self.image))
+        self.assertEqual([], self.second.renew())
+        self.assertEqual([], list(claim.parent.glob('*.stale')))
+
+    def test_break_expired(self):
+        self.first.claim(self.image)
+        self._age(self.first, self.image, 2 * ClaimRegistry.LEASE)
+        claim = self.second._claim_file(self.image)
+        self.second._break(claim, 'first')
+        self.assertFalse(claim.exists())
+        self.assertEqual([], list(claim.parent.glob('*.stale')))
+
+
+if __name__=='__main__':
+    unittest.main()
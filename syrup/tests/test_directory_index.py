@@ -0,0 +1,63 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from syrup.directory_index import DirectoryIndex, backlog
+
+
+class TestDirectoryIndex(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tempdir))
+
+    def test_initial_files(self):
+        (self.tempdir / 'a.jpg').open('w').close()
+        (self.tempdir / 'b.txt').open('w').close()
+        (self.tempdir / 'c.jpg').mkdir()
+        index = DirectoryIndex(self.tempdir, re.compile(r'^.*\.jpg$'))
+        self.assertEqual(set([self.tempdir / 'a.jpg']), index.files)
+        self.assertIn(self.tempdir / 'a.jpg', index)
+        self.assertEqual(1, len(index))
+
+    def test_rescan(self):
+        (self.tempdir / 'a.jpg').open('w').close()
+        index = DirectoryIndex(self.tempdir, re.compile(r'^.*\.jpg$'))
+        self.assertEqual(([], []), index.rescan())
+
+        (self.tempdir / 'c.jpg').open('w').close()
+        (self.tempdir / 'b.jpg').open('w').close()
+        (self.tempdir / 'b.txt').open('w').close()
+        (self.tempdir / 'a.jpg').unlink()
+        self.assertEqual(([self.tempdir / 'b.jpg', self.tempdir / 'c.jpg'],
+                          [self.tempdir / 'a.jpg']),
+                         index.rescan())
+        self.assertEqual(([], []), index.rescan())
+
+
+class TestBacklog(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tempdir))
+
+    def test_oldest_first(self):
+        for name, mtime in (('a.jpg', 300), ('b.jpg', 100), ('c.txt', 50),
+                            ('d.jpg', 200)):
+            path = self.tempdir / name
+            path.open('w').close()
+            os.utime(str(path), (mtime, mtime))
+        self.assertEqual([(100, self.tempdir / 'b.jpg'),
+                          (200, self.tempdir / 'd.jpg'),
+                          (300, self.tempdir / 'a.jpg')],
+                         backlog(self.tempdir, re.compile(r'^.*\.jpg$')))
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+import shutil
+import struct
+import tempfile
+import unittest
+
+from pathlib import Path
+
+import cv2
+
+import numpy as np
+
+from syrup.embed_metadata import (can_embed, copy_with_metadata,
+                                  move_with_metadata, read_xmp, merge_xmp,
+                                  xmp_description)
+from syrup.image_header import image_size
+from syrup.move_and_rename import move_and_rename, move_to_free_name
+from syrup.verified_copy import hash_file
+
+
+class TestMergeXmp(unittest.TestCase):
+    def test_new(self):
+        packet = merge_xmp(None, xmp_description('012345678', 'L012345678'))
+        self.assertTrue(packet.startswith(b'<?xpacket begin='))
+        self.assertIn(b'syrup:specimen="012345678"', packet)
+        self.assertIn(b'syrup:location="L012345678"', packet)
+        self.assertIn(b'<dc:identifier>012345678</dc:identifier>', packet)
+
+    def test_existing(self):
+        existing = merge_xmp(None, b'<rdf:Description rdf:about="a"/>')
+        packet = merge_xmp(existing, b'<rdf:Description rdf:about="b"/>')
+        self.assertIn(b'rdf:about="a"', packet)
+        self.assertIn(b'rdf:about="b"', packet)
+        self.assertEqual(1, packet.count(b'</rdf:RDF>'))
+
+    def test_escaped(self):
+        self.assertIn(b'&lt;&amp;&gt;', xmp_description('<&>', 'L'))
+
+
+class TestEmbedMetadata(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = Path(tempfile.mkdtemp())
+        random = np.random.RandomState(0)
+        self.image = random.randint(0, 256, (60, 80, 3)).astype(np.uint8)
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tempdir))
+
+    def _write(self, name, params=[]):
+        path = self.tempdir / name
+        cv2.imwrite(str(path), self.image, params)
+        return path
+
+    def _check(self, src):
+        destination = self.tempdir / ('embedded' + src.suffix)
+        result = copy_with_metadata(src, destination, '012345678', 'L012345678')
+        self.assertEqual(destination.stat().st_size, result.size)
+        self.assertIsNotNone(result.digest)
+
+        # Pixels are unaltered
+        expected = cv2.imread(str(src), cv2.IMREAD_UNCHANGED)
+        actual = cv2.imread(str(destination), cv2.IMREAD_UNCHANGED)
+        self.assertTrue(np.array_equal(expected, actual))
+        self.assertEqual(image_size(src), image_size(destination))
+
+        xmp = read_xmp(destination)
+        self.assertIn(b'syrup:specimen="012345678"', xmp)
+        self.assertIn(b'syrup:location="L012345678"', xmp)
+        return destination
+
+    def test_jpeg(self):
+        src = self._write('a.jpg')
+        self.assertTrue(can_embed(src))
+        self.assertIsNone(read_xmp(src))
+        destination = self._check(src)
+
+        # The original data with a segment inserted
+        original, embedded = src.read_bytes(), destination.read_bytes()
+        self.assertEqual(original[-1000:], embedded[-1000:])
+        self.assertEqual(len(original) + 4 + 29 + len(read_xmp(destination)),
+                         len(embedded))
+
+    def test_jpeg_twice(self):
+        once = self._check(self._write('a.jpg'))
+        twice = self.tempdir / 'twice.jpg'
+        copy_with_metadata(once, twice, '999999999', 'L999999999')
+        xmp = read_xmp(twice)
+        self.assertIn(b'syrup:specimen="012345678"', xmp)
+        self.assertIn(b'syrup:specimen="999999999"', xmp)
+        self.assertEqual(1, xmp.count(b'<?xpacket begin'))
+
+    def test_tiff(self):
+        for name, params in (('a.tif', []),
+                             ('b.tif', [cv2.IMWRITE_TIFF_COMPRESSION, 1])):
+            src = self._write(name, params)
+            self.assertTrue(can_embed(src))
+            destination = self._check(src)
+            original, embedded = src.read_bytes(), destination.read_bytes()
+            self.assertEqual(original[8:], embedded[8:len(original)])
+
+    def test_tiff_big_endian(self):
+        # A minimal big-endian greyscale TIFF of 2 x 1 pixels
+        entries = [(256, 3, 1, 2 << 16), (257, 3, 1, 1 << 16),
+                   (258, 3, 1, 8 << 16), (259, 3, 1, 1 << 16),
+                   (262, 3, 1, 1 << 16), (273, 4, 1, 8),
+                   (277, 3, 1, 1 << 16), (278, 3, 1, 1 << 16),
+                   (279, 4, 1, 2)]
+        data = b'MM\x00*' + struct.pack('>I', 10) + b'\x10\x20'
+        data += struct.pack('>H', len(entries))
+        data += b''.join(struct.pack('>HHII', *e) for e in entries)
+        data += struct.pack('>I', 0)
+        src = self.tempdir / 'big.tif'
+        with src.open('wb') as f:
+            f.write(data)
+        destination = self.tempdir / 'embedded.tif'
+        copy_with_metadata(src, destination, '012345678', 'L012345678')
+        self.assertIn(b'012345678', read_xmp(destination))
+        self.assertEqual((2, 1), image_size(destination))
+        self.assertEqual([[0x10, 0x20]], cv2.imread(str(destination),
+                         cv2.IMREAD_UNCHANGED).tolist())
+
+    def test_tiff_twice(self):
+        once = self._check(self._write('a.tif'))
+        twice = self.tempdir / 'twice.tif'
+        copy_with_metadata(once, twice, '999999999', 'L999999999')
+        xmp = read_xmp(twice)
+        self.assertIn(b'syrup:specimen="012345678"', xmp)
+        self.assertIn(b'syrup:specimen="999999999"', xmp)
+
+    def test_unsupported(self):
+        src = self._write('a.png')
+        self.assertFalse(can_embed(src))
+        self.assertIsNone(read_xmp(src))
+        with self.assertRaises(ValueError):
+            copy_with_metadata(src, self.tempdir / 'b.png', '012345678',
+                               'L012345678')
+        self.assertFalse((self.tempdir / 'b.png').exists())
+        self.assertEqual(['a.png'], [p.name for p in self.tempdir.iterdir()])
+
+    def test_move(self):
+        src = self._write('a.jpg')
+        destination = self.tempdir / 'b.jpg'
+        move_with_metadata(src, destination, '012345678', 'L012345678')
+        self.assertFalse(src.exists())
+        self.assertIn(b'012345678', read_xmp(destination))
+
+    def test_move_and_rename(self):
+        jpeg, png = self._write('a.jpg'), self._write('a.png')
+        png_data = png.read_bytes()
+        processed = self.tempdir / 'processed'
+        processed.mkdir()
+        moved = move_and_rename(jpeg, processed / 'b.jpg',
+                                embed=('012345678', 'L012345678'))
+        self.assertFalse(jpeg.exists())
+        self.assertIn(b'012345678', read_xmp(moved))
+
+        # Formats that cannot hold metadata are moved unaltered
+        moved = move_and_rename(png, processed / 'b.png',
+                                embed=('012345678', 'L012345678'))
+        self.assertEqual(png_data, moved.read_bytes())
+
+    def test_move_to_free_name(self):
+        processed = self.tempdir / 'processed'
+        processed.mkdir()
+        moved = move_to_free_name(self._write('a.jpg'), processed / 'b.jpg',
+                                  embed=('012345678', 'L012345678'))
+        self.assertEqual(processed / 'b.jpg', moved.path)
+        self.assertEqual(moved.path.stat().st_size, moved.size)
+        self.assertEqual(hash_file(moved.path), moved.digest)
+
+    def test_move_and_rename_corrupt(self):
+        # Files whose metadata cannot be written are moved unaltered
+        src = self.tempdir / 'corrupt.jpg'
+        with src.open('wb') as f:
+            f.write(b'\xff\xd8\xff\xe0\x00')
+        processed = self.tempdir / 'processed'
+        processed.mkdir()
+        moved = move_and_rename(src, processed / 'b.jpg',
+                                embed=('012345678', 'L012345678'))
+        self.assertFalse(src.exists())
+        self.assertEqual(b'\xff\xd8\xff\xe0\x00', moved.read_bytes())
+        self.assertEqual(['b.jpg'], [p.name for p in processed.iterdir()])
+
+
+if __name__=='__main__':
+    unittest.main()
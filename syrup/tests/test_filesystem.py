@@ -0,0 +1,51 @@
+import tempfile
+import unittest
+
+from syrup.filesystem import mount_type, is_network_filesystem, NETWORK_TYPES
+
+
+MOUNTS = '''sysfs /sys sysfs rw,nosuid,nodev,noexec,relatime 0 0
+/dev/sda1 / ext4 rw,relatime 0 0
+/dev/sda2 /home ext4 rw,relatime 0 0
+//server/captures /mnt/captures cifs rw,relatime,vers=3.0 0 0
+server:/export/images /mnt/images nfs4 rw,relatime 0 0
+server:/export/other /mnt/images nfs rw,relatime 0 0
+//server/with\\040space /mnt/with\\040space cifs rw 0 0
+'''
+
+
+class TestMountType(unittest.TestCase):
+    def test_root(self):
+        self.assertEqual('ext4', mount_type('/', MOUNTS))
+        self.assertEqual('ext4', mount_type('/usr/local', MOUNTS))
+
+    def test_longest_prefix(self):
+        self.assertEqual('ext4', mount_type('/home/user/inbox', MOUNTS))
+        self.assertEqual('cifs', mount_type('/mnt/captures/inbox', MOUNTS))
+        self.assertEqual('cifs', mount_type('/mnt/captures', MOUNTS))
+
+    def test_not_a_prefix_of_name(self):
+        self.assertEqual('ext4', mount_type('/mnt/capturesx', MOUNTS))
+
+    def test_last_mount_wins(self):
+        self.assertEqual('nfs', mount_type('/mnt/images/a', MOUNTS))
+
+    def test_escaped(self):
+        self.assertEqual('cifs', mount_type('/mnt/with space/inbox', MOUNTS))
+
+    def test_none(self):
+        self.assertIsNone(mount_type('/anything', ''))
+
+    def test_network_types(self):
+        self.assertIn('cifs', NETWORK_TYPES)
+        self.assertNotIn('ext4', NETWORK_TYPES)
+
+
+class TestIsNetworkFilesystem(unittest.TestCase):
+    def test_temp(self):
+        # Temporary directories are very unlikely to be on network filesystems
+        self.assertFalse(is_network_filesystem(tempfile.gettempdir()))
+
+
+if __name__=='__main__':
+    unittest.main()
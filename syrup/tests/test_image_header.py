@@ -0,0 +1,132 @@
+import shutil
+import struct
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from syrup.image_header import image_size, reduction_factor, exif_thumbnail
+
+
+def _jpeg(width, height):
+    "Bytes of a JPEG header that has an APP0 segment and a baseline SOF"
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00' + b'\x00' * 9
+    sof = b'\xff\xc0' + struct.pack('>HBHHB', 11, 8, height, width, 1) + b'\x01\x11\x00'
+    return b'\xff\xd8' + app0 + sof + b'\xff\xd9'
+
+
+def _exif_jpeg(thumbnail, endian='<'):
+    "Bytes of a JPEG header that has an Exif segment with IFD1 thumbnail"
+    magic = b'II*\x00' if '<' == endian else b'MM\x00*'
+    # Header, IFD0 with no entries at 8 and IFD1 with two entries at 14
+    ifd0 = struct.pack(endian + 'HI', 0, 14)
+    ifd1 = (struct.pack(endian + 'H', 2) +
+            struct.pack(endian + 'HHII', 0x201, 4, 1, 44) +
+            struct.pack(endian + 'HHII', 0x202, 4, 1, len(thumbnail)) +
+            struct.pack(endian + 'I', 0))
+    tiff = magic + struct.pack(endian + 'I', 8) + ifd0 + ifd1 + thumbnail
+    app1 = b'Exif\x00\x00' + tiff
+    return (b'\xff\xd8' + b'\xff\xe1' + struct.pack('>H', 2 + len(app1)) +
+            app1 + _jpeg(6000, 4000)[2:])
+
+
+def _png(width, height):
+    return (b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' +
+            struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+
+
+def _tiff(width, height, endian='<'):
+    magic = b'II*\x00' if '<' == endian else b'MM\x00*'
+    entries = [struct.pack(endian + 'HHIHxx', 256, 3, 1, width),
+               struct.pack(endian + 'HHII', 257, 4, 1, height)]
+    return (magic + struct.pack(endian + 'I', 8) +
+            struct.pack(endian + 'H', len(entries)) + b''.join(entries) +
+            struct.pack(endian + 'I', 0))
+
+
+def _bmp(width, height):
+    return b'BM' + b'\x00' * 16 + struct.pack('<ii', width, height)
+
+
+class TestImageSize(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tempdir))
+
+    def _size(self, contents):
+        path = self.tempdir / 'image'
+        with path.open('wb') as f:
+            f.write(contents)
+        return image_size(path)
+
+    def test_jpeg(self):
+        self.assertEqual((6000, 4000), self._size(_jpeg(6000, 4000)))
+
+    def test_png(self):
+        self.assertEqual((640, 480), self._size(_png(640, 480)))
+
+    def test_tiff(self):
+        self.assertEqual((8000, 6000), self._size(_tiff(8000, 6000, '<')))
+        self.assertEqual((8000, 6000), self._size(_tiff(8000, 6000, '>')))
+
+    def test_bmp(self):
+        self.assertEqual((100, 50), self._size(_bmp(100, -50)))
+
+    def test_unrecognised(self):
+        self.assertIsNone(self._size(b'not an image'))
+
+
+class TestExifThumbnail(unittest.TestCase):
+    THUMBNAIL = b'\xff\xd8 thumbnail \xff\xd9'
+
+    def setUp(self):
+        self.tempdir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tempdir))
+
+    def _thumbnail(self, contents):
+        path = self.tempdir / 'image.jpg'
+        with path.open('wb') as f:
+            f.write(contents)
+        return exif_thumbnail(path)
+
+    def test_thumbnail(self):
+        self.assertEqual(self.THUMBNAIL,
+                         self._thumbnail(_exif_jpeg(self.THUMBNAIL, '<')))
+        self.assertEqual(self.THUMBNAIL,
+                         self._thumbnail(_exif_jpeg(self.THUMBNAIL, '>')))
+
+    def test_size_unaffected(self):
+        path = self.tempdir / 'image.jpg'
+        with path.open('wb') as f:
+            f.write(_exif_jpeg(self.THUMBNAIL))
+        self.assertEqual((6000, 4000), image_size(path))
+
+    def test_no_thumbnail(self):
+        self.assertIsNone(self._thumbnail(_jpeg(6000, 4000)))
+        self.assertIsNone(self._thumbnail(_png(640, 480)))
+
+    def test_truncated(self):
+        self.assertIsNone(self._thumbnail(_exif_jpeg(self.THUMBNAIL)[:30]))
+
+
+class TestReductionFactor(unittest.TestCase):
+    def test_factor(self):
+        self.assertEqual(1, reduction_factor((1000, 800), (1200, 900)))
+        self.assertEqual(2, reduction_factor((2400, 1000), (1200, 900)))
+        self.assertEqual(4, reduction_factor((6000, 4000), (1200, 900)))
+        self.assertEqual(8, reduction_factor((12000, 9000), (1200, 900)))
+        self.assertEqual(8, reduction_factor((100000, 9000), (1200, 900)))
+
+    def test_factors(self):
+        self.assertEqual(2, reduction_factor((12000, 9000), (1200, 900), (2,)))
+
+    def test_empty_target(self):
+        self.assertEqual(1, reduction_factor((6000, 4000), (0, 0)))
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import shutil
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from syrup import inotify
+
+
+@unittest.skipUnless(inotify.available(), 'inotify is not available')
+class TestInotify(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tempdir))
+
+    def test_no_events(self):
+        with inotify.Inotify() as watch:
+            watch.add_watch(self.tempdir, inotify.IN_CLOSE_WRITE)
+            self.assertEqual([], watch.read_events(0))
+
+    def test_events(self):
+        with inotify.Inotify() as watch:
+            wd = watch.add_watch(self.tempdir, inotify.IN_CLOSE_WRITE |
+                                               inotify.IN_DELETE)
+            with (self.tempdir / 'a').open('wb') as f:
+                f.write(b'abc')
+            (self.tempdir / 'a').unlink()
+            events = [(w, m & ~inotify.IN_ISDIR, name)
+                      for w, m, c, name in watch.read_events(1)]
+            self.assertEqual([(wd, inotify.IN_CLOSE_WRITE, 'a'),
+                              (wd, inotify.IN_DELETE, 'a')], events)
+
+    def test_missing(self):
+        with inotify.Inotify() as watch:
+            self.assertRaises(OSError, watch.add_watch, self.tempdir / 'x',
+                              inotify.IN_CLOSE_WRITE)
+
+
+if __name__=='__main__':
+    unittest.main()
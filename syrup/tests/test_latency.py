@@ -0,0 +1,101 @@
+import csv
+import json
+import shutil
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from syrup.latency import Histogram, LatencyRecorder, STAGES
+
+
+class TestHistogram(unittest.TestCase):
+    def test_empty(self):
+        histogram = Histogram()
+        self.assertEqual(0, histogram.count)
+        self.assertIsNone(histogram.mean())
+        self.assertIsNone(histogram.percentile(50))
+
+    def test_add(self):
+        histogram = Histogram()
+        for seconds in (0.0005, 0.003, 0.003, 0.1, 1e6):
+            histogram.add(seconds)
+        self.assertEqual(5, histogram.count)
+        self.assertEqual(0.0005, histogram.minimum)
+        self.assertEqual(1e6, histogram.maximum)
+        self.assertEqual(5, sum(histogram.counts))
+        self.assertEqual(1, histogram.counts[0])
+        self.assertEqual(1, histogram.counts[-1])
+
+    def test_percentile(self):
+        histogram = Histogram()
+        for i in range(99):
+            histogram.add(0.003)
+        histogram.add(0.1)
+        # 3ms falls in the bucket (2ms, 4ms] but is also the maximum of the
+        # bucket
+        self.assertEqual(0.004, histogram.percentile(50))
+        self.assertEqual(0.004, histogram.percentile(99))
+        self.assertEqual(0.1, histogram.percentile(100))
+
+    def test_summary(self):
+        histogram = Histogram()
+        histogram.add(0.003)
+        summary = histogram.summary()
+        self.assertEqual(1, summary['count'])
+        self.assertEqual(0.003, summary['p50'])
+        self.assertEqual([[0.004, 1]], summary['buckets'])
+
+
+class TestLatencyRecorder(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tempdir))
+
+    def test_stages(self):
+        self.assertEqual(list(STAGES), list(LatencyRecorder().summary().keys()))
+
+    def test_record(self):
+        recorder = LatencyRecorder()
+        recorder.record('decode', 0.1)
+        recorder.record('decode', -1)
+        recorder.record('other', 0.2)
+        summary = recorder.summary()
+        self.assertEqual(2, summary['decode']['count'])
+        self.assertEqual(0, summary['decode']['min'])
+        self.assertEqual(1, summary['other']['count'])
+        recorder.clear()
+        self.assertEqual(0, recorder.summary()['decode']['count'])
+
+    def test_timed(self):
+        recorder = LatencyRecorder()
+        with recorder.timed('move'):
+            pass
+        with self.assertRaises(ValueError):
+            with recorder.timed('move'):
+                raise ValueError()
+        self.assertEqual(1, recorder.summary()['move']['count'])
+
+    def test_write_json(self):
+        recorder = LatencyRecorder()
+        recorder.record('decode', 0.1)
+        recorder.write(self.tempdir / 'latency.json')
+        with (self.tempdir / 'latency.json').open() as f:
+            summary = json.load(f)
+        self.assertEqual(1, summary['decode']['count'])
+
+    def test_write_csv(self):
+        recorder = LatencyRecorder()
+        recorder.record('decode', 0.1)
+        recorder.write(self.tempdir / 'latency.csv')
+        with (self.tempdir / 'latency.csv').open() as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(list(STAGES), [r['stage'] for r in rows])
+        self.assertEqual('1', rows[STAGES.index('decode')]['count'])
+        self.assertEqual('', rows[STAGES.index('move')]['mean'])
+
+
+if __name__=='__main__':
+    unittest.main()
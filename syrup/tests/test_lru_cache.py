@@ -0,0 +1,42 @@
+import unittest
+
+from syrup.lru_cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_get_put(self):
+        cache = LRUCache(10)
+        cache.put('a', 1)
+        self.assertIn('a', cache)
+        self.assertEqual(1, cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.total)
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(10, sizeof=len)
+        cache.put('a', 'x' * 4)
+        cache.put('b', 'x' * 4)
+        cache.get('a')
+        cache.put('c', 'x' * 4)
+        self.assertEqual(['a', 'c'], cache.keys())
+        self.assertEqual(8, cache.total)
+
+    def test_too_large(self):
+        cache = LRUCache(10, sizeof=len)
+        cache.put('a', 'x' * 4)
+        cache.put('b', 'x' * 11)
+        self.assertEqual(['a'], cache.keys())
+
+    def test_replace_and_pop(self):
+        cache = LRUCache(10, sizeof=len)
+        cache.put('a', 'x' * 4)
+        cache.put('a', 'x' * 6)
+        self.assertEqual(6, cache.total)
+        self.assertEqual('x' * 6, cache.pop('a'))
+        self.assertIsNone(cache.pop('a'))
+        self.assertEqual(0, cache.total)
+        self.assertEqual(0, len(cache))
+
+
+if __name__=='__main__':
+    unittest.main()
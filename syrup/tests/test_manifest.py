@@ -0,0 +1,104 @@
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from syrup.manifest import ProcessedManifest, MANIFEST_NAME
+
+
+class TestProcessedManifest(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = Path(tempfile.mkdtemp())
+        self.manifest = ProcessedManifest.for_directory(self.tempdir)
+
+    def tearDown(self):
+        self.manifest.close()
+        shutil.rmtree(str(self.tempdir))
+
+    def test_created(self):
+        self.assertTrue((self.tempdir / MANIFEST_NAME).is_file())
+        self.assertEqual([], self.manifest.entries())
+
+    def test_record(self):
+        id = self.manifest.record(Path('inbox/a.jpg'), Path('processed/b.jpg'),
+                                  '012345678', 'L012345678', 10, 'abc', 'op',
+                                  timestamp=1000)
+        entry, = self.manifest.entries()
+        self.assertEqual(id, entry.id)
+        self.assertEqual(str(Path('inbox/a.jpg')), entry.source)
+        self.assertEqual(str(Path('processed/b.jpg')), entry.destination)
+        self.assertEqual(('012345678', 'L012345678', 10, 'abc', 1000, 'op'),
+                         (entry.specimen, entry.location, entry.size,
+                          entry.hash, entry.timestamp, entry.operator))
+
+    def test_lookups(self):
+        self.manifest.record('a', 'x', '000000001', 'L000000001', hash='h1',
+                             timestamp=2)
+        self.manifest.record('b', 'y', '000000002', 'L000000001', hash='h2',
+                             timestamp=1)
+        self.manifest.record('c', 'z', '000000001', 'L000000002', hash='h1',
+                             timestamp=3)
+        self.assertEqual(['a', 'c'], [e.source for e in
+                                      self.manifest.by_specimen('000000001')])
+        self.assertEqual(['b', 'a'], [e.source for e in
+                                      self.manifest.by_location('L000000001')])
+        self.assertEqual(['a', 'c'], [e.source for e in
+                                      self.manifest.by_hash('h1')])
+        self.assertEqual([], self.manifest.by_specimen('999999999'))
+
+    def test_perceptual_hashes(self):
+        self.manifest.record('a', 'x', '000000001', 'L000000001', phash='ff',
+                             timestamp=2)
+        self.manifest.record('b', 'y', '000000002', 'L000000001', timestamp=1)
+        self.manifest.record('c', 'z', '000000003', 'L000000001', phash='0f',
+                             timestamp=3)
+        hashes = self.manifest.perceptual_hashes()
+        self.assertEqual([('x', 'ff'), ('z', '0f')],
+                         [(d, phash) for id, d, phash in hashes])
+        self.assertEqual([hashes[1]],
+                         self.manifest.perceptual_hashes(hashes[0][0]))
+        self.assertEqual([], self.manifest.perceptual_hashes(hashes[1][0]))
+        self.assertEqual('ff', self.manifest.by_specimen('000000001')[0].phash)
+
+    def test_since(self):
+        first = self.manifest.record('a', 'x', '000000001', 'L000000001',
+                                     timestamp=2)
+        self.manifest.record('b', 'y', '000000002', 'L000000001', timestamp=1)
+        self.assertEqual(['a', 'b'], [e.source for e in self.manifest.since()])
+        self.assertEqual(['b'], [e.source for e in self.manifest.since(first)])
+
+    def test_add_column(self):
+        # A database created before the phash column was added
+        self.manifest.close()
+        path = self.tempdir / 'old.sqlite'
+        connection = sqlite3.connect(str(path))
+        connection.execute('CREATE TABLE processed (id INTEGER PRIMARY KEY, '
+                           'source TEXT NOT NULL, destination TEXT NOT NULL, '
+                           'specimen TEXT NOT NULL, location TEXT NOT NULL, '
+                           'size INTEGER, hash TEXT, timestamp REAL NOT NULL, '
+                           'operator TEXT)')
+        connection.execute("INSERT INTO processed (source, destination, "
+                           "specimen, location, timestamp) VALUES "
+                           "('a', 'x', '000000001', 'L000000001', 1)")
+        connection.commit()
+        connection.close()
+
+        self.manifest = ProcessedManifest(path)
+        self.assertIsNone(self.manifest.entries()[0].phash)
+        self.manifest.record('b', 'y', '000000002', 'L000000001', phash='ff')
+        self.assertEqual(['ff'], [phash for id, destination, phash
+                                  in self.manifest.perceptual_hashes()])
+
+    def test_reopen(self):
+        self.manifest.record('a', 'x', '000000001', 'L000000001')
+        other = ProcessedManifest.for_directory(self.tempdir)
+        try:
+            self.assertEqual(1, len(other.by_specimen('000000001')))
+        finally:
+            other.close()
+
+
+if __name__=='__main__':
+    unittest.main()
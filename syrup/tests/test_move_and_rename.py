@@ -4,7 +4,7 @@ import unittest
 
 from pathlib import Path
 
-from syrup.move_and_rename import move_and_rename
+from syrup.move_and_rename import move_and_rename, DestinationIndex
 
 class TestMoveAndRename(unittest.TestCase):
     def test_no_existing(self):
@@ -48,6 +48,72 @@ class TestMoveAndRename(unittest.TestCase):
         finally:
             shutil.rmtree(str(tempdir))
 
+    def test_returns_destination(self):
+        tempdir = Path(tempfile.mkdtemp())
+        try:
+            src = tempdir / 'a'
+            dest = tempdir / 'b'
+            src.open('w').close()
+            dest.open('w').close()
+
+            self.assertEqual(tempdir / 'b_(1)', move_and_rename(src, dest))
+        finally:
+            shutil.rmtree(str(tempdir))
+
+
+class TestDestinationIndex(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tempdir))
+
+    def _touch(self, name):
+        path = self.tempdir / name
+        path.open('w').close()
+        return path
+
+    def test_free_name(self):
+        for name in ('b.jpg', 'b_(1).jpg', 'b_(7).jpg', 'b_(9).png', 'c_(2).jpg'):
+            self._touch(name)
+        (self.tempdir / 'd.jpg').mkdir()
+        index = DestinationIndex(self.tempdir)
+
+        self.assertIn('b_(7).jpg', index)
+        self.assertEqual(self.tempdir / 'b_(8).jpg',
+                         index.free_name(self.tempdir / 'b.jpg'))
+        self.assertEqual(self.tempdir / 'b.tif',
+                         index.free_name(self.tempdir / 'b.tif'))
+        self.assertEqual(self.tempdir / 'c.jpg',
+                         index.free_name(self.tempdir / 'c.jpg'))
+        self.assertEqual(self.tempdir / 'e.jpg',
+                         index.free_name(self.tempdir / 'e.jpg'))
+
+    def test_move_with_index(self):
+        self._touch('b.jpg')
+        index = DestinationIndex(self.tempdir)
+        for expected in ('b_(1).jpg', 'b_(2).jpg', 'b_(3).jpg'):
+            src = self._touch('a.jpg')
+            moved = move_and_rename(src, self.tempdir / 'b.jpg', index)
+            self.assertEqual(self.tempdir / expected, moved)
+            self.assertTrue(moved.is_file())
+            self.assertFalse(src.is_file())
+
+    def test_file_created_after_index(self):
+        self._touch('b.jpg')
+        index = DestinationIndex(self.tempdir)
+
+        # Created by another process
+        self._touch('b_(1).jpg')
+
+        src = self._touch('a.jpg')
+        with src.open('w') as f:
+            f.write(u'a')
+        moved = move_and_rename(src, self.tempdir / 'b.jpg', index)
+        self.assertEqual(self.tempdir / 'b_(2).jpg', moved)
+        self.assertEqual(0, (self.tempdir / 'b_(1).jpg').stat().st_size)
+        self.assertEqual(1, moved.stat().st_size)
+
 
 if __name__=='__main__':
     unittest.main()
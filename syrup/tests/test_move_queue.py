@@ -0,0 +1,169 @@
+import shutil
+import tempfile
+import threading
+import unittest
+
+from pathlib import Path
+
+from syrup.manifest import ProcessedManifest
+from syrup.move_queue import MoveJournal, MoveQueue
+from syrup.verified_copy import hash_file
+
+
+class TestMoveJournal(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = Path(tempfile.mkdtemp())
+        self.journal = MoveJournal(self.tempdir / 'journal')
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tempdir))
+
+    def test_empty(self):
+        self.assertEqual([], self.journal.unfinished())
+
+    def test_unfinished(self):
+        a = self.journal.intend(Path('a'), Path('x'))
+        b = self.journal.intend(Path('b'), Path('y'))
+        c = self.journal.intend(Path('c'), Path('z'))
+        self.journal.complete(a, Path('x'))
+        self.journal.fail(c, 'Failed')
+        self.assertEqual([(b, Path('b'), Path('y'))], self.journal.unfinished())
+
+    def test_torn_line(self):
+        a = self.journal.intend(Path('a'), Path('x'))
+        with (self.tempdir / 'journal').open('a') as f:
+            f.write(u'{"id": "')
+        self.assertEqual([(a, Path('a'), Path('x'))], self.journal.unfinished())
+
+    def test_compact(self):
+        a = self.journal.intend(Path('a'), Path('x'))
+        b = self.journal.intend(Path('b'), Path('y'))
+        self.journal.complete(a, Path('x'))
+        self.journal.compact()
+        with (self.tempdir / 'journal').open() as f:
+            self.assertEqual(1, len(f.readlines()))
+        self.assertEqual([(b, Path('b'), Path('y'))], self.journal.unfinished())
+
+    def test_metadata(self):
+        a = self.journal.intend(Path('a'), Path('x'), {'specimen': '1'})
+        b = self.journal.intend(Path('b'), Path('y'))
+        records = self.journal.unfinished_records()
+        self.assertEqual({'specimen': '1'}, records[0]['metadata'])
+        self.assertNotIn('metadata', records[1])
+
+
+class TestMoveQueue(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = Path(tempfile.mkdtemp())
+        self.journal = MoveJournal(self.tempdir / 'journal')
+        self.moved, self.failed = [], []
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tempdir))
+
+    def _queue(self):
+        return MoveQueue(self.journal,
+                         lambda src, dest: self.moved.append((src, dest)),
+                         lambda src, dest, message: self.failed.append(src))
+
+    def test_moves(self):
+        src = self.tempdir / 'a'
+        src.open('w').close()
+        (self.tempdir / 'processed').mkdir()
+        (self.tempdir / 'processed' / 'b').open('w').close()
+
+        queue = self._queue()
+        queue.put(src, self.tempdir / 'processed' / 'b')
+        queue.put(self.tempdir / 'missing', self.tempdir / 'processed' / 'c')
+        queue.close()
+
+        expected = self.tempdir / 'processed' / 'b_(1)'
+        self.assertEqual([(src, expected)], self.moved)
+        self.assertEqual([self.tempdir / 'missing'], self.failed)
+        self.assertTrue(expected.is_file())
+        self.assertEqual([], self.journal.unfinished())
+
+    def test_creates_destination_directory(self):
+        src = self.tempdir / 'a'
+        src.open('w').close()
+        queue = self._queue()
+        queue.put(src, self.tempdir / 'processed' / 'b')
+        queue.close()
+        self.assertTrue((self.tempdir / 'processed' / 'b').is_file())
+
+    def test_replay(self):
+        src = self.tempdir / 'a'
+        src.open('w').close()
+        self.journal.intend(src, self.tempdir / 'b')
+
+        queue = self._queue()
+        self.assertEqual(1, queue.replay())
+        queue.close()
+        self.assertTrue((self.tempdir / 'b').is_file())
+        self.assertEqual([], self.journal.unfinished())
+
+    def _metadata(self):
+        return {'processed': str(self.tempdir / 'processed'),
+                'specimen': '012345678', 'location': 'L012345678',
+                'operator': 'operator'}
+
+    def test_manifest(self):
+        src = self.tempdir / 'a'
+        with src.open('wb') as f:
+            f.write(b'image')
+        queue = self._queue()
+        queue.put(src, self.tempdir / 'processed' / 'b', self._metadata())
+        queue.close()
+
+        manifest = ProcessedManifest.for_directory(self.tempdir / 'processed')
+        entries = manifest.by_specimen('012345678')
+        manifest.close()
+        self.assertEqual(1, len(entries))
+        self.assertEqual(str(src), entries[0].source)
+        self.assertEqual(str(self.tempdir / 'processed' / 'b'),
+                         entries[0].destination)
+        self.assertEqual(5, entries[0].size)
+        self.assertEqual(hash_file(self.tempdir / 'processed' / 'b'),
+                         entries[0].hash)
+        self.assertEqual('operator', entries[0].operator)
+
+    def test_queued(self):
+        sources = [self.tempdir / name for name in ('a', 'b')]
+        for src in sources:
+            src.open('w').close()
+
+        # Moves that have been made are no longer queued. The first move
+        # waits until both have been put.
+        queued, put = [], threading.Event()
+
+        def moved(src, destination):
+            put.wait()
+            queued.append(queue.queued())
+
+        queue = MoveQueue(self.journal, moved)
+        for src in sources:
+            queue.put(src, self.tempdir / 'processed' / src.name,
+                      self._metadata())
+        put.set()
+        queue.close()
+        self.assertEqual([(sources[1], self.tempdir / 'processed' / 'b',
+                           self._metadata())], queued[0])
+        self.assertEqual([], queued[1])
+        self.assertEqual([], queue.queued())
+
+    def test_replay_metadata(self):
+        src = self.tempdir / 'a'
+        src.open('w').close()
+        self.journal.intend(src, self.tempdir / 'processed' / 'b',
+                            self._metadata())
+        queue = self._queue()
+        queue.replay()
+        queue.close()
+
+        manifest = ProcessedManifest.for_directory(self.tempdir / 'processed')
+        self.assertEqual(1, len(manifest.by_location('L012345678')))
+        manifest.close()
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import random
+import unittest
+
+from syrup.pending_queue import PendingQueue, LIFO, FIFO, MTIME
+
+
+class TestPendingQueue(unittest.TestCase):
+    def _queue(self, order):
+        queue = PendingQueue(order)
+        for path, mtime in (('a', 30), ('b', 10), ('c', 20)):
+            queue.push(path, mtime)
+        return queue
+
+    def _drain(self, queue):
+        return [queue.pop() for i in range(len(queue))]
+
+    def test_orders(self):
+        self.assertEqual(['c', 'b', 'a'], self._drain(self._queue(LIFO)))
+        self.assertEqual(['a', 'b', 'c'], self._drain(self._queue(FIFO)))
+        self.assertEqual(['b', 'c', 'a'], self._drain(self._queue(MTIME)))
+
+    def test_peek(self):
+        self.assertEqual(['c', 'b'], self._queue(LIFO).peek(2))
+        self.assertEqual(['a', 'b'], self._queue(FIFO).peek(2))
+        self.assertEqual(['b', 'c'], self._queue(MTIME).peek(2))
+        self.assertEqual(['b', 'c', 'a'], list(self._queue(MTIME)))
+
+    def test_duplicates(self):
+        queue = self._queue(FIFO)
+        self.assertFalse(queue.push('a'))
+        self.assertEqual(3, len(queue))
+
+    def test_remove(self):
+        for order in (LIFO, FIFO, MTIME):
+            queue = self._queue(order)
+            self.assertTrue(queue.remove('b'))
+            self.assertFalse(queue.remove('b'))
+            self.assertNotIn('b', queue)
+            self.assertEqual(2, len(queue))
+            self.assertNotIn('b', self._drain(queue))
+
+    def test_remove_and_push_again(self):
+        queue = self._queue(MTIME)
+        queue.remove('b')
+        queue.push('b', 40)
+        self.assertEqual(['c', 'a', 'b'], self._drain(queue))
+
+    def test_peek_after_changes(self):
+        # peek agrees with the order of the queued files as files are added,
+        # removed and taken
+        rng = random.Random(1)
+        queue, expected = PendingQueue(MTIME), {}
+        for i in range(2000):
+            action = rng.random()
+            if action < 0.5 or not expected:
+                path, mtime = 'p{0}'.format(rng.randrange(300)), rng.random()
+                if queue.push(path, mtime):
+                    expected[path] = mtime
+            elif action < 0.8:
+                path = rng.choice(sorted(expected))
+                queue.remove(path)
+                del expected[path]
+            else:
+                path = queue.pop()
+                self.assertEqual(min(expected, key=expected.get), path)
+                del expected[path]
+            n = rng.randrange(1, 10)
+            self.assertEqual(sorted(expected, key=expected.get)[:n],
+                             queue.peek(n))
+
+    def test_compact(self):
+        queue = PendingQueue(MTIME)
+        for i in range(100):
+            queue.push(i, i)
+        for i in range(90):
+            queue.remove(i)
+        self.assertTrue(len(queue._heap) <= 2 * len(queue))
+        self.assertEqual(list(range(90, 100)), list(queue))
+
+    def test_set_order(self):
+        queue = self._queue(LIFO)
+        queue.set_order(MTIME)
+        self.assertEqual(['b', 'c', 'a'], self._drain(queue))
+        self.assertRaises(ValueError, queue.set_order, 'random')
+
+    def test_empty(self):
+        queue = PendingQueue()
+        self.assertRaises(IndexError, queue.pop)
+        self.assertIsNone(queue.oldest_age())
+        self.assertEqual([], queue.peek(3))
+
+    def test_oldest_age(self):
+        queue = self._queue(LIFO)
+        self.assertTrue(0 <= queue.oldest_age() < 5)
+
+
+if __name__=='__main__':
+    unittest.main()
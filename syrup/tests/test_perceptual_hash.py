@@ -0,0 +1,119 @@
+import itertools
+import unittest
+
+import cv2
+
+import numpy as np
+
+from syrup.perceptual_hash import (phash, hex_of_hash, hash_of_hex, HashIndex,
+                                   HASH_BYTES, MAX_DISTANCE)
+
+
+def _background():
+    "A gradient, like the lighting of a copy stand"
+    y, x = np.mgrid[0:400, 0:600]
+    return np.dstack([140 + 40 * x / 600.0, 150 + 30 * y / 400.0,
+                      160 - 20 * x / 600.0]).astype(np.uint8)
+
+
+def _capture(seed):
+    "A small specimen and a label on the copy-stand background"
+    random = np.random.RandomState(seed)
+    image = _background()
+    colour = tuple(int(c) for c in random.randint(60, 120, 3))
+    cv2.ellipse(image, (random.randint(275, 325), random.randint(175, 225)),
+                (random.randint(15, 40), random.randint(10, 30)),
+                random.randint(0, 180), 0, 360, colour, -1)
+    cv2.rectangle(image, (450, 325), (540, 360), (250, 250, 250), -1)
+    cv2.putText(image, str(random.randint(10 ** 8, 10 ** 9)), (452, 348),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 1)
+    return image
+
+
+def _distance(a, b):
+    return HashIndex([('a', a)]).distances(b)[0]
+
+
+class TestPhash(unittest.TestCase):
+    def setUp(self):
+        self.image = _capture(0)
+
+    def test_size(self):
+        self.assertEqual(HASH_BYTES, len(phash(self.image)))
+
+    def test_resized(self):
+        smaller = cv2.resize(self.image, (150, 100), interpolation=cv2.INTER_AREA)
+        index = HashIndex([('image', phash(self.image))])
+        self.assertEqual(['image'], [k for k, d in index.near(phash(smaller))])
+
+    def test_recompressed(self):
+        ok, data = cv2.imencode('.jpg', self.image, [cv2.IMWRITE_JPEG_QUALITY, 50])
+        jpeg = cv2.imdecode(data, cv2.IMREAD_COLOR)
+        self.assertLessEqual(_distance(phash(self.image), phash(jpeg)),
+                             MAX_DISTANCE)
+
+    def test_shared_background(self):
+        # Different specimens shot against the same background are not
+        # near-duplicates
+        hashes = [phash(_capture(seed)) for seed in range(30)]
+        for a, b in itertools.combinations(hashes, 2):
+            self.assertGreater(_distance(a, b), MAX_DISTANCE)
+
+    def test_different(self):
+        other = np.random.RandomState(1).randint(0, 256, (400, 600, 3))
+        self.assertGreater(_distance(phash(self.image),
+                                     phash(other.astype(np.uint8))),
+                           MAX_DISTANCE)
+
+    def test_greyscale(self):
+        grey = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        self.assertEqual(phash(self.image), phash(grey))
+
+    def test_hex(self):
+        hash = phash(self.image)
+        self.assertEqual(2 * HASH_BYTES, len(hex_of_hash(hash)))
+        self.assertEqual(hash, hash_of_hex(hex_of_hash(hash)))
+        self.assertRaises(ValueError, hash_of_hex, '00000000000000ff')
+        self.assertRaises(ValueError, hash_of_hex, 'not hex')
+
+
+def _hash(bits):
+    "A hash whose last two bytes hold the 16-bit value bits"
+    return b'\x00' * (HASH_BYTES - 2) + bytearray([bits >> 8, bits & 0xff])
+
+
+class TestHashIndex(unittest.TestCase):
+    def test_empty(self):
+        index = HashIndex()
+        self.assertEqual(0, len(index))
+        self.assertEqual([], index.near(_hash(0)))
+        self.assertNotIn('a', index)
+
+    def test_distances(self):
+        ones = b'\xff' * HASH_BYTES
+        index = HashIndex([('a', _hash(0)), ('b', _hash(1)),
+                           ('c', _hash(0b111)), ('d', ones)])
+        bits = 8 * HASH_BYTES
+        self.assertEqual([0, 1, 3, bits], list(index.distances(_hash(0))))
+        self.assertEqual([bits, bits - 1, bits - 3, 0],
+                         list(index.distances(ones)))
+
+    def test_near(self):
+        index = HashIndex([('a', _hash(0b111)), ('b', _hash(0)),
+                           ('c', _hash(0b1)), ('d', _hash(0xffff))])
+        self.assertEqual([('b', 0), ('c', 1), ('a', 3), ('d', 16)],
+                         index.near(_hash(0)))
+        self.assertEqual([('b', 0), ('c', 1)],
+                         index.near(_hash(0), max_distance=1))
+        self.assertIn('a', index)
+
+    def test_grows(self):
+        n = 3 * HashIndex.CAPACITY
+        index = HashIndex((i, _hash(i)) for i in range(n))
+        self.assertEqual(n, len(index))
+        self.assertEqual([(n - 1, 0)],
+                         index.near(_hash(n - 1), max_distance=0))
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import re
+import shutil
+import tempfile
+import time
+import unittest
+
+from pathlib import Path
+
+from syrup import write_settle
+from syrup.polling import (AdaptiveInterval, DirectoryPoller,
+                           ATTRIBUTE_CACHE_TIME, SETTLE_TIME)
+
+
+class TestAdaptiveInterval(unittest.TestCase):
+    def test_backs_off(self):
+        interval = AdaptiveInterval(minimum=1, maximum=4, factor=2)
+        self.assertEqual(1, interval.seconds)
+        self.assertEqual([2, 4, 4], [interval.unchanged() for i in range(3)])
+
+    def test_changed(self):
+        interval = AdaptiveInterval(minimum=1, maximum=4, factor=2)
+        interval.unchanged()
+        self.assertEqual(1, interval.changed())
+        self.assertEqual(1, interval.seconds)
+
+
+class TestSettleTime(unittest.TestCase):
+    def test_longer_than_attribute_cache(self):
+        self.assertGreater(SETTLE_TIME, ATTRIBUTE_CACHE_TIME)
+        self.assertGreater(SETTLE_TIME, write_settle.SETTLE_TIME)
+
+
+class TestDirectoryPoller(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = Path(tempfile.mkdtemp())
+        self.regex = re.compile(r'^.*\.jpg$')
+        self._touch('a.jpg')
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tempdir))
+
+    def _touch(self, name):
+        (self.tempdir / name).open('w').close()
+
+    def _set_directory_mtime(self, mtime):
+        os.utime(str(self.tempdir), (mtime, mtime))
+
+    def test_changes(self):
+        poller = DirectoryPoller(self.tempdir, self.regex)
+        self._touch('b.jpg')
+        self._touch('c.txt')
+        (self.tempdir / 'a.jpg').unlink()
+        self.assertEqual(([self.tempdir / 'b.jpg'], [self.tempdir / 'a.jpg']),
+                         poller.poll())
+        self.assertEqual(1, poller.scans)
+
+    def test_unchanged_directory_not_read(self):
+        self._set_directory_mtime(1000)
+        poller = DirectoryPoller(self.tempdir, self.regex)
+        self.assertEqual(([], []), poller.poll())
+        self.assertEqual(([], []), poller.poll())
+        self.assertEqual((2, 0), (poller.polls, poller.scans))
+
+    def test_mtime_changed(self):
+        self._set_directory_mtime(1000)
+        poller = DirectoryPoller(self.tempdir, self.regex)
+        self._touch('b.jpg')
+        self._set_directory_mtime(2000)
+        self.assertEqual(([self.tempdir / 'b.jpg'], []), poller.poll())
+        self.assertEqual(1, poller.scans)
+
+    def test_recent_change(self):
+        # Changes soon after a change that was seen might not alter the
+        # directory's modification time
+        self._set_directory_mtime(1000)
+        poller = DirectoryPoller(self.tempdir, self.regex)
+        self._set_directory_mtime(2000)
+        now = time.time()
+        poller.poll(now)
+        self._touch('b.jpg')
+        self._set_directory_mtime(2000)
+        self.assertEqual(([self.tempdir / 'b.jpg'], []), poller.poll(now + 1))
+        self._touch('c.jpg')
+        self._set_directory_mtime(2000)
+        self.assertEqual(([], []),
+                         poller.poll(now + DirectoryPoller.MTIME_RESOLUTION))
+        self.assertEqual(2, poller.scans)
+
+    def test_full_scan(self):
+        # Changes that did not alter the directory's modification time, as
+        # can happen when a network client caches attributes
+        self._set_directory_mtime(1000)
+        poller = DirectoryPoller(self.tempdir, self.regex,
+                                 full_scan_interval=10)
+        self._touch('b.jpg')
+        self._set_directory_mtime(1000)
+        self.assertEqual(([], []), poller.poll())
+        self.assertEqual(([self.tempdir / 'b.jpg'], []),
+                         poller.poll(now=time.time() + 10))
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import io
+import shutil
+import sys
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from syrup.startup_profile import StartupProfile
+
+
+class TestStartupProfile(unittest.TestCase):
+    def test_phase(self):
+        stream = io.StringIO()
+        profile = StartupProfile(stream)
+        with profile.phase('phase'):
+            pass
+        profile.mark('mark')
+        self.assertEqual(['phase', 'mark'], [p[0] for p in profile.phases])
+        self.assertEqual(0, profile.phases[1][2])
+        self.assertIn(u'phase', stream.getvalue())
+        self.assertIn(u'mark', stream.getvalue())
+
+    def test_phase_records_failure(self):
+        profile = StartupProfile()
+        with self.assertRaises(ValueError):
+            with profile.phase('failed'):
+                raise ValueError()
+        self.assertEqual(['failed'], [p[0] for p in profile.phases])
+
+    def test_imports(self):
+        tempdir = Path(tempfile.mkdtemp())
+        try:
+            with (tempdir / 'syrup_profiled_module.py').open('w') as f:
+                f.write(u'import syrup_profiled_dependency\n')
+            with (tempdir / 'syrup_profiled_dependency.py').open('w') as f:
+                f.write(u'\n')
+            sys.path.insert(0, str(tempdir))
+            stream = io.StringIO()
+            profile = StartupProfile(stream)
+            profile.install_import_hook()
+            try:
+                import syrup_profiled_module
+            finally:
+                profile.remove_import_hook()
+            self.assertIn('syrup_profiled_module', profile.imports)
+            self.assertIn('syrup_profiled_dependency', profile.imports)
+            profile.report_imports()
+            self.assertIn(u'syrup_profiled_module', stream.getvalue())
+        finally:
+            sys.path.remove(str(tempdir))
+            for name in ('syrup_profiled_module', 'syrup_profiled_dependency'):
+                sys.modules.pop(name, None)
+            shutil.rmtree(str(tempdir))
+
+    def test_remove_import_hook(self):
+        try:
+            import builtins
+        except ImportError:
+            import __builtin__ as builtins
+        original = builtins.__import__
+        profile = StartupProfile()
+        profile.install_import_hook()
+        self.assertNotEqual(original, builtins.__import__)
+        profile.remove_import_hook()
+        self.assertEqual(original, builtins.__import__)
+
+
+if __name__=='__main__':
+    unittest.main()
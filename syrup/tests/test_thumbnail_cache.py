@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from syrup.thumbnail_cache import ThumbnailCache
+
+
+class TestThumbnailCache(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = Path(tempfile.mkdtemp())
+        self.image = self.tempdir / 'image.jpg'
+        with self.image.open('wb') as f:
+            f.write(b'image')
+        self.cache = ThumbnailCache(self.tempdir / 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tempdir))
+
+    def test_put_get(self):
+        self.assertIsNone(self.cache.get(self.image))
+        self.cache.put(self.image, b'thumbnail')
+        self.assertEqual(b'thumbnail', self.cache.get(self.image))
+
+    def test_put_replaces(self):
+        self.cache.put(self.image, b'thumbnail')
+        self.cache.put(self.image, b'other')
+        self.assertEqual(b'other', self.cache.get(self.image))
+        self.assertEqual(1, len(list(self.cache.directory.iterdir())))
+
+    def test_changed_image(self):
+        self.cache.put(self.image, b'thumbnail')
+        with self.image.open('wb') as f:
+            f.write(b'a different image')
+        self.assertIsNone(self.cache.get(self.image))
+
+    def test_missing_image(self):
+        self.assertIsNone(self.cache.get(self.tempdir / 'missing.jpg'))
+
+    def test_prune(self):
+        images = [self.tempdir / '{0}.jpg'.format(i) for i in range(3)]
+        for n, image in enumerate(images):
+            with image.open('wb') as f:
+                f.write(b'image')
+            self.cache.put(image, b'0123456789')
+            entry = self.cache._entry(image)
+            os.utime(str(entry), (1000 + n, 1000 + n))
+
+        self.assertEqual(0, self.cache.prune(30))
+        self.assertEqual(2, self.cache.prune(15))
+        self.assertIsNone(self.cache.get(images[0]))
+        self.assertIsNone(self.cache.get(images[1]))
+        self.assertEqual(b'0123456789', self.cache.get(images[2]))
+
+
+if __name__=='__main__':
+    unittest.main()
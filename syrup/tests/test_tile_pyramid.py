@@ -0,0 +1,91 @@
+import gc
+import shutil
+import tempfile
+import threading
+import unittest
+import weakref
+
+from pathlib import Path
+
+import cv2
+
+import numpy as np
+
+from syrup.tile_pyramid import TilePyramid
+
+
+class TestTilePyramid(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = Path(tempfile.mkdtemp())
+        self.image = np.random.randint(0, 256, (300, 500, 3)).astype(np.uint8)
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tempdir))
+
+    def _pyramid(self, name, params=[]):
+        path = self.tempdir / name
+        cv2.imwrite(str(path), self.image, params)
+        return TilePyramid(path, tile_size=128)
+
+    def test_levels(self):
+        pyramid = self._pyramid('a.png')
+        self.assertEqual((500, 300), pyramid.size)
+        self.assertEqual(3, pyramid.level_count)
+        self.assertEqual((125, 75), pyramid.level_size(2))
+        self.assertEqual((4, 3), pyramid.tile_grid(0))
+        self.assertEqual((1, 1), pyramid.tile_grid(2))
+
+    def test_level_for_scale(self):
+        pyramid = self._pyramid('a.png')
+        self.assertEqual(0, pyramid.level_for_scale(2))
+        self.assertEqual(0, pyramid.level_for_scale(0.6))
+        self.assertEqual(1, pyramid.level_for_scale(0.5))
+        self.assertEqual(2, pyramid.level_for_scale(0.01))
+
+    def test_tiles(self):
+        pyramid = self._pyramid('a.png')
+        self.assertTrue(np.array_equal(self.image[128:256, 384:],
+                                       pyramid.tile(0, 3, 1)))
+        self.assertEqual((75, 125, 3), pyramid.tile(2, 0, 0).shape)
+
+    def test_build(self):
+        pyramid = self._pyramid('a.png')
+        self.assertEqual(1, pyramid.levels_built)
+        self.assertEqual((75, 125, 3), pyramid.build(2).shape)
+        self.assertEqual(3, pyramid.levels_built)
+
+    def test_cancelled(self):
+        pyramid = self._pyramid('a.png')
+        cancelled = threading.Event()
+        cancelled.set()
+        self.assertIsNone(pyramid.build(2, cancelled))
+        self.assertEqual(1, pyramid.levels_built)
+
+    def test_close(self):
+        pyramid = self._pyramid('a.tif', [cv2.IMWRITE_TIFF_COMPRESSION, 1])
+        base = weakref.ref(pyramid._levels[0])
+        tile = pyramid.tile(0, 0, 0)
+        pyramid.build(2)
+        pyramid.close()
+        gc.collect()
+
+        # The tile is a copy, so the file is no longer mapped
+        self.assertIsNone(base())
+        self.assertTrue(np.array_equal(self.image[:128, :128], tile))
+        self.assertEqual(0, pyramid.levels_built)
+        self.assertRaises(ValueError, pyramid.tile, 0, 0, 0)
+
+    def test_memory_mapped_tiff(self):
+        pyramid = self._pyramid('a.tif', [cv2.IMWRITE_TIFF_COMPRESSION, 1])
+        self.assertIsInstance(pyramid._levels[0], np.memmap)
+        self.assertTrue(np.array_equal(self.image[128:256, 384:],
+                                       pyramid.tile(0, 3, 1)))
+
+        # Levels built from the memory-mapped image are in BGR order
+        expected = cv2.resize(self.image, (250, 150), interpolation=cv2.INTER_AREA)
+        self.assertTrue(np.allclose(expected[:128, :128], pyramid.tile(1, 0, 0),
+                                    atol=1))
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from syrup import verified_copy
+from syrup.verified_copy import copy_file, move_file, hash_file
+
+
+class TestVerifiedCopy(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = Path(tempfile.mkdtemp())
+        self.src = self.tempdir / 'a'
+        self.data = os.urandom(100 * 1024 + 7)
+        with self.src.open('wb') as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tempdir))
+
+    def _contents(self, path):
+        with path.open('rb') as f:
+            return f.read()
+
+    def test_hash_file(self):
+        self.assertEqual(hashlib.sha256(self.data).hexdigest(),
+                         hash_file(self.src, buffer_size=1000))
+
+    def test_verified(self):
+        dest = self.tempdir / 'b'
+        result = copy_file(self.src, dest, buffer_size=4096)
+        self.assertEqual(self.data, self._contents(dest))
+        self.assertEqual(len(self.data), result.size)
+        self.assertEqual('verified', result.method)
+        self.assertEqual(hashlib.sha256(self.data).hexdigest(), result.digest)
+        self.assertTrue(result.throughput > 0)
+        self.assertTrue(self.src.is_file())
+
+    def test_unverified(self):
+        dest = self.tempdir / 'b'
+        result = copy_file(self.src, dest, verify=False, buffer_size=4096)
+        self.assertEqual(self.data, self._contents(dest))
+        self.assertIsNone(result.digest)
+        self.assertIn(result.method, ('copy_file_range', 'sendfile', 'buffered'))
+
+    def test_truncates_destination(self):
+        dest = self.tempdir / 'b'
+        with dest.open('wb') as f:
+            f.write(b'x' * 200 * 1024)
+        copy_file(self.src, dest)
+        self.assertEqual(self.data, self._contents(dest))
+
+    def test_move(self):
+        dest = self.tempdir / 'b'
+        move_file(self.src, dest)
+        self.assertFalse(self.src.exists())
+        self.assertEqual(self.data, self._contents(dest))
+
+    def test_mismatch(self):
+        dest = self.tempdir / 'b'
+        original = verified_copy.hash_file
+        verified_copy.hash_file = lambda path, buffer_size: 'corrupt'
+        try:
+            self.assertRaises(IOError, move_file, self.src, dest)
+        finally:
+            verified_copy.hash_file = original
+        self.assertTrue(self.src.is_file())
+        self.assertFalse(dest.exists())
+
+        self.assertEqual(['a'], os.listdir(str(self.tempdir)))
+
+    def test_mismatch_leaves_destination(self):
+        # The reserved destination is not altered by a failed copy
+        dest = self.tempdir / 'b'
+        dest.open('wb').close()
+        original = verified_copy.hash_file
+        verified_copy.hash_file = lambda path, buffer_size: 'corrupt'
+        try:
+            self.assertRaises(IOError, copy_file, self.src, dest)
+        finally:
+            verified_copy.hash_file = original
+        self.assertEqual(b'', self._contents(dest))
+        self.assertEqual(['a', 'b'], sorted(os.listdir(str(self.tempdir))))
+
+    def test_no_partial_files(self):
+        for verify in (True, False):
+            dest = self.tempdir / 'b'
+            copy_file(self.src, dest, verify=verify)
+            self.assertEqual(['a', 'b'], sorted(os.listdir(str(self.tempdir))))
+
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from pathlib import Path
+
+from syrup.write_settle import file_signature, wait_until_written
+
+
+class TestWriteSettle(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tempdir))
+
+    def test_signature(self):
+        path = self.tempdir / 'a'
+        self.assertIsNone(file_signature(path))
+        with path.open('wb') as f:
+            f.write(b'abc')
+        self.assertEqual(3, file_signature(path)[0])
+
+    def test_missing(self):
+        self.assertFalse(wait_until_written(self.tempdir / 'a', timeout=1))
+
+    def test_complete(self):
+        path = self.tempdir / 'a'
+        with path.open('wb') as f:
+            f.write(b'abc')
+        self.assertTrue(wait_until_written(path, settle_time=0.1, timeout=5))
+
+    def test_settle_time(self):
+        # A file that is no longer being written is complete only once it has
+        # been unchanged for settle_time
+        path = self.tempdir / 'a'
+        with path.open('wb') as f:
+            f.write(b'abc')
+        start = time.time()
+        self.assertTrue(wait_until_written(path, settle_time=0.5, timeout=5))
+        self.assertGreaterEqual(time.time() - start, 0.5)
+
+    def test_empty_file_times_out(self):
+        path = self.tempdir / 'a'
+        path.open('wb').close()
+        self.assertFalse(wait_until_written(path, settle_time=0.1, timeout=0.5))
+
+    def test_slow_writer(self):
+        path = self.tempdir / 'a'
+        f = path.open('wb')
+
+        def write():
+            for i in range(5):
+                f.write(b'x' * 1024)
+                f.flush()
+                time.sleep(0.1)
+            f.close()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            self.assertTrue(wait_until_written(path, settle_time=0.3, timeout=5))
+            self.assertEqual(5 * 1024, file_signature(path)[0])
+        finally:
+            writer.join()
+
+
+if __name__=='__main__':
+    unittest.main()
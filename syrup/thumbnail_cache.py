@@ -0,0 +1,89 @@
+import hashlib
+import os
+import uuid
+
+from pathlib import Path
+
+from .directory_index import scandir
+
+
+class ThumbnailCache(object):
+    """Thumbnails held as files in a directory. Entries are keyed by the path,
+    modification time and size of the image file so that a thumbnail is not
+    used after its image has changed. Files are written atomically so the
+    cache can be used by several threads and processes.
+    """
+
+    SUFFIX = '.jpg'
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        if not self.directory.is_dir():
+            self.directory.mkdir(parents=True)
+
+    def _entry(self, path):
+        """The Path of the entry for the image file at path
+        """
+        stat = os.stat(str(path))
+        key = u'{0}\0{1!r}\0{2}'.format(os.path.abspath(str(path)),
+                                        stat.st_mtime, stat.st_size)
+        return self.directory / (hashlib.sha1(key.encode('utf8')).hexdigest() +
+                                 self.SUFFIX)
+
+    def get(self, path):
+        """The thumbnail bytes of the image file at path or None if there is no
+        entry for the file as it is now
+        """
+        try:
+            entry = self._entry(path)
+            with open(str(entry), 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return None
+        else:
+            # Record the use, for prune()
+            try:
+                os.utime(str(entry), None)
+            except OSError:
+                pass
+            return data
+
+    def put(self, path, data):
+        """Stores the thumbnail bytes data of the image file at path
+        """
+        entry = self._entry(path)
+        temp = entry.with_name('{0}.{1}.tmp'.format(entry.name, uuid.uuid4().hex))
+        with open(str(temp), 'wb') as f:
+            f.write(data)
+        try:
+            if hasattr(os, 'replace'):
+                os.replace(str(temp), str(entry))
+            else:
+                os.rename(str(temp), str(entry))
+        except OSError:
+            # Python 2 on Windows cannot rename over an existing file, which
+            # will hold the same thumbnail
+            temp.unlink()
+
+    def prune(self, max_bytes):
+        """Removes the least recently used entries until those remaining total
+        no more than max_bytes. Returns the number of entries removed.
+        """
+        entries = []
+        for entry in scandir(str(self.directory)):
+            if entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total, removed = sum(e[1] for e in entries), 0
+        for mtime, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                # Removed by another process
+                pass
+            total -= size
+            removed += 1
+        return removed
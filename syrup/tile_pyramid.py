@@ -0,0 +1,155 @@
+"""A multi-resolution pyramid of an image, divided into tiles.
+
+Level 0 is the full-resolution image and each subsequent level is half the
+width and height of the one before. Uncompressed TIFFs are memory mapped so
+that tiles of level 0 read only the parts of the file that they cover. Other
+formats are decoded in full when the pyramid is created. Lower levels are
+built by build(), or the first time that they are needed.
+
+Creating a pyramid and building its levels read the whole image, so both are
+done on a worker thread - see zoom_view.ZoomView. Levels, once built, are not
+altered, so tiles of levels below levels_built can be taken on other threads
+while the worker builds the remaining levels. Tiles of level 0 are copies, so
+once close() has been called the file is no longer mapped and can be moved,
+even on Windows.
+"""
+import cv2
+
+import numpy as np
+
+from .image_header import tiff_layout
+
+
+class TilePyramid(object):
+    """Lazily built pyramid of the image file at path. Tiles are numpy arrays
+    in BGR or greyscale order, of uint8 or uint16.
+    """
+
+    # Width and height of tiles
+    TILE_SIZE = 512
+
+    # Number of rows of level 0 that are reduced at once when building level
+    # 1 from a memory-mapped image
+    BAND_ROWS = 1024
+
+    def __init__(self, path, tile_size=TILE_SIZE):
+        self.path = path
+        self.tile_size = tile_size
+
+        # The channels of memory mapped images are in RGB order
+        self._rgb = False
+        layout = tiff_layout(path)
+        if layout:
+            offset, shape, dtype, channels = layout
+            base = np.memmap(str(path), dtype=dtype, mode='r', offset=offset,
+                             shape=shape)
+            self._rgb = 'rgb' == channels
+        else:
+            base = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+            if base is None:
+                raise ValueError('Unable to read [{0}]'.format(path))
+            elif 3 == base.ndim and 4 == base.shape[2]:
+                base = cv2.cvtColor(base, cv2.COLOR_BGRA2BGR)
+
+        self._levels = [base]
+        height, width = base.shape[:2]
+        self.size = (width, height)
+
+        # Halve until the whole image fits within a single tile
+        self.level_count = 1
+        while max(width, height) > tile_size:
+            width, height = (width + 1) // 2, (height + 1) // 2
+            self.level_count += 1
+
+    @property
+    def levels_built(self):
+        """The number of levels, from level 0, that have been built, or 0 if
+        the pyramid has been closed
+        """
+        return len(self._levels)
+
+    def level_size(self, level):
+        """(width, height) of level
+        """
+        width, height = self.size
+        for i in range(level):
+            width, height = (width + 1) // 2, (height + 1) // 2
+        return (width, height)
+
+    def level_for_scale(self, scale):
+        """The lowest-resolution level that has at least scale pixels for each
+        pixel of level 0
+        """
+        level = 0
+        while level + 1 < self.level_count and 0.5 ** (level + 1) >= scale:
+            level += 1
+        return level
+
+    def tile_grid(self, level):
+        """(columns, rows) of tiles in level
+        """
+        width, height = self.level_size(level)
+        return ((width + self.tile_size - 1) // self.tile_size,
+                (height + self.tile_size - 1) // self.tile_size)
+
+    def tile(self, level, column, row):
+        """The tile at column, row of level. Tiles at the right and bottom
+        edges might be smaller than tile_size. Builds level if it has not
+        been built.
+        """
+        image = self.build(level)
+        top, left = row * self.tile_size, column * self.tile_size
+        tile = image[top:top + self.tile_size, left:left + self.tile_size]
+        if 0 == level:
+            # Copied so that the tile does not refer to a memory-mapped file
+            return np.array(tile[:, :, ::-1] if self._rgb else tile)
+        else:
+            return np.ascontiguousarray(tile)
+
+    def build(self, level, cancelled=None):
+        """Builds level, and the levels above it, if they have not been built.
+        Returns the array of level, or None if cancelled, a threading.Event,
+        was set before it was built. Raises ValueError if the pyramid has been
+        closed.
+        """
+        if not self._levels:
+            raise ValueError('Pyramid of [{0}] is closed'.format(self.path))
+        while len(self._levels) <= level:
+            if cancelled and cancelled.is_set():
+                return None
+            previous = len(self._levels) - 1
+            width, height = self.level_size(previous + 1)
+            if 0 == previous:
+                image = self._reduce_base(width, height, cancelled)
+                if image is None:
+                    return None
+            else:
+                image = cv2.resize(self._levels[previous], (width, height),
+                                   interpolation=cv2.INTER_AREA)
+            self._levels.append(image)
+        return self._levels[level]
+
+    def close(self):
+        """Discards the levels, unmapping the file once no other references to
+        level 0 remain. Not thread safe: call once build() has returned.
+        """
+        self._levels = []
+
+    def _reduce_base(self, width, height, cancelled=None):
+        """Level 1, built from level 0 in bands of rows so that memory-mapped
+        images are not read into memory in their entirety. None if cancelled
+        is set between bands.
+        """
+        base = self._levels[0]
+        bands = []
+        for top in range(0, base.shape[0], self.BAND_ROWS):
+            if cancelled and cancelled.is_set():
+                return None
+            band = np.asarray(base[top:top + self.BAND_ROWS])
+            band_height = (band.shape[0] + 1) // 2
+            bands.append(cv2.resize(band, (width, band_height),
+                                    interpolation=cv2.INTER_AREA))
+        image = np.concatenate(bands)[:height]
+        if self._rgb:
+            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        return image
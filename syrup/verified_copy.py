@@ -0,0 +1,185 @@
+"""Copies files between filesystems, checking the copy before the source is
+removed.
+
+copy_file() with verify=True reads the source once, hashing the data as it is
+written to the destination, and then reads the destination back to check that
+its hash matches. The data passes through Python's buffers so that it can be
+hashed as it is read. Only with verify=False, as used by benchmarks, is the
+copy made by the kernel using os.copy_file_range or os.sendfile where they are
+available.
+
+Copies are written to a temporary file in the destination directory, which
+is renamed to the destination only once it has been written, flushed to disk
+and verified, so that an interrupted copy never leaves a truncated file under
+the destination's name.
+"""
+import errno
+import hashlib
+import os
+import shutil
+import sys
+import time
+import uuid
+
+from collections import namedtuple
+
+
+# Bytes read and written at a time
+BUFFER_SIZE = 8 * 1024 * 1024
+
+# Name of the hashlib algorithm used for verification
+HASH = 'sha256'
+
+
+class CopyResult(namedtuple('CopyResult', ['size', 'seconds', 'digest',
+                                           'method'])):
+    """The outcome of copy_file. digest is the hex digest of the data, or None
+    if the copy was not verified. method is 'verified', 'copy_file_range',
+    'sendfile' or 'buffered'.
+    """
+    __slots__ = ()
+
+    @property
+    def throughput(self):
+        """Bytes per second
+        """
+        return self.size / self.seconds if self.seconds else float('inf')
+
+    def __str__(self):
+        return '{0:.1f} MB in {1:.2f}s ({2:.1f} MB/s, {3})'.format(
+            self.size / 1e6, self.seconds, self.throughput / 1e6, self.method)
+
+
+def hash_file(path, buffer_size=BUFFER_SIZE, cached=False):
+    """The hex digest of the contents of path. Unless cached is True, the
+    contents are read from the device rather than from the page cache, so
+    that the digest verifies what was written.
+    """
+    hasher = hashlib.new(HASH)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(str(path), 'rb', buffering=0) as f:
+        if not cached and hasattr(os, 'posix_fadvise'):
+            # Read from the device rather than from pages cached when the file
+            # was written
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            hasher.update(view[:n])
+    return hasher.hexdigest()
+
+
+def _copy_hashing(fsrc, fdst, buffer_size):
+    hasher = hashlib.new(HASH)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    while True:
+        n = fsrc.readinto(buffer)
+        if not n:
+            break
+        hasher.update(view[:n])
+        fdst.write(view[:n])
+    return hasher.hexdigest()
+
+
+def _copy_kernel(fsrc, fdst, size, buffer_size):
+    """Copies using copy_file_range or sendfile. Returns the name of the method
+    used or None if neither is available for these files.
+    """
+    for method in ('copy_file_range', 'sendfile'):
+        if hasattr(os, method):
+            copy = getattr(os, method)
+            offset = 0
+            try:
+                while offset < size:
+                    if 'sendfile' == method:
+                        n = copy(fdst.fileno(), fsrc.fileno(), offset,
+                                 min(buffer_size, size - offset))
+                    else:
+                        n = copy(fsrc.fileno(), fdst.fileno(),
+                                 min(buffer_size, size - offset),
+                                 offset, offset)
+                    if not n:
+                        break
+                    offset += n
+            except OSError as e:
+                if 0 == offset and e.errno in (errno.EXDEV, errno.ENOSYS,
+                                               errno.EINVAL, errno.ENOTSUP,
+                                               errno.EBADF):
+                    # Not supported between these files - try the next method
+                    continue
+                else:
+                    raise
+            else:
+                return method
+    return None
+
+
+def partial_path(destination):
+    """A unique temporary path, in the same directory as destination, to which
+    a copy can be written before it is renamed to destination
+    """
+    return destination.parent / '.{0}.{1}.partial'.format(destination.name,
+                                                         uuid.uuid4().hex)
+
+
+def replace(src, destination):
+    """Renames src to destination, replacing destination if it exists
+    """
+    if hasattr(os, 'replace'):
+        os.replace(str(src), str(destination))
+    elif 'win32' == sys.platform:
+        # Python 2 on Windows cannot rename over an existing file
+        if os.path.exists(str(destination)):
+            os.unlink(str(destination))
+        os.rename(str(src), str(destination))
+    else:
+        os.rename(str(src), str(destination))
+
+
+def copy_file(src, destination, verify=True, buffer_size=BUFFER_SIZE):
+    """Copies the contents and metadata of src to destination, which is
+    created or replaced, and returns a CopyResult. If verify is True then the
+    copy is read back and IOError is raised, and destination left unaltered,
+    if its contents differ from those read from src.
+    """
+    start = time.time()
+    partial = partial_path(destination)
+    try:
+        with open(str(src), 'rb', buffering=0) as fsrc:
+            size = os.fstat(fsrc.fileno()).st_size
+            with open(str(partial), 'wb') as fdst:
+                if verify:
+                    digest = _copy_hashing(fsrc, fdst, buffer_size)
+                    method = 'verified'
+                else:
+                    digest = None
+                    method = _copy_kernel(fsrc, fdst, size, buffer_size)
+                    if not method:
+                        _copy_hashing(fsrc, fdst, buffer_size)
+                        method = 'buffered'
+                fdst.flush()
+                os.fsync(fdst.fileno())
+
+        if verify and hash_file(partial, buffer_size) != digest:
+            raise IOError('Copy of [{0}] to [{1}] does not match the '
+                          'original'.format(src, destination))
+
+        shutil.copystat(str(src), str(partial))
+        replace(partial, destination)
+    except Exception:
+        if partial.exists():
+            partial.unlink()
+        raise
+    return CopyResult(size, time.time() - start, digest, method)
+
+
+def move_file(src, destination, verify=True, buffer_size=BUFFER_SIZE):
+    """Copies src to destination with copy_file and then removes src. Returns
+    the CopyResult.
+    """
+    result = copy_file(src, destination, verify, buffer_size)
+    os.unlink(str(src))
+    return result
@@ -0,0 +1,84 @@
+"""Detects when another process has finished writing a file.
+
+Capture software creates image files and then writes to them, sometimes over
+several seconds for large TIFFs. wait_until_written() blocks until a file's
+size and modification time have stopped changing. On Linux, inotify's
+IN_CLOSE_WRITE event is used as a fast path so that files are usually
+reported as soon as the writer closes them.
+
+wait_until_written() blocks so it should not be called on the GUI thread.
+"""
+import os
+import time
+
+from . import inotify
+
+
+# Seconds for which a file's size and mtime must be unchanged
+SETTLE_TIME = 0.5
+
+# Seconds between checks of a file's size and mtime
+POLL_INTERVAL = 0.1
+
+# Seconds after which to give up on a file that is still changing
+TIMEOUT = 120.0
+
+
+def file_signature(path):
+    """A tuple (size, mtime) for path or None if path does not exist
+    """
+    try:
+        stat = os.stat(str(path))
+    except OSError:
+        return None
+    else:
+        return (stat.st_size, stat.st_mtime)
+
+
+def wait_until_written(path, settle_time=SETTLE_TIME,
+                       poll_interval=POLL_INTERVAL, timeout=TIMEOUT):
+    """Blocks until path has been completely written. Returns True if path
+    is complete and False if path disappeared or did not settle within
+    timeout seconds.
+    """
+    watch = None
+    if inotify.available():
+        try:
+            watch = inotify.Inotify()
+            watch.add_watch(path, inotify.IN_CLOSE_WRITE | inotify.IN_MODIFY |
+                                  inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF)
+        except OSError:
+            # Fall back to polling - path might be on a filesystem that does
+            # not support inotify, or might already have gone
+            if watch:
+                watch.close()
+            watch = None
+
+    try:
+        start = last_change = time.time()
+        previous = file_signature(path)
+        while True:
+            if watch:
+                for wd, mask, cookie, name in watch.read_events(poll_interval):
+                    if mask & (inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF):
+                        return False
+                    elif mask & inotify.IN_CLOSE_WRITE:
+                        # The writer closed the file
+                        return file_signature(path) is not None
+            else:
+                time.sleep(poll_interval)
+
+            now = time.time()
+            current = file_signature(path)
+            if current is None:
+                return False
+            elif current != previous:
+                previous, last_change = current, now
+            elif current[0] > 0 and now - last_change >= settle_time:
+                return True
+
+            if now - start > timeout:
+                return False
+    finally:
+        if watch:
+            watch.close()
@@ -0,0 +1,288 @@
+import logging
+import threading
+
+from PySide import QtCore, QtGui
+
+from .image_header import image_size
+from .lru_cache import LRUCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class _PyramidSignals(QtCore.QObject):
+    """Signals emitted by _PyramidTask
+    """
+    built = QtCore.Signal(object, object)
+    failed = QtCore.Signal(object, str)
+
+
+class _PyramidTask(QtCore.QRunnable):
+    """Creates a TilePyramid and builds its levels on a thread pool thread,
+    emitting built after each level. Stops when cancel() is called. Not
+    deleted by the pool, so that close() can be called once it has finished.
+    """
+    def __init__(self, path, signals):
+        super(_PyramidTask, self).__init__()
+        self.setAutoDelete(False)
+        self._path = path
+        self._cancelled = threading.Event()
+        self._signals = signals
+        self._pyramid = None
+
+    def run(self):
+        try:
+            # Imported here so that OpenCV is not imported at startup
+            from .tile_pyramid import TilePyramid
+            if self._cancelled.is_set():
+                return
+            self._pyramid = TilePyramid(self._path)
+            self._signals.built.emit(self._path, self._pyramid)
+            for level in range(1, self._pyramid.level_count):
+                if self._pyramid.build(level, self._cancelled) is None:
+                    break
+                self._signals.built.emit(self._path, self._pyramid)
+        except Exception as e:
+            self._signals.failed.emit(self._path, str(e))
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def close(self):
+        """Closes the pyramid, releasing the image file. Call once the task
+        has finished.
+        """
+        if self._pyramid:
+            self._pyramid.close()
+            self._pyramid = None
+
+
+class ZoomView(QtGui.QWidget):
+    """Shows an image file at any zoom level, drawing only the tiles of its
+    TilePyramid that are visible. The pyramid is built in the background;
+    until the level required is ready, the preview QImage is drawn scaled up.
+    Tiles are cached as QImages. Zoom with the mouse wheel and pan by
+    dragging. Emits fit_requested when the user zooms out beyond the size of
+    the widget, double clicks or presses Escape.
+    """
+
+    # Emitted when the user asks to go back to seeing the whole image
+    fit_requested = QtCore.Signal()
+
+    # Zoom factor for each step of the mouse wheel
+    WHEEL_STEP = 1.25
+
+    # Greatest number of screen pixels for each image pixel
+    MAX_SCALE = 8.0
+
+    # Maximum bytes of tiles to hold
+    CACHE_BYTES = 128 * 1024 * 1024
+
+    def __init__(self, parent=None):
+        super(ZoomView, self).__init__(parent)
+
+        # The path that is shown, if any, its preview and the (width, height)
+        # of its full-resolution image
+        self._path = None
+        self._preview = None
+        self._size = None
+        self._shown = False
+
+        # The pyramid of path, once its level 0 is ready, and the task that
+        # builds it
+        self._pyramid = None
+        self._task = None
+        self._tiles = LRUCache(self.CACHE_BYTES,
+                               sizeof=lambda image: image.byteCount())
+
+        self._pool = QtCore.QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._signals = _PyramidSignals(self)
+        self._signals.built.connect(self._built, QtCore.Qt.QueuedConnection)
+        self._signals.failed.connect(self._failed, QtCore.Qt.QueuedConnection)
+
+        # Screen pixels for each pixel of level 0 and the position within
+        # level 0 of the widget's top-left corner
+        self._scale = 1.0
+        self._origin = QtCore.QPointF(0, 0)
+
+        self._drag_start = None
+        self.setFocusPolicy(QtCore.Qt.StrongFocus)
+        self.setCursor(QtCore.Qt.OpenHandCursor)
+
+    def set_image(self, path, preview, anchor, factor=WHEEL_STEP):
+        """Shows the image file at path zoomed in by factor from the scale at
+        which it fits the widget, with anchor, given as fractions of the
+        image's width and height, at the centre of the widget. The QImage
+        preview is shown until tiles are ready. The pyramid of path is kept
+        until discard() is called or another path is shown.
+        """
+        if path != self._path:
+            self.discard()
+            self._path = path
+            self._task = _PyramidTask(path, self._signals)
+            self._pool.start(self._task)
+            try:
+                self._size = image_size(path)
+            except (IOError, OSError):
+                self._size = None
+            if not self._size:
+                # Corrected when the pyramid is ready
+                self._size = (preview.width(), preview.height())
+        self._preview = preview
+        self._shown = True
+        self._scale = min(self.fit_scale() * factor, self.MAX_SCALE)
+        width, height = self._size
+        self._origin = QtCore.QPointF(
+            anchor[0] * width - self.width() / (2.0 * self._scale),
+            anchor[1] * height - self.height() / (2.0 * self._scale))
+        self.update()
+
+    def clear(self):
+        """Shows nothing. The pyramid is kept.
+        """
+        self._shown = False
+        self.update()
+
+    def discard(self):
+        """Shows nothing and discards the pyramid, stopping its building. Waits
+        for the building to stop, which it does between bands of rows, and
+        then closes the pyramid so that the image file can be moved.
+        """
+        if self._task:
+            self._task.cancel()
+            self._pool.waitForDone()
+            self._task.close()
+        self._path = self._preview = self._size = self._pyramid = None
+        self._task = None
+        self._tiles.clear()
+        self.clear()
+
+    def fit_scale(self):
+        """The scale at which the whole image fits within the widget
+        """
+        width, height = self._size
+        return min(float(self.width()) / width, float(self.height()) / height)
+
+    def _built(self, path, pyramid):
+        # Pyramids that have been discarded are closed
+        if path == self._path and pyramid.levels_built:
+            if pyramid.size != self._size:
+                # The size in the file's header was not known or was wrong
+                factor = float(pyramid.size[0]) / self._size[0]
+                self._origin *= factor
+                self._scale /= factor
+                self._size = pyramid.size
+            self._pyramid = pyramid
+            self.update()
+
+    def _failed(self, path, message):
+        logger.warning(u'Unable to build the pyramid of [%s]: %s', path,
+                       message)
+
+    def _level(self):
+        """The level of the pyramid to draw, or None if the preview should be
+        drawn. Levels are built from level 0 downwards, so if the level for
+        the scale is not ready then the level above it is drawn, provided
+        that it has at most four times as many tiles.
+        """
+        if self._pyramid:
+            level = self._pyramid.level_for_scale(self._scale)
+            ready = min(level, self._pyramid.levels_built - 1)
+            if level - ready <= 1:
+                return ready
+        return None
+
+    def _tile(self, level, column, row):
+        """A QImage of a tile of the pyramid
+        """
+        # Imported here so that OpenCV is not imported at startup
+        from .imaging import qimage_of_bgr
+
+        key = (level, column, row)
+        image = self._tiles.get(key)
+        if image is None:
+            image = qimage_of_bgr(self._pyramid.tile(level, column, row))
+            self._tiles.put(key, image)
+        return image
+
+    def zoom(self, factor, position):
+        """Multiplies the scale by factor, keeping the image pixel under the
+        widget's position in place
+        """
+        if self._shown:
+            scale = min(self._scale * factor, self.MAX_SCALE)
+            if scale < self.fit_scale():
+                self.fit_requested.emit()
+            else:
+                fixed = self._origin + QtCore.QPointF(position) / self._scale
+                self._origin = fixed - QtCore.QPointF(position) / scale
+                self._scale = scale
+                self.update()
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), QtGui.QColor('darkgrey'))
+        if not self._shown:
+            return
+
+        painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+        level = self._level()
+        if level is None:
+            width, height = self._size
+            target = QtCore.QRectF(-self._origin.x() * self._scale,
+                                   -self._origin.y() * self._scale,
+                                   width * self._scale, height * self._scale)
+            painter.drawImage(target, self._preview)
+            return
+
+        pyramid = self._pyramid
+
+        # Size on screen of a tile of level
+        level_scale = 2 ** level
+        tile = pyramid.tile_size * level_scale * self._scale
+
+        # Range of tiles that intersect the widget
+        columns, rows = pyramid.tile_grid(level)
+        left = self._origin.x() * self._scale
+        top = self._origin.y() * self._scale
+        first_column = max(0, int(left // tile))
+        last_column = min(columns - 1, int((left + self.width()) // tile))
+        first_row = max(0, int(top // tile))
+        last_row = min(rows - 1, int((top + self.height()) // tile))
+
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                image = self._tile(level, column, row)
+                target = QtCore.QRectF(column * tile - left, row * tile - top,
+                                       image.width() * level_scale * self._scale,
+                                       image.height() * level_scale * self._scale)
+                painter.drawImage(target, image)
+
+    def wheelEvent(self, event):
+        steps = event.delta() / 120.0
+        self.zoom(self.WHEEL_STEP ** steps, event.pos())
+
+    def mousePressEvent(self, event):
+        if QtCore.Qt.LeftButton == event.button():
+            self._drag_start = (event.pos(), QtCore.QPointF(self._origin))
+            self.setCursor(QtCore.Qt.ClosedHandCursor)
+
+    def mouseMoveEvent(self, event):
+        if self._drag_start:
+            position, origin = self._drag_start
+            self._origin = origin - QtCore.QPointF(event.pos() - position) / self._scale
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        self._drag_start = None
+        self.setCursor(QtCore.Qt.OpenHandCursor)
+
+    def mouseDoubleClickEvent(self, event):
+        self.fit_requested.emit()
+
+    def keyPressEvent(self, event):
+        if QtCore.Qt.Key_Escape == event.key():
+            self.fit_requested.emit()
+        else:
+            super(ZoomView, self).keyPressEvent(event)